@@ -52,9 +52,13 @@ Rob Hamerling, Version 0.3, September 2023
 
 """
 
-from time import sleep_ms
+from array import array
+from math import sqrt
+
+from as7341_compat import const, sleep_ms, ticks_ms, ticks_diff  # MicroPython or CPython
 
 from as7341_smux_select import *            # predefined SMUX configurations
+from as7341_record import *                 # measurement records
 
 AS7341_I2C_ADDRESS  = const(0x39)           # I2C address of AS7341
 AS7341_ID_VALUE     = const(0x24)           # AS7341 Part Number Identification
@@ -151,7 +155,10 @@ AS7341_AGC_GAIN_MAX = const(0xCF)
 AS7341_AZ_CONFIG    = const(0xD6)
 AS7341_FD_TIME_1    = const(0xD8)
 AS7341_FD_TIME_2    = const(0xDA)
+AS7341_FD_TIME_2_FD_TIME_H = const(0x07)    # FD_TIME bits 10..8
+AS7341_FD_TIME_2_FD_GAIN   = const(0xF8)    # FD_GAIN (code << 3)
 AS7341_FD_CFG0      = const(0xD7)
+AS7341_FD_CFG0_FIFO_WRITE_FD = const(0x80)
 AS7341_FD_STATUS    = const(0xDB)
 AS7341_FD_STATUS_FD_100HZ      = const(0x01)
 AS7341_FD_STATUS_FD_120HZ      = const(0x02)
@@ -159,6 +166,7 @@ AS7341_FD_STATUS_FD_100_VALID  = const(0x04)
 AS7341_FD_STATUS_FD_120_VALID  = const(0x08)
 AS7341_FD_STATUS_FD_SAT_DETECT = const(0x10)
 AS7341_FD_STATUS_FD_MEAS_VALID = const(0x20)
+AS7341_FD_STATUS_CLEAR         = const(0x3C)    # clearable FD_STATUS bits
 AS7341_INTENAB      = const(0xF9)
 AS7341_INTENAB_SP_IEN = const(0x08)
 AS7341_CONTROL      = const(0xFA)
@@ -168,6 +176,98 @@ AS7341_FDATA        = const(0xFE)
 AS7341_FDATA_L      = const(0xFE)
 AS7341_FDATA_H      = const(0xFF)
 
+""" Per-sample hot paths: pure Python versions, replaced by native code
+    versions (as7341_native.py) on MicroPython with native code emitter
+"""
+def _decode_list_py(buf):
+    """ return list of the 6 counts in <buf> (ASTATUS + 12 bytes) """
+    return [buf[1 + 2*i] | (buf[2 + 2*i] << 8) for i in range(6)]
+
+def _decode_counts_py(buf, counts, offset):
+    """ store the 6 counts in <buf> into <counts> starting at <offset> """
+    for i in range(6):
+        counts[offset + i] = buf[1 + 2*i] | (buf[2 + 2*i] << 8)
+
+def _modify_bits_py(data, mask, flag):
+    """ return <data> with the bits of <mask> set (<flag> True) or reset """
+    if flag:
+        return data | mask
+    return data & (~mask)
+
+def _poll_bit_py(bus, addr, reg, buf, mask, poll_ms, timeout_ms):
+    """ read register <reg> into <buf> until a bit of <mask> is set
+        return True when set, False after <timeout_ms> (negative: no limit)
+    """
+    start = ticks_ms()
+    while True:
+        bus.readfrom_mem_into(addr, reg, buf)
+        if buf[0] & mask:
+            return True
+        if timeout_ms >= 0 and ticks_diff(ticks_ms(), start) > timeout_ms:
+            return False
+        sleep_ms(poll_ms)
+
+try:
+    from as7341_native import decode_list as _decode_list, \
+                              decode_counts as _decode_counts, \
+                              modify_bits as _modify_bits, \
+                              poll_bit as _poll_bit
+    AS7341_NATIVE = True
+except (ImportError, SyntaxError):          # CPython, no emitter or not installed
+    _decode_list = _decode_list_py
+    _decode_counts = _decode_counts_py
+    _modify_bits = _modify_bits_py
+    _poll_bit = _poll_bit_py
+    AS7341_NATIVE = False
+
+
+""" Write combining (AS7341.batch()): registers of which the writes keep
+    their order and are not merged with other registers, and registers
+    which are always read from the chip (status, counts, FIFO)
+"""
+def _batch_ordered(reg, length=1):
+    """ True when a write to <reg> (<length> bytes) must keep its order:
+        ENABLE, CFG_0 (register bank), CFG_6 (SMUX command),
+        write-1-to-clear registers, CONTROL, SMUX RAM and bank 1
+    """
+    if reg < AS7341_ENABLE:
+        return True
+    for r in (AS7341_ENABLE, AS7341_STATUS, AS7341_CFG_0, AS7341_CFG_6,
+              AS7341_FD_STATUS, AS7341_CONTROL):
+        if reg <= r < reg + length:
+            return True
+    return False
+
+def _batch_volatile(key):
+    """ True when register <key> (bank 1: + 0x100) changes by itself """
+    return (AS7341_STATUS <= key <= AS7341_STATUS_6
+            or AS7341_FIFO_LVL <= key <= AS7341_FDATA_H
+            or key in (AS7341_GPIO_2, AS7341_FD_STATUS, AS7341_STAT | 0x100))
+
+
+class _AS7341Batch:
+    """ Context manager returned by AS7341.batch() """
+    def __init__(self, sensor, settle):
+        self._sensor = sensor
+        self._settle = settle
+
+    def __enter__(self):
+        self._mark = len(self._sensor._batch_ops)   # writes of outer batches
+        self._sensor._batch_depth += 1
+        return self._sensor
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        sensor = self._sensor
+        if exc_type is not None:                # discard writes of this block
+            sensor._batch_discard(self._mark)
+        if sensor._batch_depth == 1:            # outermost batch
+            sensor._batch_flush(self._settle)
+            sensor._batch_shadow.clear()
+            sensor._batch_device.clear()
+        sensor._batch_depth -= 1
+        return False
+
+
 class AS7341:
     """ Class for AS7341: 11 Channel Multi-Spectral Digital Sensor """
     def __init__(self, i2c, addr=AS7341_I2C_ADDRESS):
@@ -178,49 +278,121 @@ class AS7341:
         self._buffer2 = bytearray(2)            # I2C I/O buffer for word
         self._buffer13 = bytearray(13)          # I2C I/O buffer ASTATUS + 6 counts
         self._measuremode = AS7341_MODE_SPM     # default measurement mode
-        self._connected = self.reset()          # recycle power, check AS7341 presence
+        self._lowpower = False                  # low power mode not desired
+        self._selection = None                  # last selected SMUX configuration
+        self._integration_ms = None             # cached for records
+        self._oversample_buf = None             # reused by get_oversampled_data
+        self._oversample_stats = None           # (n, means, stddevs, max, ms)
+        self._errors = 0                        # number of failed I2C transfers
+        self._batch_depth = 0                   # nesting level of batch()
+        self._batch_ops = []                    # queued writes (reg, bytes)
+        self._batch_shadow = {}                 # register values in batch
+        self._batch_device = {}                 # register values on the chip
+        self._connected = False
+        self.reset()                            # recycle power, check AS7341 presence
 
     """ --------- 'private' methods ----------- """
 
     def _read_byte(self, reg):
-        """ read byte, return integer value """
+        """ read byte, return integer value
+            In a batch known register values are taken from the shadow
+            copy, status registers are read after flushing queued writes.
+        """
+        key = None
+        if self._batch_depth:
+            key = self._batch_key(reg)
+            if key in self._batch_shadow:
+                return self._batch_shadow[key]
+            if _batch_volatile(key) or key != reg:
+                self._batch_flush()             # chip must be up to date
         try:
             self._bus.readfrom_mem_into(self._address, reg, self._buffer1)
-            return self._buffer1[0]             # return integer value
         except Exception as err:
             print("I2C read_byte at 0x{:02X}, error".format(reg), err)
+            self._errors += 1
             return -1                           # indication 'no receive'
+        if key is not None and not _batch_volatile(key):
+            self._batch_shadow[key] = self._buffer1[0]
+            self._batch_device[key] = self._buffer1[0]
+        return self._buffer1[0]                 # return integer value
 
     def _read_word(self, reg):
         """ read 2 consecutive bytes, return integer value (little Endian) """
+        if self._batch_depth:
+            self._batch_flush()                 # read the actual chip state
         try:
             self._bus.readfrom_mem_into(self._address, reg, self._buffer2)
             return int.from_bytes(self._buffer2, 'little')   # return word value
         except Exception as err:
             print("I2C read_word at 0x{:02X}, error".format(reg), err)
+            self._errors += 1
             return -1                           # indication 'no receive'
 
     def _read_all_channels(self):
         """ read ASTATUS register and all channels, return list of 6 integer values
             Note: Reading ASTATUS latches the channel counts, which ensures that
                   the count values of the channels are concurrent.
-                  The contents of ASTATUS itself is not returned!
+                  The contents of ASTATUS itself is not returned,
+                  but remains available in _buffer13[0] (see get_spectral_record)
         """
+        if self._batch_depth:
+            self._batch_flush()                 # read the actual chip state
         try:
             self._bus.readfrom_mem_into(self._address, AS7341_ASTATUS, self._buffer13)
-            return [int.from_bytes(self._buffer13[1 + 2*i : 3 + 2*i], 'little') for i in range(6)]
+            return _decode_list(self._buffer13)
         except Exception as err:
             print("I2C read_all_channels at 0x{:02X}, error".format(AS7341_ASTATUS), err)
+            self._errors += 1
             return []                                   # empty list
 
-    def _write_byte(self, reg, value):
-        """ write a single byte to the specified register """
+    def _read_all_channels_into(self, counts, offset=0):
+        """ read ASTATUS register and all channels into <counts>
+            <counts> is a preallocated array or list with room for 6 integers
+            starting at index <offset>
+            return True when successful, otherwise False
+            No memory is allocated for the decoded counts.
+        """
+        if self._batch_depth:
+            self._batch_flush()                 # read the actual chip state
+        buf = self._buffer13
+        try:
+            self._bus.readfrom_mem_into(self._address, AS7341_ASTATUS, buf)
+        except Exception as err:
+            print("I2C read_all_channels at 0x{:02X}, error".format(AS7341_ASTATUS), err)
+            self._errors += 1
+            return False
+        _decode_counts(buf, counts, offset)
+        return True
+
+    def _read_block(self, reg, buf):
+        """ read len(<buf>) consecutive bytes starting at <reg> into <buf>
+            return True when successful, otherwise False
+        """
+        if self._batch_depth:
+            self._batch_flush()                 # read the actual chip state
+        try:
+            self._bus.readfrom_mem_into(self._address, reg, buf)
+            return True
+        except Exception as err:
+            print("I2C read_block at 0x{:02X}, error".format(reg), err)
+            self._errors += 1
+            return False
+
+    def _write_byte(self, reg, value, settle=10):
+        """ write a single byte to the specified register
+            and wait <settle> milliseconds
+        """
+        if self._batch_depth:
+            self._batch_write(reg, bytes((value & 0xFF,)))
+            return True
         self._buffer1[0] = (value & 0xFF)
         try:
             self._bus.writeto_mem(self._address, reg, self._buffer1)
-            sleep_ms(10)
+            if settle:
+                sleep_ms(settle)
         except Exception as err:
             print("I2C write_byte at 0x{:02X}, error".format(reg), err)
+            self._errors += 1
             return False
         return True
 
@@ -228,6 +400,9 @@ class AS7341:
         """ write a word as 2 bytes (little endian encoding)
             to adresses <reg> + 0 and <reg> + 1
         """
+        if self._batch_depth:
+            self._batch_write(reg, bytes((value & 0xFF, (value >> 8) & 0xFF)))
+            return True
         self._buffer2[0] = (value & 0xFF)           # low byte
         self._buffer2[1] = ((value >> 8) & 0xFF)    # high byte
         try:
@@ -235,19 +410,41 @@ class AS7341:
             sleep_ms(20)
         except Exception as err:
             print("I2C write_word at 0x{:02X}, error".format(reg), err)
+            self._errors += 1
             return False
         return True
 
-    def _write_burst(self, reg, value):
-        """ write an array of bytes to consecutive addresses starting at <reg> """
+    def _write_burst(self, reg, value, settle=100):
+        """ write an array of bytes to consecutive addresses starting at <reg>
+            and wait <settle> milliseconds
+        """
+        if self._batch_depth:
+            self._batch_write(reg, bytes(value))
+            return True
         try:
             self._bus.writeto_mem(self._address, reg, value)
-            sleep_ms(100)
+            if settle:
+                sleep_ms(settle)
         except Exception as err:
             print("I2C write_burst at 0x{:02X}, error".format(reg), err)
+            self._errors += 1
             return False
         return True
 
+    def _wait_completed(self, timeout_ms=-1, poll_ms=50):
+        """ wait until AVALID is set, at most <timeout_ms> (negative: no limit)
+            return True when set, False with timeout or read error
+        """
+        if self._batch_depth:
+            self._batch_flush()
+        try:
+            return _poll_bit(self._bus, self._address, AS7341_STATUS_2,
+                             self._buffer1, AS7341_STATUS_2_AVALID, poll_ms, timeout_ms)
+        except Exception as err:
+            print("I2C read_byte at 0x{:02X}, error".format(AS7341_STATUS_2), err)
+            self._errors += 1
+            return False
+
     def _modify_reg(self, reg, mask, flag=True):
         """ modify register <reg> with <mask>
             <flag> True  means 'or' with <mask> : set the bit(s)
@@ -258,11 +455,124 @@ class AS7341:
                       bank 1 is supposed be (pre-)selected by caller!
         """
         data = self._read_byte(reg)                 # read <reg>
-        if flag:
-            data |= mask                            # set bit(s)
-        else:
-            data &= (~mask)                         # reset bit(s)
-        self._write_byte(reg, data)                 # rewrite <reg>
+        self._write_byte(reg, _modify_bits(data, mask, flag))  # rewrite <reg>
+
+    def _batch_key(self, reg):
+        """ return shadow key of <reg>: bank 1 registers + 0x100 """
+        if 0x60 <= reg <= 0x74:
+            cfg0 = self._batch_shadow.get(AS7341_CFG_0)
+            if cfg0 is None:
+                cfg0 = self._read_byte(AS7341_CFG_0)
+            if cfg0 > 0 and cfg0 & AS7341_CFG_0_REG_BANK:
+                return reg | 0x100
+        return reg
+
+    def _batch_write(self, reg, data):
+        """ queue write of <data> (bytes) to <reg>, update the shadow copy
+            Writes which would not change a register are dropped.
+        """
+        shadow = self._batch_shadow
+        if len(data) == 1 and not _batch_ordered(reg):
+            key = self._batch_key(reg)
+            if shadow.get(key) == data[0] and self._batch_device.get(key) == data[0]:
+                return                          # no change
+        for i in range(len(data)):
+            key = self._batch_key(reg + i)
+            value = data[i]
+            if key == AS7341_ENABLE:
+                value &= ~AS7341_ENABLE_SMUXEN  # self-clearing
+            if not _batch_volatile(key):
+                shadow[key] = value
+        self._batch_ops.append((reg, data))
+
+    def _batch_flush(self, settle=0):
+        """ write queued register updates with the fewest transfers:
+            - writes to ordinary configuration registers are merged
+              (last value wins) and written as bursts of contiguous
+              registers, before the next ordered write
+            - ordered writes (see _batch_ordered()) keep their order,
+              back to back writes of the same register are combined
+            - after an ENABLE write with SMUXEN: wait until SMUX is loaded
+            then wait <settle> milliseconds (once)
+        """
+        ops = self._batch_ops
+        if not ops:
+            return
+        self._batch_ops = []
+        writes = []                             # (reg, bytes) in chip order
+        plain = {}                              # reg -> value, merged
+        for reg, data in ops:
+            if not _batch_ordered(reg, len(data)):
+                for i in range(len(data)):
+                    plain[reg + i] = data[i]
+                continue
+            self._batch_runs(plain, writes)
+            if writes and writes[-1][0] == reg and len(writes[-1][1]) == len(data):
+                last = writes[-1][1]
+                if reg == AS7341_ENABLE:
+                    if last == data:
+                        continue                # duplicate
+                elif reg not in (AS7341_STATUS, AS7341_FD_STATUS, AS7341_CONTROL):
+                    writes[-1] = (reg, data)    # last value wins
+                    continue
+            writes.append((reg, data))
+        self._batch_runs(plain, writes)
+        depth = self._batch_depth
+        self._batch_depth = 0                   # direct bus access
+        ok = True
+        for reg, data in writes:
+            if len(data) == 1:
+                written = self._write_byte(reg, data[0], 0)
+            else:
+                written = self._write_burst(reg, data, 0)
+            ok &= written
+            if written and reg == AS7341_ENABLE and data[0] & AS7341_ENABLE_SMUXEN:
+                self._wait_smux()
+        self._batch_depth = depth
+        if ok:
+            self._batch_device.update(self._batch_shadow)
+        else:                                   # chip state unknown: re-read
+            self._batch_shadow.clear()
+            self._batch_device.clear()
+        if settle:
+            sleep_ms(settle)
+
+    def _batch_discard(self, mark):
+        """ drop queued writes from index <mark>, rebuild the shadow copy
+            from the remaining (outer batch) writes
+        """
+        ops = self._batch_ops[:mark]
+        self._batch_ops = []
+        self._batch_shadow.clear()
+        for reg, data in ops:
+            self._batch_write(reg, data)
+
+    def _batch_runs(self, plain, writes):
+        """ move merged register values of <plain> to <writes>
+            as runs of contiguous registers
+        """
+        if not plain:
+            return
+        regs = sorted(plain)
+        start = 0
+        for i in range(1, len(regs) + 1):
+            if i == len(regs) or regs[i] != regs[i - 1] + 1:
+                writes.append((regs[start], bytes(plain[r] for r in regs[start:i])))
+                start = i
+        plain.clear()
+
+    def _wait_smux(self):
+        """ wait until SMUXEN is cleared: SMUX configuration loaded
+            return True when loaded, False with a read error or timeout
+        """
+        for _ in range(100):
+            data = self._read_byte(AS7341_ENABLE)
+            if data < 0:                        # read error: no retries
+                return False
+            if not (data & AS7341_ENABLE_SMUXEN):
+                return True
+            sleep_ms(1)
+        return False
 
     def _set_bank(self, bank=1):
         """ select registerbank
@@ -282,6 +592,10 @@ class AS7341:
         """ enable device (only power on) """
         self._write_byte(AS7341_ENABLE, AS7341_ENABLE_PON)
 
+    def get_enable(self):
+        """ return contents of ENABLE register (-1 with read error) """
+        return self._read_byte(AS7341_ENABLE)
+
     def disable(self):
         """ disable all functions and power off """
         self._set_bank(1)                           # CONFIG register is in bank 1
@@ -289,32 +603,122 @@ class AS7341:
         self._set_bank(0)
         self._write_byte(AS7341_ENABLE, 0x00)       # power off
 
-    def reset(self):
+    def reset(self, settle=50):
         """ Cycle power and check if AS7341 is (re-)connected
             When connected set (restore) measurement mode
+            <settle> is the wait (ms) after power-off and after power-on,
+            the register writes are combined (batch) without other delays
+            The result is also available with isconnected() afterwards.
+        """
+        if self._batch_depth:
+            self._batch_flush()                     # chip up to date
+        with self.batch(settle):
+            self.disable()                          # power-off ('reset')
+        with self.batch(settle):
+            self.enable()                           # (only) power-on
+        self._connected = self.check_id()
+        if self._connected:
+            with self.batch(0):
+                self.set_measure_mode(self._measuremode)    # configure chip
+        return self._connected
+
+    def check_id(self):
+        """ read the ID register, return True when it contains the AS7341 ID
+            (a single byte read, e.g. for a periodic presence check)
         """
-        self.disable()                              # power-off ('reset')
-        sleep_ms(50)                                # quiesce
-        self.enable()                               # (only) power-on
-        sleep_ms(50)                                # settle
         id = self._read_byte(AS7341_ID)             # obtain Part Number ID
         if id < 0:                                  # read error
             print("Failed to contact AS7341 at I2C address 0x{:02X}".format(self._address))
             return False
-        else:
-            if not (id & (~0x03)) == AS7341_ID_VALUE:  # ID in bits 7..2 bits
-                print("No AS7341: found 0x{:02X}, expected 0x{:02X}".format(id, AS7341_ID_VALUE))
-                return False
-        self.set_measure_mode(self._measuremode)    # configure chip
+        if not (id & (~0x03)) == AS7341_ID_VALUE:   # ID in bits 7..2 bits
+            print("No AS7341: found 0x{:02X}, expected 0x{:02X}".format(id, AS7341_ID_VALUE))
+            return False
         return True
 
+    def snapshot(self):
+        """ read all registers in 3 block reads (2 for bank 0 without
+            ASTATUS and counts, 1 for bank 1)
+            return an AS7341Snapshot or None with a read error
+        """
+        from as7341_snapshot import AS7341Snapshot, AS7341_SNAPSHOT_BANK0_LEN, \
+                                    AS7341_SNAPSHOT_BANK1, AS7341_SNAPSHOT_BANK1_LEN, \
+                                    AS7341_SNAPSHOT_BLOCKS
+        bank0 = bytearray(AS7341_SNAPSHOT_BANK0_LEN)
+        bank1 = bytearray(AS7341_SNAPSHOT_BANK1_LEN)
+        for reg, length in AS7341_SNAPSHOT_BLOCKS:
+            buf = bytearray(length)
+            if not self._read_block(reg, buf):
+                return None
+            bank0[reg - AS7341_ENABLE : reg - AS7341_ENABLE + length] = buf
+        cfg0 = bank0[AS7341_CFG_0 - AS7341_ENABLE] & (~AS7341_CFG_0_REG_BANK)
+        self._write_byte(AS7341_CFG_0, cfg0 | AS7341_CFG_0_REG_BANK, 0)
+        ok = self._read_block(AS7341_SNAPSHOT_BANK1, bank1)   # 0x60..0x74
+        self._write_byte(AS7341_CFG_0, cfg0, 0)
+        if not ok:
+            return None
+        return AS7341Snapshot(bank0, bank1, self._selection)
+
+    def restore(self, snapshot, settle=10):
+        """ rewrite the writable registers of <snapshot> (AS7341Snapshot)
+            in bursts of contiguous registers, reload the SMUX configuration
+            and finally restore ENABLE (and wait <settle> ms).
+            Typically after reset().
+        """
+        from as7341_snapshot import AS7341_SNAPSHOT_RUNS, AS7341_SNAPSHOT_BANK1, \
+                                    AS7341_SNAPSHOT_BANK1_RUNS
+        self._write_byte(AS7341_ENABLE, AS7341_ENABLE_PON, 0)  # stop, power on
+        cfg0 = snapshot.cfg_0 & (~AS7341_CFG_0_REG_BANK)
+        self._write_byte(AS7341_CFG_0, cfg0 | AS7341_CFG_0_REG_BANK, 0)
+        for reg, length in AS7341_SNAPSHOT_BANK1_RUNS:
+            i = reg - AS7341_SNAPSHOT_BANK1
+            self._write_burst(reg, snapshot.bank1[i : i + length], 0)
+        self._write_byte(AS7341_CFG_0, cfg0, 0)   # bank 0 and LOW_POWER, WLONG
+        for reg, length in AS7341_SNAPSHOT_RUNS:
+            i = reg - AS7341_ENABLE
+            self._write_burst(reg, snapshot.bank0[i : i + length], 0)
+        self._measuremode = snapshot.measure_mode
+        self._lowpower = bool(cfg0 & AS7341_CFG_0_LOW_POWER)
+        self._integration_ms = None
+        enable = snapshot.enable & (~AS7341_ENABLE_SMUXEN)
+        if snapshot.selection in AS7341_SMUX_SELECT:
+            self._write_byte(AS7341_CFG_6, AS7341_CFG_6_SMUX_CMD_WRITE, 0)
+            self._write_burst(0x00, AS7341_SMUX_SELECT[snapshot.selection], 0)
+            self._selection = snapshot.selection
+            self._write_byte(AS7341_ENABLE, AS7341_ENABLE_PON | AS7341_ENABLE_SMUXEN, 0)
+            self._wait_smux()                   # SMUXEN cleared when done
+        self._write_byte(AS7341_ENABLE, enable, settle)     # (re-)start
+
+    def batch(self, settle=10):
+        """ return context manager for write combining:
+                with sensor.batch():
+                    sensor.set_atime(29)
+                    sensor.set_astep(599)
+                    ...
+            Register writes are queued, bit updates of the same register
+            are merged (read-modify-write from a shadow copy without I2C
+            reads) and at the end all writes are done with the fewest byte
+            and burst writes and a single wait of <settle> milliseconds.
+            Reading a status register or the counts within the batch
+            writes the queued updates first. Batches may be nested.
+            When the block raises an exception its queued writes are
+            discarded; after a failed write the shadow copy is dropped.
+        """
+        return _AS7341Batch(self, settle)
+
     def isconnected(self):
         """ determine if AS7341 is successfully initialized (True/False) """
         return self._connected
 
+    def get_error_count(self):
+        """ return the number of failed I2C transfers since instantiation """
+        return self._errors
+
     def measurement_completed(self):
-        """ check if measurement completed (return True), otherwise return False """
-        return bool(self._read_byte(AS7341_STATUS_2) & AS7341_STATUS_2_AVALID)
+        """ check if measurement completed (return True), otherwise return False
+            (also False with a read error)
+        """
+        status = self._read_byte(AS7341_STATUS_2)
+        return status > 0 and bool(status & AS7341_STATUS_2_AVALID)
 
     def set_spectral_measurement(self, flag=True):
         """ enable (flag == True) spectral measurement, otherwise disable it """
@@ -324,6 +728,18 @@ class AS7341:
         """ enable (flag == True) SMUX, otherwise disable it """
         self._modify_reg(AS7341_ENABLE, AS7341_ENABLE_SMUXEN, flag)
 
+    def set_low_power(self, flag=True):
+        """ enable (flag == True) low power mode, otherwise disable it
+            The setting is remembered and applied by every start_measure(),
+            in stead of unconditionally clearing LOW_POWER.
+        """
+        self._lowpower = bool(flag)
+        self._modify_reg(AS7341_CFG_0, AS7341_CFG_0_LOW_POWER, self._lowpower)
+
+    def get_low_power(self):
+        """ return True when low power mode is desired, otherwise False """
+        return self._lowpower
+
     def set_measure_mode(self, mode=AS7341_CONFIG_INT_MODE_SPM):
         """ configure the AS7341 for a specific measurement mode
             when interrupt needed it must be configured separately
@@ -345,10 +761,11 @@ class AS7341:
         """
         if selection in AS7341_SMUX_SELECT:
             self._write_burst(0x00, AS7341_SMUX_SELECT[selection])
+            self._selection = selection
         else:
             print(selection, "is unknown in AS7341_SMUX_SELECT")
 
-    def start_measure(self, selection=None):
+    def start_measure(self, selection=None, timeout_ms=None):
         """ select SMUX configuration,
             Optionally select of change channel selection
             prepare and start measurement
@@ -356,21 +773,60 @@ class AS7341:
                   when a series of measurements with the same
                   channel selection is being performed.
                   (then use channel_selection() once)
+            In SPM mode wait for completion, with <timeout_ms> at most
+            (None: no limit), return False when timed out or with read error
         """
-        self._modify_reg(AS7341_CFG_0, AS7341_CFG_0_LOW_POWER, False)  # no low power
-        self.set_spectral_measurement(False)        # quiesce
-        self._write_byte(AS7341_CFG_6, AS7341_CFG_6_SMUX_CMD_WRITE) # write mode
-        if not selection == None:
-            self.channel_select(selection)
-        if self._measuremode == AS7341_CONFIG_INT_MODE_SPM:
-            self.set_smux(True)
-        elif self._measuremode == AS7341_CONFIG_INT_MODE_SYNS:
-            self.set_smux(True)
-            self.set_gpio_input(True)
-        self.set_spectral_measurement(True)
+        with self.batch():                          # combined register writes
+            self._modify_reg(AS7341_CFG_0, AS7341_CFG_0_LOW_POWER, self._lowpower)
+            self.set_spectral_measurement(False)    # quiesce
+            self._write_byte(AS7341_CFG_6, AS7341_CFG_6_SMUX_CMD_WRITE) # write mode
+            if not selection == None:
+                self.channel_select(selection)
+            if self._measuremode == AS7341_CONFIG_INT_MODE_SPM:
+                self.set_smux(True)
+            elif self._measuremode == AS7341_CONFIG_INT_MODE_SYNS:
+                self.set_smux(True)
+                self.set_gpio_input(True)
+            self.set_spectral_measurement(True)
         if self._measuremode == AS7341_CONFIG_INT_MODE_SPM:
-            while not self.measurement_completed():
-                sleep_ms(50)
+            return self._wait_completed(-1 if timeout_ms is None else timeout_ms)
+        return True
+
+    def program_step(self, selection, again=None, atime=None, astep=None):
+        """ stop a running measurement, apply gain code <again>, <atime>,
+            <astep> (None: unchanged) and SMUX configuration <selection>
+            and start the next measurement, without settle delays
+            (for back to back measurements, see as7341_plan.py).
+            Other bits of ENABLE (WEN, FDEN) are preserved.
+            return True when started, False with an I2C error
+        """
+        if selection not in AS7341_SMUX_SELECT:
+            print(selection, "is unknown in AS7341_SMUX_SELECT")
+            return False
+        enable = self._read_byte(AS7341_ENABLE)
+        if enable < 0:
+            return False
+        enable = (enable | AS7341_ENABLE_PON) & (~(AS7341_ENABLE_SP_EN | AS7341_ENABLE_SMUXEN))
+        ok = self._write_byte(AS7341_ENABLE, enable, 0)         # stop
+        if again is not None and 0 <= again <= 10:
+            ok &= self._write_byte(AS7341_CFG_1, again, 0)
+        if atime is not None and 0 <= atime <= 255:
+            ok &= self._write_byte(AS7341_ATIME, atime, 0)
+            self._integration_ms = None
+        if astep is not None and 0 <= astep <= 65534:
+            self._buffer2[0] = astep & 0xFF
+            self._buffer2[1] = (astep >> 8) & 0xFF
+            ok &= self._write_burst(AS7341_ASTEP, self._buffer2, 0)
+            self._integration_ms = None
+        ok &= self._write_byte(AS7341_CFG_6, AS7341_CFG_6_SMUX_CMD_WRITE, 0)
+        ok &= self._write_burst(0x00, AS7341_SMUX_SELECT[selection], 0)
+        if not ok:
+            return False
+        self._selection = selection
+        if not (self._write_byte(AS7341_ENABLE, enable | AS7341_ENABLE_SMUXEN, 0)
+                and self._wait_smux()):
+            return False
+        return self._write_byte(AS7341_ENABLE, enable | AS7341_ENABLE_SP_EN, 0)
 
     def get_channel_data(self, channel=0):
         """ read count of a single channel (channel in range 0..5)
@@ -396,22 +852,202 @@ class AS7341:
         """
         return self._read_all_channels()            # return a tuple!
 
+    def get_spectral_record(self):
+        """ obtain counts of all channels like get_spectral_data()
+            return a SpectralRecord with the counts (tuple), ASTATUS
+            (saturation flag and AGAIN_STATUS), the SMUX selection key,
+            the integration time and a timestamp (ticks_ms),
+            or None with a read error
+        """
+        counts = self._read_all_channels()
+        if not counts:
+            return None
+        if self._integration_ms is None:        # only after change
+            self._integration_ms = self.get_integration_time()
+        return SpectralRecord(tuple(counts), self._buffer13[0], self._selection,
+                              self._integration_ms, ticks_ms())
+
+    def get_spectral_record_into(self, batch, drop_saturated=False):
+        """ obtain counts of all channels and append them with status
+            information to <batch> (SpectralRecordBatch)
+            return True when appended, False with read error, full batch
+            or when dropped because of saturation
+        """
+        counts = self._read_all_channels()
+        if not counts:
+            return False
+        astatus = self._buffer13[0]
+        if drop_saturated and (astatus & AS7341_ASTATUS_ASAT_STATUS):
+            return False
+        if self._integration_ms is None:
+            self._integration_ms = self.get_integration_time()
+        return batch.append_values(counts, astatus, self._selection,
+                                   self._integration_ms, ticks_ms())
+
+    def get_spectral_data_into(self, counts, offset=0):
+        """ obtain counts of all channels into preallocated <counts>
+            (e.g. array('H', 6)) starting at index <offset>,
+            see get_spectral_data()
+            return True when successful, otherwise False
+        """
+        return self._read_all_channels_into(counts, offset)
+
+    def get_spectral_raw_into(self, buf):
+        """ read ASTATUS and the 6 counts (13 bytes, counts little endian,
+            not decoded) into <buf>, reading ASTATUS latches the counts
+            return True when successful, otherwise False
+        """
+        return self._read_block(AS7341_ASTATUS, buf)
+
+    def get_oversampled_data(self, n, method="median", trim=0.2, selection=None):
+        """ capture <n> measurements back to back with the current SMUX
+            configuration (or <selection> which is programmed once)
+            and reduce them per channel with <method>:
+              "median"  - median
+              "trimmed" - mean after removing fraction <trim> at both ends
+              "meanstd" - tuple (mean, standard deviation)
+            return list of 6 values (empty with a read error or when a
+            measurement did not complete)
+            The captures are stored in a preallocated buffer which is
+            reused by subsequent calls with the same or smaller <n>.
+            See also get_oversample_advice().
+        """
+        if n < 1:
+            return []
+        if not selection == None:
+            self.start_measure(selection)       # configure once
+        if self._oversample_buf is None or len(self._oversample_buf) < 6 * n:
+            self._oversample_buf = array('H', [0] * (6 * n))
+        buf = self._oversample_buf
+        enable = self._read_byte(AS7341_ENABLE) & (~AS7341_ENABLE_SP_EN)
+        if enable < 0:
+            return []
+        wait_ms = int(self.get_integration_time())
+        start = ticks_ms()
+        for k in range(n):
+            self._write_byte(AS7341_ENABLE, enable, 0)                      # stop
+            self._write_byte(AS7341_ENABLE, enable | AS7341_ENABLE_SP_EN, 0) # start
+            sleep_ms(wait_ms)
+            for _ in range(100):                # limited wait for completion
+                if self.measurement_completed():
+                    break
+                sleep_ms(1)
+            else:
+                print("Oversampled measurement", k, "timed out")
+                return []
+            if not self._read_all_channels_into(buf, 6 * k):
+                return []
+        elapsed = ticks_diff(ticks_ms(), start)
+        result = []
+        means = []
+        stddevs = []
+        peak = 0
+        column = [0] * n
+        for ch in range(6):
+            for k in range(n):
+                column[k] = buf[6 * k + ch]
+            column.sort()
+            mean = sum(column) / n
+            var = sum((x - mean) ** 2 for x in column) / n
+            means.append(mean)
+            stddevs.append(sqrt(var))
+            peak = max(peak, column[-1])
+            if method == "trimmed":
+                cut = int(n * trim)
+                kept = column[cut : n - cut] if n - 2 * cut > 0 else column
+                result.append(sum(kept) / len(kept))
+            elif method == "meanstd":
+                result.append((mean, sqrt(var)))
+            else:                               # median
+                mid = n // 2
+                result.append(column[mid] if n % 2 else (column[mid - 1] + column[mid]) / 2)
+        self._oversample_stats = (n, means, stddevs, peak, elapsed)
+        return result
+
+    def get_oversample_advice(self):
+        """ Compare the last oversampled capture (N short integrations)
+            with one long integration of N times the integration time.
+            The measured variance of each capture is split into photon
+            noise (gain factor * counts) and read noise (the remainder).
+            The signal of the long integration is N times larger, its
+            photon noise variance N times larger, but the read noise is
+            paid once in stead of N times. One long integration is better
+            when it fits in ATIME/ASTEP, does not saturate and gives the
+            higher SNR per unit time (SNR ** 2 / duration).
+            return dictionary with:
+              "prefer_long"    - True when one long integration is better
+              "atime", "astep" - settings for the long integration
+              "snr_short"      - measured SNR of the N averaged captures
+                                 (best channel, None without noise)
+              "snr_long"       - expected SNR of the long integration for
+                                 the same channel (None when not possible
+                                 or without noise)
+              "time_short_ms"  - measured duration of the N captures
+              "time_long_ms"   - expected duration of the long integration
+            or None when no oversampled capture was done yet
+            or with a read error
+        """
+        if self._oversample_stats is None:
+            return None
+        n, means, stddevs, peak, elapsed = self._oversample_stats
+        atime = self._read_byte(AS7341_ATIME)
+        astep = self._read_word(AS7341_ASTEP)
+        again = self._read_byte(AS7341_CFG_1)
+        if atime < 0 or astep < 0 or again < 0:
+            return None
+        if (atime + 1) * n - 1 <= 255:          # longer ATIME preferred
+            long_atime, long_astep = (atime + 1) * n - 1, astep
+        else:
+            long_atime, long_astep = atime, (astep + 1) * n - 1
+        fits = long_astep <= 65534
+        fullscale = min((long_atime + 1) * (long_astep + 1), 65535)
+        saturates = peak * n >= fullscale
+        tint = (atime + 1) * (astep + 1) * 2.78 / 1000
+        overhead = max(elapsed / n - tint, 0)   # per capture
+        time_long = tint * n + overhead
+        factor = 2 ** ((again & 0x1F) - 1)
+        snr_short = None                        # None: no noise observed
+        snr_long = None
+        for mean, std in zip(means, stddevs):
+            if std > 0:
+                snr = mean / std * sqrt(n)
+                if snr_short is None or snr > snr_short:
+                    snr_short = snr
+                    var = std * std
+                    photon = min(factor * mean, var)    # per capture
+                    snr_long = n * mean / sqrt(n * photon + (var - photon))
+        if not (fits and not saturates):
+            prefer_long = False
+            snr_long = None
+        elif snr_short is None:                 # no noise: only time counts
+            prefer_long = time_long < elapsed
+        else:
+            prefer_long = (snr_long * snr_long / max(time_long, 1e-3)
+                           > snr_short * snr_short / max(elapsed, 1e-3))
+        return {"prefer_long": prefer_long,
+                "atime": long_atime, "astep": long_astep,
+                "snr_short": snr_short, "snr_long": snr_long,
+                "time_short_ms": elapsed, "time_long_ms": time_long}
+
     def set_flicker_detection(self, flag=True):
         """ enable (flag == True) flicker detection or otherwise disable it """
         self._modify_reg(AS7341_ENABLE, AS7341_ENABLE_FDEN, flag)
 
     def get_flicker_frequency(self):
         """ Determine flicker frequency in Hz. Returns 100, 120 or 0
-            Integration time and gain for flicker detection is the same as for
-            other channels, the dedicated FD_TIME and FD_GAIN are not supported
-        """
-        self._modify_reg(AS7341_CFG_0, AS7341_CFG_0_LOW_POWER, False)  # no low power
-        self.set_spectral_measurement(False)
-        self._write_byte(AS7341_CFG_6, AS7341_CFG_6_SMUX_CMD_WRITE)
-        self.channel_select("FD")                   # select flicker detection only
-        self.set_smux(True)
-        self.set_spectral_measurement(True)
-        self.set_flicker_detection(True)
+            Integration time and gain for flicker detection are set with
+            set_fd_time() and set_fd_gain(), independent of spectral settings.
+            For continuous flicker detection without blocking see
+            as7341_flicker.FlickerMonitor.
+        """
+        with self.batch():                          # combined register writes
+            self._modify_reg(AS7341_CFG_0, AS7341_CFG_0_LOW_POWER, False)  # no low power
+            self.set_spectral_measurement(False)
+            self._write_byte(AS7341_CFG_6, AS7341_CFG_6_SMUX_CMD_WRITE)
+            self.channel_select("FD")               # select flicker detection only
+            self.set_smux(True)
+            self.set_spectral_measurement(True)
+            self.set_flicker_detection(True)
         for _ in range(10):                         # limited wait for completion
             fd_status = self._read_byte(AS7341_FD_STATUS)
             if fd_status & AS7341_FD_STATUS_FD_MEAS_VALID:
@@ -433,7 +1069,7 @@ class AS7341:
             return 0
         # print("FD_STATUS", "0x{:02X}".format(fd_status))
         self.set_flicker_detection(False)           # disable
-        self._write_byte(AS7341_FD_STATUS, 0x3C)    # reset clearable FD_STATUS bits
+        self.clear_fd_status()                      # reset clearable FD_STATUS bits
         if ((fd_status & AS7341_FD_STATUS_FD_100_VALID) and
             (fd_status & AS7341_FD_STATUS_FD_100HZ)):
             return 100
@@ -442,6 +1078,60 @@ class AS7341:
             return 120
         return 0
 
+    def set_fd_time(self, value=359):
+        """ set flicker detection integration time (range 0..2047)
+            fd_time = (<value> + 1) * 2.78 usec  (default 1 ms)
+            FD_GAIN (in FD_TIME_2) is preserved
+        """
+        if 0 <= value <= 2047:
+            self._write_byte(AS7341_FD_TIME_1, value & 0xFF)
+            data = self._read_byte(AS7341_FD_TIME_2)
+            if data < 0:                            # read error
+                return
+            data &= AS7341_FD_TIME_2_FD_GAIN
+            self._write_byte(AS7341_FD_TIME_2, data | (value >> 8))
+
+    def get_fd_time(self):
+        """ return actual flicker detection integration time (milliseconds)
+            or -1 with a read error
+        """
+        lo = self._read_byte(AS7341_FD_TIME_1)
+        hi = self._read_byte(AS7341_FD_TIME_2)
+        if lo < 0 or hi < 0:
+            return -1
+        hi &= AS7341_FD_TIME_2_FD_TIME_H
+        return ((hi << 8) + lo + 1) * 2.78 / 1000
+
+    def set_fd_gain(self, code):
+        """ set flicker detection gain (code in range 0..10 -> 0.5 .. 512)
+            same encoding as set_again(), FD_TIME bits are preserved
+        """
+        if 0 <= code <= 10:
+            data = self._read_byte(AS7341_FD_TIME_2)
+            if data < 0:                            # read error
+                return
+            data &= AS7341_FD_TIME_2_FD_TIME_H
+            self._write_byte(AS7341_FD_TIME_2, data | (code << 3))
+
+    def get_fd_gain(self):
+        """ obtain actual flicker detection gain code (in range 0 .. 10)
+            or -1 with a read error
+        """
+        data = self._read_byte(AS7341_FD_TIME_2)
+        if data < 0:
+            return -1
+        return data >> 3
+
+    def get_fd_status(self):
+        """ return contents of FD_STATUS register (-1 with read error) """
+        return self._read_byte(AS7341_FD_STATUS)
+
+    def clear_fd_status(self, mask=AS7341_FD_STATUS_CLEAR, settle=10):
+        """ clear flicker detection status bits (write 1 to clear),
+            by default all clearable bits
+        """
+        return self._write_byte(AS7341_FD_STATUS, mask & AS7341_FD_STATUS_CLEAR, settle)
+
     def set_gpio_input(self, enable=True):
         """ Configure GPIO for input and select
             input-sensitivity mode of operation:
@@ -501,6 +1191,11 @@ class AS7341:
         """ set ASTEP size (range 0..65534 -> 2.78 usec .. 182 msec) """
         if 0 <= value <= 65534:
             self._write_word(AS7341_ASTEP, value)
+            self._integration_ms = None
+
+    def get_astep(self):
+        """ return ASTEP (0..65534, -1 with read error) """
+        return self._read_word(AS7341_ASTEP)
 
     def get_astep_time(self):
         """ return actual step time (milliseconds) """
@@ -510,6 +1205,11 @@ class AS7341:
         """ set integration time (range 0..255) expressed in ASTEPs """
         if 0 <= value <= 255:
             self._write_byte(AS7341_ATIME, value)
+            self._integration_ms = None
+
+    def get_atime(self):
+        """ return ATIME (0..255, -1 with read error) """
+        return self._read_byte(AS7341_ATIME)
 
     def get_overflow_count(self):
         """ return maximum count for this (astep, atime) combination """
@@ -557,7 +1257,14 @@ class AS7341:
             0 -> 2.78, 255 -> 711.7 ms
             Note: The WEN bit in ENABLE should be set as well: set_wen()
         """
-        self._write_byte(AS7341_WTIME, code)
+        if 0 <= code <= 255:
+            self._write_byte(AS7341_WTIME, code)
+
+    def set_wlong(self, flag=True):
+        """ enable (flag=True) or otherwise disable WLONG:
+            the wait time of WTIME is multiplied by 16 (up to 11.4 sec)
+        """
+        self._modify_reg(AS7341_CFG_0, AS7341_CFG_0_WLONG, flag)
 
     def set_led_current(self, current):
         """ Control current of ONBOARD LED in milliamperes
@@ -578,6 +1285,78 @@ class AS7341:
         self._set_bank(0)
         sleep_ms(100)
 
+    def get_reflectance_data(self, current, pairs=1, settle=1, selection=None):
+        """ Paired measurement with ONBOARD LED on and off (ambient rejection)
+            <current> LED current in mA (4..20, even numbers)
+            <pairs> number of on/off pairs to average
+            <settle> milliseconds between LED switch and start of integration
+            <selection> optional key in AS7341_SMUX_SELECT
+            return a list of 6 ambient-subtracted counts (averaged),
+            or an empty list with a read error, when a measurement
+            did not complete or was saturated (ASAT, e.g. gain too high)
+            Registers are read once in advance, LED switching takes 3 byte
+            writes without read-modify-write and without settle delays.
+        """
+        if not 4 <= current <= 20 or pairs <= 0:
+            return []                           # LED config untouched
+        if not selection == None:
+            self.start_measure(selection)       # SMUX configuration
+        cfg0 = self._read_byte(AS7341_CFG_0)
+        enable = self._read_byte(AS7341_ENABLE)
+        if cfg0 < 0 or enable < 0:              # nothing to restore
+            return []
+        cfg0 &= (~AS7341_CFG_0_REG_BANK)
+        enable &= (~AS7341_ENABLE_SP_EN)
+        wait_ms = int(self.get_integration_time())
+        led_on = AS7341_LED_LED_ACT + ((current - 4) // 2)
+        self._set_bank(1)
+        config = self._read_byte(AS7341_CONFIG)
+        if config < 0:
+            self._write_byte(AS7341_CFG_0, cfg0, 0)     # bank 0
+            return []
+        self._write_byte(AS7341_CONFIG, config | AS7341_CONFIG_LED_SEL, 0)
+        self._write_byte(AS7341_CFG_0, cfg0, 0)     # bank 0
+        on_sum = [0] * 6
+        off_sum = [0] * 6
+        ok = True
+        for _ in range(pairs):
+            for led, total in ((led_on, on_sum), (0, off_sum)):
+                self._write_byte(AS7341_ENABLE, enable, 0)      # stop
+                self._write_byte(AS7341_CFG_0, cfg0 | AS7341_CFG_0_REG_BANK, 0)
+                self._write_byte(AS7341_LED, led, 0)
+                self._write_byte(AS7341_CFG_0, cfg0, 0)
+                if settle:
+                    sleep_ms(settle)
+                self._write_byte(AS7341_ENABLE, enable | AS7341_ENABLE_SP_EN, 0)
+                sleep_ms(wait_ms)
+                for _ in range(100):            # limited wait for completion
+                    if self.measurement_completed():
+                        break
+                    sleep_ms(1)
+                else:
+                    print("Reflectance measurement timed out")
+                    ok = False
+                    break
+                counts = self._read_all_channels()
+                if not counts:
+                    ok = False                  # read error
+                    break
+                if self._buffer13[0] & AS7341_ASTATUS_ASAT_STATUS:
+                    print("Reflectance measurement saturated")
+                    ok = False                  # difference meaningless
+                    break
+                for i in range(6):
+                    total[i] += counts[i]
+            if not ok:
+                break
+        self._write_byte(AS7341_CFG_0, cfg0 | AS7341_CFG_0_REG_BANK, 0)
+        self._write_byte(AS7341_LED, 0, 0)      # LED off
+        self._write_byte(AS7341_CONFIG, config & (~AS7341_CONFIG_LED_SEL), 0)
+        self._write_byte(AS7341_CFG_0, cfg0)    # bank 0
+        if not ok:
+            return []
+        return [max(on_sum[i] - off_sum[i], 0) // pairs for i in range(6)]
+
     def check_interrupt(self):
         """ Check for Spectral or Flicker Detect saturation interrupt """
         data = self._read_byte(AS7341_STATUS)
@@ -586,9 +1365,18 @@ class AS7341:
             return True
         return False
 
-    def clear_interrupt(self):
-        """ clear all interrupt signals """
-        self._write_byte(AS7341_STATUS, 0xFF)
+    def check_spectral_interrupt(self):
+        """ Check for spectral threshold interrupt (SINT) """
+        data = self._read_byte(AS7341_STATUS)
+        return data > 0 and bool(data & AS7341_STATUS_SINT)
+
+    def get_interrupt_status(self):
+        """ return contents of STATUS register (-1 with read error) """
+        return self._read_byte(AS7341_STATUS)
+
+    def clear_interrupt(self, mask=0xFF):
+        """ clear interrupt signals, by default all of them """
+        self._write_byte(AS7341_STATUS, mask)
 
     def set_spectral_interrupt(self, flag=True):
         """ enable (flag == True) or otherwise disable spectral interrupts """
@@ -609,7 +1397,8 @@ class AS7341:
         if lo < hi:
             self._write_word(AS7341_SP_TH_LOW, lo)
             self._write_word(AS7341_SP_TH_HIGH, hi)
-            sleep_ms(20)
+            if not self._batch_depth:
+                sleep_ms(20)
 
     def get_thresholds(self):
         """ obtain and return tuple with low and high threshold values """
@@ -626,4 +1415,10 @@ class AS7341:
         self._write_byte(AS7341_CONFIG, AS7341_CONFIG_INT_SEL | AS7341_CONFIG_INT_MODE_SYNS)
         self._set_bank(0)
 
+
+if __name__ == "__main__":                  # python -m as7341 (host)
+    import sys
+    from as7341_cli import main
+    sys.exit(main())
+
 #
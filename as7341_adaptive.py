@@ -0,0 +1,170 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Adaptive sampling rate for the AS7341
+
+    AdaptiveSampler measures at an interval between <min_interval_ms>
+    and <max_interval_ms>:
+      - when a channel changed more than <delta> counts plus <rel_delta>
+        times its previous count, the interval drops to <min_interval_ms>
+        (fast transitions are followed at the highest rate)
+      - when no channel changed that much, the interval is multiplied by
+        <backoff> (exponential back-off with stable light), up to
+        <max_interval_ms>
+    The intervals form levels: min_interval_ms * backoff ** level.
+    The number of samples per level, the number of triggered speed-ups and
+    the average interval are kept, to compare with fixed rate sampling.
+"""
+
+from array import array
+from math import ceil
+
+from as7341_compat import sleep_ms, ticks_ms, ticks_diff, ticks_add
+
+from as7341 import *
+
+
+class AdaptiveSampler:
+    """ Sample faster with changing light and slower with stable light """
+    def __init__(self, sensor, min_interval_ms, max_interval_ms, delta=50,
+                 rel_delta=0.0, backoff=2, selection=None):
+        """ <sensor> is an AS7341 instance, configured for ATIME, ASTEP, gain
+            <min_interval_ms>, <max_interval_ms> bounds of the interval
+            <delta> change (counts) of any channel considered significant
+            <rel_delta> additional change as fraction of the previous count
+            <backoff> factor (> 1) of interval increase with stable light
+            <selection> is a key in AS7341_SMUX_SELECT
+        """
+        self._sensor = sensor
+        self.min_interval_ms = max(1, min_interval_ms)
+        self.max_interval_ms = max(self.min_interval_ms, max_interval_ms)
+        self.delta = delta
+        self.rel_delta = rel_delta
+        self.backoff = max(backoff, 1.01)
+        self._selection = selection
+        levels = 1
+        interval = self.min_interval_ms
+        while interval < self.max_interval_ms:
+            interval *= self.backoff
+            levels += 1
+        self._levels = array('L', [0] * levels)    # samples per level
+        self._level = 0
+        self._interval = self.min_interval_ms
+        self._counts = array('H', [0] * 6)     # latest counts (reused)
+        self._last = array('H', [0] * 6)       # previous counts
+        self._deadline = None
+        self._samples = 0
+        self._triggers = 0                      # number of speed-ups
+        self._interval_sum = 0                  # sum of chosen intervals (ms)
+
+    def _changed(self):
+        """ True when a channel changed significantly since the last sample """
+        counts, last = self._counts, self._last
+        delta, rel = self.delta, self.rel_delta
+        for i in range(6):
+            if abs(counts[i] - last[i]) > delta + rel * last[i]:
+                return True
+        return False
+
+    def _level_interval(self, level):
+        """ return the interval (ms) of <level>, rounded up (with tolerance
+            for float rounding, e.g. 10 * 1.1 is 11, not 12)
+        """
+        return min(self.max_interval_ms,
+                   int(ceil(self.min_interval_ms * self.backoff ** level - 1e-6)))
+
+    def _adapt(self):
+        """ choose the interval until the next sample """
+        if self._samples > 1 and self._changed():
+            if self._level:
+                self._triggers += 1
+            self._level = 0
+            self._interval = self.min_interval_ms
+        elif self._samples > 1 and self._level < len(self._levels) - 1:
+            self._level += 1
+            self._interval = self._level_interval(self._level)
+        self._levels[self._level] += 1
+        self._interval_sum += self._interval
+
+    def sample(self):
+        """ wait for the next sample moment, measure and adapt the interval
+            return the counts (array of 6 integers, reused by the next call)
+            or None with a read error
+        """
+        sensor = self._sensor
+        if self._deadline is None:
+            self._deadline = ticks_ms()
+        delay = ticks_diff(self._deadline, ticks_ms())
+        if delay > 0:
+            sleep_ms(delay)
+        sensor.start_measure(self._selection)
+        if not sensor.get_spectral_data_into(self._counts):
+            self._deadline = ticks_add(self._deadline, self._interval)
+            return None
+        self._samples += 1
+        self._adapt()
+        self._last[:] = self._counts
+        self._deadline = ticks_add(self._deadline, self._interval)
+        if ticks_diff(self._deadline, ticks_ms()) < 0:
+            self._deadline = ticks_ms()         # overrun: no catch-up burst
+        return self._counts
+
+    def get_interval(self):
+        """ return the interval (ms) until the next sample """
+        return self._interval
+
+    def reset(self):
+        """ restart at the highest rate and clear the statistics """
+        for i in range(len(self._levels)):
+            self._levels[i] = 0
+        self._level = 0
+        self._interval = self.min_interval_ms
+        self._deadline = None
+        self._samples = 0
+        self._triggers = 0
+        self._interval_sum = 0
+
+    def get_stats(self):
+        """ return dictionary with number of samples, speed-ups, average
+            interval (ms) and rate (samples/s), samples per interval level
+            (list) and the fraction of samples saved against sampling
+            continuously at the highest rate
+        """
+        samples = self._samples
+        mean = self._interval_sum / samples if samples else self.min_interval_ms
+        return {
+            "samples": samples,
+            "triggers": self._triggers,
+            "interval_ms": self._interval,
+            "mean_interval_ms": mean,
+            "mean_rate": 1000 / mean,
+            "levels": list(self._levels),
+            "saved": 1 - self.min_interval_ms / mean,
+            }
+
+#
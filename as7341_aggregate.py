@@ -0,0 +1,201 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Streaming aggregation of AS7341 channel counts
+
+    Per channel the following is accumulated over a window of samples:
+    sum, sum of squares, minimum and maximum, and continuously an
+    exponentially weighted moving average (EWMA).
+    All accumulators are preallocated arrays and updates use only
+    small integer arithmetic, so no heap memory is allocated per sample.
+    When a window is complete a summary is latched: per channel
+    mean, standard deviation, minimum, maximum and EWMA (all 16-bits),
+    which can be packed in AS7341_SUMMARY_SIZE(channels) bytes.
+
+    Sum of squares is accumulated in 3 partial sums to stay within
+    small integer range, which limits the window to 8192 samples.
+    Mean and variance of a window are computed with integers, only the
+    final division and square root use floats.
+"""
+
+from array import array
+from math import sqrt
+import struct
+
+from as7341_compat import const
+
+AS7341_WINDOW_MAX = const(8192)
+AS7341_EWMA_FRAC  = const(4)                # fractional bits of EWMA
+
+def AS7341_SUMMARY_SIZE(channels=6):
+    """ return number of bytes of a packed summary """
+    return 2 + 10 * channels
+
+
+class SpectralAggregator:
+    """ Fixed-memory per channel statistics over windows of samples """
+    def __init__(self, window=60, channels=6, ewma_shift=3, callback=None):
+        """ <window> number of samples per summary (limited to 1..8192)
+            <channels> number of channels per sample
+            <ewma_shift> EWMA smoothing factor alpha = 1 / 2**<ewma_shift>
+            <callback> optional function called with this aggregator
+            as argument when a summary is latched
+        """
+        self._window = max(1, min(window, AS7341_WINDOW_MAX))
+        self._channels = channels
+        self._shift = ewma_shift
+        self._callback = callback
+        self._count = 0
+        self._sum = array('L', [0] * channels)
+        self._sq_hi = array('L', [0] * channels)        # sum of (h*h)
+        self._sq_mid = array('L', [0] * channels)       # sum of (2*h*l)
+        self._sq_lo = array('L', [0] * channels)        # sum of (l*l)
+        self._min = array('H', [0] * channels)
+        self._max = array('H', [0] * channels)
+        self._ewma = array('l', [0] * channels)         # fixed point
+        self._ewma_valid = False
+        self._counts = array('H', [0] * channels)       # sample buffer
+        self._summary = array('H', [0] * (5 * channels))
+        self._summary_count = 0                 # samples in latched summary
+        self._summaries = 0                     # number of summaries
+        self.reset()
+
+    def reset(self):
+        """ clear the window accumulators (EWMA is preserved) """
+        for i in range(self._channels):
+            self._sum[i] = 0
+            self._sq_hi[i] = 0
+            self._sq_mid[i] = 0
+            self._sq_lo[i] = 0
+            self._min[i] = 0xFFFF
+            self._max[i] = 0
+        self._count = 0
+
+    def update(self, counts):
+        """ add one sample (sequence of channel counts)
+            return True when this sample completed a window
+        """
+        if len(counts) < self._channels:        # e.g. failed read
+            return False
+        shift = self._shift
+        if not self._ewma_valid:
+            for i in range(self._channels):
+                self._ewma[i] = counts[i] << AS7341_EWMA_FRAC
+            self._ewma_valid = True
+        for i in range(self._channels):
+            x = counts[i]
+            self._sum[i] += x
+            h = x >> 8
+            l = x & 0xFF
+            self._sq_hi[i] += h * h
+            self._sq_mid[i] += 2 * h * l
+            self._sq_lo[i] += l * l
+            if x < self._min[i]:
+                self._min[i] = x
+            if x > self._max[i]:
+                self._max[i] = x
+            e = self._ewma[i]
+            self._ewma[i] = e + (((x << AS7341_EWMA_FRAC) - e) >> shift)
+        self._count += 1
+        if self._count >= self._window:
+            self._latch()
+            return True
+        return False
+
+    def update_from(self, sensor):
+        """ read the latest counts from AS7341 <sensor> and add them
+            return True when this sample completed a window
+        """
+        if sensor.get_spectral_data_into(self._counts):
+            return self.update(self._counts)
+        return False
+
+    def _latch(self):
+        """ compute the summary of the current window and restart """
+        n = self._count
+        for i in range(self._channels):
+            total = self._sum[i]
+            sumsq = ((self._sq_hi[i] << 16) + (self._sq_mid[i] << 8)
+                     + self._sq_lo[i])
+            # variance in integers: with single precision floats (MicroPython)
+            # sumsq / n - mean ** 2 cancels out with large counts, small noise
+            var = max(n * sumsq - total * total, 0) / (n * n)
+            j = 5 * i
+            self._summary[j] = (2 * total + n) // (2 * n)   # rounded mean
+            self._summary[j + 1] = min(int(sqrt(var) + 0.5), 0xFFFF)
+            self._summary[j + 2] = self._min[i]
+            self._summary[j + 3] = self._max[i]
+            self._summary[j + 4] = ((self._ewma[i] + (1 << (AS7341_EWMA_FRAC - 1)))
+                                    >> AS7341_EWMA_FRAC)
+        self._summary_count = n
+        self._summaries += 1
+        self.reset()
+        if self._callback is not None:
+            self._callback(self)
+
+    def flush(self):
+        """ latch a summary of an incomplete window (when not empty)
+            return True when a summary was latched
+        """
+        if self._count > 0:
+            self._latch()
+            return True
+        return False
+
+    def get_summary(self):
+        """ return latched summary as tuple of per channel tuples
+            (mean, stddev, min, max, ewma)
+        """
+        s = self._summary
+        return tuple(tuple(s[5 * i : 5 * i + 5]) for i in range(self._channels))
+
+    def get_summary_count(self):
+        """ return number of samples in the latched summary """
+        return self._summary_count
+
+    def get_ewma(self, channel):
+        """ return the current EWMA of <channel> (float) """
+        return self._ewma[channel] / (1 << AS7341_EWMA_FRAC)
+
+    def pack_into(self, buf, offset=0):
+        """ pack latched summary little endian into <buf> at <offset>:
+            sample count followed by mean, stddev, min, max, ewma per channel
+            return number of bytes written
+        """
+        struct.pack_into("<H", buf, offset, self._summary_count)
+        for i in range(5 * self._channels):
+            struct.pack_into("<H", buf, offset + 2 + 2 * i, self._summary[i])
+        return AS7341_SUMMARY_SIZE(self._channels)
+
+    def pack(self):
+        """ return latched summary as bytes (see pack_into) """
+        buf = bytearray(AS7341_SUMMARY_SIZE(self._channels))
+        self.pack_into(buf)
+        return bytes(buf)
+
+#
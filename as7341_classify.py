@@ -0,0 +1,217 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Spectral signature classification with a nearest-neighbour index
+    (Linux host, NumPy)
+
+    Readings (e.g. from get_spectral_data(), or combined readings of several
+    channel mappings) are normalized so that only the spectral shape counts:
+    "l2" divides by the Euclidean norm, "sum" by the sum of the counts,
+    None leaves the readings as they are.
+    SpectralIndex builds a KD-tree over the normalized reference signatures
+    (flat NumPy arrays, no Python objects per node) and answers k-nearest
+    neighbour queries for single readings and batches. Batches are much
+    faster per reading than single queries: all readings of a batch descend
+    the tree together.
+    The index, including the tree, is saved to and loaded from a single
+    .npz file, so it is not rebuilt at startup.
+"""
+
+import numpy as np
+
+AS7341_INDEX_LEAF_SIZE = 128
+
+
+def normalize(readings, norm="l2"):
+    """ return <readings> (1 or 2 dimensional) as normalized float array """
+    data = np.asarray(readings, dtype=np.float64)
+    if norm is None:
+        return data
+    if norm == "l2":
+        scale = np.sqrt((data * data).sum(axis=-1, keepdims=True))
+    elif norm == "sum":
+        scale = np.abs(data).sum(axis=-1, keepdims=True)
+    else:
+        raise ValueError("unknown normalization: {}".format(norm))
+    return data / np.where(scale > 0, scale, 1.0)
+
+
+class SpectralIndex:
+    """ KD-tree over reference signatures with labels """
+    def __init__(self, signatures, labels, norm="l2", leaf_size=AS7341_INDEX_LEAF_SIZE):
+        """ <signatures> array (N x D) of reference readings
+            <labels> sequence of N labels (strings)
+            <norm> normalization, see normalize()
+        """
+        self.norm = norm
+        self.labels = np.asarray(labels, dtype=str)
+        points = normalize(signatures, norm)
+        if points.ndim != 2 or len(points) != len(self.labels):
+            raise ValueError("signatures must be N x D with N labels")
+        self._build(points, max(1, leaf_size))
+
+    def _build(self, points, leaf_size):
+        """ build the tree: points are reordered so every node covers a
+            contiguous range [start, end)
+        """
+        order = np.arange(len(points))
+        dims, splits, lefts, rights, starts, ends = [], [], [], [], [], []
+
+        def node(start, end):
+            index = len(dims)
+            dims.append(-1)
+            splits.append(0.0)
+            lefts.append(-1)
+            rights.append(-1)
+            starts.append(start)
+            ends.append(end)
+            if end - start > leaf_size:
+                block = points[order[start:end]]
+                spread = block.max(axis=0) - block.min(axis=0)
+                dim = int(spread.argmax())
+                if spread[dim] > 0:
+                    mid = (end - start) // 2
+                    part = np.argpartition(block[:, dim], mid)
+                    order[start:end] = order[start:end][part]
+                    dims[index] = dim
+                    splits[index] = float(points[order[start + mid], dim])
+                    lefts[index] = node(start, start + mid)
+                    rights[index] = node(start + mid, end)
+            return index
+
+        node(0, len(points))
+        self._points = points[order]
+        self._order = order                     # tree position -> signature
+        self._dims = np.array(dims, dtype=np.int32)
+        self._splits = np.array(splits, dtype=np.float64)
+        self._lefts = np.array(lefts, dtype=np.int32)
+        self._rights = np.array(rights, dtype=np.int32)
+        self._starts = np.array(starts, dtype=np.int64)
+        self._ends = np.array(ends, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._points)
+
+    def _query_many(self, q, k):
+        """ k nearest neighbours of the normalized points <q> (Q x D):
+            return (squared distances, tree positions), both Q x k, sorted
+            All queries descend the tree together: every stack entry holds
+            the queries which still have to visit a node, with their lower
+            distance bounds, so the leaves are scanned with one array
+            operation for all queries at the same time.
+        """
+        best_d = np.full((len(q), k), np.inf)
+        best_i = np.full((len(q), k), -1, dtype=np.int64)
+        dims, splits = self._dims, self._splits
+        lefts, rights = self._lefts, self._rights
+        stack = [(0, np.arange(len(q)), np.zeros(len(q)))]
+        while stack:
+            node, rows, bound = stack.pop()
+            live = bound <= best_d[rows, -1]    # prune on k-th distance
+            if not live.all():
+                rows, bound = rows[live], bound[live]
+            if not len(rows):
+                continue
+            dim = dims[node]
+            if dim < 0:                         # leaf: brute force
+                start, end = self._starts[node], self._ends[node]
+                diff = q[rows, None, :] - self._points[None, start:end]
+                d = np.einsum("ijk,ijk->ij", diff, diff)
+                cand_d = np.hstack((best_d[rows], d))
+                cand_i = np.hstack((best_i[rows],
+                                    np.broadcast_to(np.arange(start, end), d.shape)))
+                keep = np.argsort(cand_d, axis=1, kind="stable")[:, :k]
+                best_d[rows] = np.take_along_axis(cand_d, keep, axis=1)
+                best_i[rows] = np.take_along_axis(cand_i, keep, axis=1)
+                continue
+            delta = q[rows, dim] - splits[node]
+            far = np.maximum(bound, delta * delta)
+            left = delta < 0
+            right = ~left
+            stack.append((rights[node], rows[left], far[left]))
+            stack.append((lefts[node], rows[right], far[right]))
+            stack.append((rights[node], rows[right], bound[right]))
+            stack.append((lefts[node], rows[left], bound[left]))
+        return best_d, best_i
+
+    def query(self, readings, k=1):
+        """ k nearest reference signatures of one reading (1-D) or a batch
+            (2-D), return (distances, indices) with shape (k,) or (Q, k);
+            indices refer to the original order of the signatures,
+            -1 when the index has less than k signatures
+        """
+        q = normalize(readings, self.norm)
+        single = q.ndim == 1
+        q = np.atleast_2d(q)
+        d, i = self._query_many(q, k)
+        distances = np.sqrt(d)
+        indices = np.where(i >= 0, self._order[np.maximum(i, 0)], -1)
+        if single:
+            return distances[0], indices[0]
+        return distances, indices
+
+    def classify(self, readings, k=1):
+        """ return the label (majority of k nearest) of one reading,
+            or an array of labels for a batch
+        """
+        _, indices = self.query(readings, k)
+        single = indices.ndim == 1
+        indices = np.atleast_2d(indices)
+        result = []
+        for row in indices:
+            labels = self.labels[row[row >= 0]]
+            values, counts = np.unique(labels, return_counts=True)
+            result.append(values[counts.argmax()] if len(values) else "")
+        return result[0] if single else np.array(result)
+
+    def save(self, path):
+        """ save signatures, labels and the tree to <path> (.npz) """
+        np.savez(path, norm=np.array("" if self.norm is None else self.norm),
+                 labels=self.labels, points=self._points, order=self._order,
+                 dims=self._dims, splits=self._splits, lefts=self._lefts,
+                 rights=self._rights, starts=self._starts, ends=self._ends)
+
+    @classmethod
+    def load(cls, path):
+        """ return the SpectralIndex saved in <path> (without rebuilding) """
+        index = cls.__new__(cls)
+        with np.load(path) as data:             # closes the file
+            norm = str(data["norm"])
+            index.norm = norm or None
+            index.labels = data["labels"]
+            index._points = data["points"]
+            index._order = data["order"]
+            index._dims = data["dims"]
+            index._splits = data["splits"]
+            index._lefts = data["lefts"]
+            index._rights = data["rights"]
+            index._starts = data["starts"]
+            index._ends = data["ends"]
+        return index
+
+#
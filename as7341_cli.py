@@ -0,0 +1,262 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Command line tool for the AS7341 on a host (CPython)
+
+    python -m as7341 [--bus N|PATH|sim] [--addr ADDR] COMMAND ...
+
+      capture   measurements with one or more channel mappings at a given
+                rate, to stdout, a CSV file or a binary file
+      bench     samples per second and latency per driver operation
+      dump      register snapshot (named fields or raw bytes)
+
+    --bus sim runs against the simulated AS7341 of as7341_sim.py.
+
+    Binary capture files consist of fixed size little endian records
+    (AS7341_CLI_RECORD): timestamp (float64, seconds since the epoch),
+    index of the mapping in the selection list (uint8), ASTATUS (uint8)
+    and the 6 counts (uint16).
+"""
+
+import argparse
+import struct
+import sys
+import time
+
+from as7341 import *
+
+AS7341_CLI_RECORD = "<dBB6H"                # 22 bytes per measurement
+AS7341_CLI_FORMATS = ("csv", "bin")
+
+
+def open_bus(spec):
+    """ return I2C object for <spec>: bus number, device path or 'sim' """
+    if spec == "sim":
+        from as7341_sim import SimulatedI2C
+        return SimulatedI2C()
+    from as7341_linux import LinuxI2C
+    return LinuxI2C(int(spec) if spec.isdigit() else spec)
+
+
+def open_sensor(args):
+    """ return configured AS7341 instance or None """
+    sensor = AS7341(open_bus(args.bus), args.addr)
+    if not sensor.isconnected():
+        print("Failed to contact AS7341 at I2C address 0x{:02X}".format(args.addr),
+              file=sys.stderr)
+        return None
+    sensor.set_measure_mode(AS7341_MODE_SPM)
+    if getattr(args, "atime", None) is not None:
+        sensor.set_atime(args.atime)
+    if getattr(args, "astep", None) is not None:
+        sensor.set_astep(args.astep)
+    if getattr(args, "again", None) is not None:
+        sensor.set_again(args.again)
+    return sensor
+
+
+def _selections(text):
+    """ argparse type: comma separated list of AS7341_SMUX_SELECT keys """
+    keys = [key for key in text.split(",") if key]
+    for key in keys:
+        if key not in AS7341_SMUX_SELECT:
+            raise argparse.ArgumentTypeError("unknown selection: {}".format(key))
+    return keys
+
+
+def capture(args):
+    """ capture measurements until --count reached or interrupted
+        Driver diagnostics (print) go to stderr meanwhile, so they cannot
+        mix into CSV or binary data written to stdout.
+    """
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        return _capture(args, stdout)
+    finally:
+        sys.stdout = stdout
+
+
+def _capture(args, stdout):
+    """ capture with <stdout> as the original standard output """
+    sensor = open_sensor(args)
+    if sensor is None:
+        return 1
+    fmt = args.format
+    if fmt is None:
+        fmt = "bin" if args.output.endswith(".bin") else "csv"
+    if args.output == "-":
+        out = stdout.buffer if fmt == "bin" else stdout
+    else:
+        out = open(args.output, "wb" if fmt == "bin" else "w")
+    packer = struct.Struct(AS7341_CLI_RECORD)
+    if fmt == "csv":
+        out.write("time,selection,astatus,ch0,ch1,ch2,ch3,ch4,ch5\n")
+    interval = 1.0 / args.rate if args.rate > 0 else 0.0
+    single = len(args.select) == 1
+    if single:
+        sensor.channel_select(args.select[0])   # once: no SMUX reload per sample
+    samples = 0
+    deadline = time.monotonic()
+    try:
+        while args.count == 0 or samples < args.count:
+            for index, selection in enumerate(args.select):
+                sensor.start_measure(None if single else selection)
+                record = sensor.get_spectral_record()
+                if record is None:
+                    continue
+                now = time.time()
+                if fmt == "bin":
+                    out.write(packer.pack(now, index, record.astatus, *record.counts))
+                else:
+                    out.write("{:.6f},{},{:d},{}\n".format(now, selection,
+                              record.astatus, ",".join(str(c) for c in record.counts)))
+            samples += 1
+            if interval:
+                deadline += interval
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    deadline = time.monotonic()     # overrun: no catch-up burst
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out not in (stdout, stdout.buffer):
+            out.close()
+        else:
+            out.flush()
+    print("{:d} samples".format(samples), file=sys.stderr)
+    return 0
+
+
+def _timed(func, count):
+    """ return (min, average, max) duration of <func>() in milliseconds """
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times), sum(times) / len(times), max(times)
+
+
+def bench(args):
+    """ measure throughput and per-operation latency """
+    sensor = open_sensor(args)
+    if sensor is None:
+        return 1
+    sensor.channel_select(args.select[0])
+    sensor.start_measure()
+    n = args.samples
+    operations = (
+        ("check_id (1 byte read)", sensor.check_id),
+        ("get_spectral_data (13 byte read)", sensor.get_spectral_data),
+        ("get_spectral_record", sensor.get_spectral_record),
+        ("measurement_completed", sensor.measurement_completed),
+        ("set_again (write)", lambda: sensor.set_again(sensor.get_again())),
+        ("set_spectral_measurement (RMW)", lambda: sensor.set_spectral_measurement(False)),
+        ("start_measure", sensor.start_measure),
+        )
+    print("{:36s} {:>9s} {:>9s} {:>9s}".format("operation (ms)", "min", "avg", "max"))
+    for name, func in operations:
+        print("{:36s} {:9.3f} {:9.3f} {:9.3f}".format(name, *_timed(func, n)))
+    start = time.perf_counter()
+    for _ in range(n):
+        sensor.start_measure()
+        sensor.get_spectral_record()
+    elapsed = time.perf_counter() - start
+    print("Integration time: {:.2f} ms, {:.1f} samples/s ({:d} samples)".format(
+          sensor.get_integration_time(), n / elapsed, n))
+    print("I2C errors: {:d}".format(sensor.get_error_count()))
+    return 0
+
+
+def dump(args):
+    """ print register snapshot of the live device state
+        (read with plain I2C transactions: AS7341() would reset the device)
+    """
+    from as7341_snapshot import read_snapshot
+    try:
+        snapshot = read_snapshot(open_bus(args.bus), args.addr)
+    except OSError as err:
+        print("Failed to read AS7341 at I2C address 0x{:02X}:".format(args.addr), err,
+              file=sys.stderr)
+        return 1
+    if snapshot.id & (~0x03) != AS7341_ID_VALUE:
+        print("No AS7341 at I2C address 0x{:02X}: ID 0x{:02X}".format(args.addr, snapshot.id),
+              file=sys.stderr)
+        return 1
+    if args.raw:
+        for base, data in ((0x60, snapshot.bank1), (0x80, snapshot.bank0)):
+            for i in range(0, len(data), 16):
+                print("0x{:02X}: {}".format(base + i,
+                      " ".join("{:02X}".format(b) for b in data[i : i + 16])))
+    else:
+        for name, value in snapshot.fields().items():
+            print("{:18s} {}".format(name, value))
+    return 0
+
+
+def main(argv=None):
+    """ parse arguments and run the command, return exit status """
+    parser = argparse.ArgumentParser(prog="python -m as7341",
+                                     description="AS7341 capture, benchmark and register dump")
+    parser.add_argument("--bus", default="1", help="I2C bus number, device path or 'sim'")
+    parser.add_argument("--addr", type=lambda x: int(x, 0), default=AS7341_I2C_ADDRESS,
+                        help="I2C address (default 0x39)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("capture", help="capture measurements")
+    p.add_argument("--select", type=_selections, default=["F1F4CN"],
+                   help="comma separated channel mappings (default F1F4CN)")
+    p.add_argument("--again", type=int, help="gain code 0..10")
+    p.add_argument("--atime", type=int, help="ATIME 0..255")
+    p.add_argument("--astep", type=int, help="ASTEP 0..65534")
+    p.add_argument("--rate", type=float, default=0, help="samples/s (0: as fast as possible)")
+    p.add_argument("--count", type=int, default=0, help="number of samples (0: until interrupted)")
+    p.add_argument("--output", default="-", help="file name or '-' for stdout")
+    p.add_argument("--format", choices=AS7341_CLI_FORMATS,
+                   help="default: 'bin' for *.bin, otherwise 'csv'")
+    p.set_defaults(func=capture)
+
+    p = commands.add_parser("bench", help="throughput and latency")
+    p.add_argument("--select", type=_selections, default=["F1F4CN"])
+    p.add_argument("--again", type=int)
+    p.add_argument("--atime", type=int)
+    p.add_argument("--astep", type=int)
+    p.add_argument("--samples", type=int, default=100)
+    p.set_defaults(func=bench)
+
+    p = commands.add_parser("dump", help="register snapshot")
+    p.add_argument("--raw", action="store_true", help="hexadecimal register contents")
+    p.set_defaults(func=dump)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+#
@@ -0,0 +1,67 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" MicroPython compatibility for CPython (e.g. on a Linux host)
+
+    Provides const() and the time functions sleep_ms(), ticks_ms(),
+    ticks_us(), ticks_add() and ticks_diff(): on MicroPython the built-in versions,
+    on CPython equivalents with the same wrap-around behaviour.
+"""
+
+try:
+    from micropython import const
+except ImportError:                         # CPython
+    def const(value):
+        return value
+
+try:
+    from time import sleep_ms, ticks_ms, ticks_us, ticks_add, ticks_diff
+except ImportError:                         # CPython
+    from time import sleep, monotonic_ns
+
+    _TICKS_PERIOD = const(1 << 30)          # same as MicroPython ports
+    _TICKS_MAX    = const(_TICKS_PERIOD - 1)
+    _TICKS_HALF   = const(_TICKS_PERIOD // 2)
+
+    def sleep_ms(ms):
+        if ms > 0:
+            sleep(ms / 1000)
+
+    def ticks_ms():
+        return (monotonic_ns() // 1000000) & _TICKS_MAX
+
+    def ticks_us():
+        return (monotonic_ns() // 1000) & _TICKS_MAX
+
+    def ticks_add(ticks, delta):
+        return (ticks + delta) & _TICKS_MAX
+
+    def ticks_diff(ticks1, ticks2):
+        return ((ticks1 - ticks2 + _TICKS_HALF) & _TICKS_MAX) - _TICKS_HALF
+
+#
@@ -0,0 +1,273 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Low-power duty-cycle scheduler for the AS7341
+
+    The scheduler takes a sample interval and a latency budget (both in
+    milliseconds) and selects for every cycle the power strategy with the
+    lowest estimated energy which still meets the latency budget:
+
+      - AS7341_DUTY_WTIME:     sensor re-starts automatically (WEN + WTIME),
+                               results are ready when the host asks for them
+      - AS7341_DUTY_LOW_POWER: host starts every measurement, the sensor
+                               idles with CFG_0 LOW_POWER set in between
+      - AS7341_DUTY_POWER_OFF: sensor is powered off (PON=0) between samples
+                               with disable()/enable()
+
+    The supply currents below are approximate typical values,
+    they can be adjusted per deployment with the <currents> argument.
+"""
+
+from as7341_compat import sleep_ms, ticks_ms, ticks_diff, ticks_add
+
+from as7341 import *
+
+AS7341_DUTY_WTIME     = const(0)
+AS7341_DUTY_LOW_POWER = const(1)
+AS7341_DUTY_POWER_OFF = const(2)
+
+AS7341_DUTY_NAMES = ("wtime", "low_power", "power_off")
+
+# approximate supply currents (microamperes) in the different states
+AS7341_DUTY_CURRENTS = {
+    "active": 200,                  # integration in progress
+    "wait": 60,                     # idle with PON set (WTIME, between starts)
+    "low_power": 30,                # idle with LOW_POWER set
+    "sleep": 1,                     # powered off (PON=0)
+    }
+
+# host overhead (milliseconds) with the write settle delays of this driver
+AS7341_DUTY_START_MS   = const(60)  # start_measure() without SMUX reload
+AS7341_DUTY_SMUX_MS    = const(100) # reload of the SMUX configuration
+AS7341_DUTY_POWERUP_MS = const(50)  # enable() + set_measure_mode()
+AS7341_DUTY_MARGIN_MS  = const(100) # beyond the expected completion
+
+AS7341_WTIME_STEP = 2.78            # milliseconds per WTIME step
+
+
+class DutyCycleScheduler:
+    """ Run spectral measurements at a fixed interval with minimal energy """
+    def __init__(self, sensor, interval_ms, latency_ms, selection=None,
+                 vdd=1.8, currents=None):
+        """ <sensor> is an AS7341 instance, already configured for
+            ATIME, ASTEP and gain (SPM mode is used by the scheduler)
+            <interval_ms> is the target time between samples
+            <latency_ms> is the allowed delay between the scheduled
+            sample moment and availability of the counts
+            <selection> is a key in AS7341_SMUX_SELECT
+            <vdd> is the supply voltage for the energy estimate
+        """
+        self._sensor = sensor
+        self.interval_ms = interval_ms
+        self.latency_ms = latency_ms
+        self._selection = selection
+        self._vdd = vdd
+        self._currents = dict(AS7341_DUTY_CURRENTS)
+        if currents is not None:
+            self._currents.update(currents)
+        self._integration_ms = sensor.get_integration_time()
+        self._strategy = None                   # nothing configured yet
+        self._wtime_ms = 0                      # WTIME of auto re-start
+        self._deadline = None                   # moment of next sample
+        self._samples = 0
+        self._energy_uj = 0.0                   # accumulated estimate
+
+    def update_integration_time(self):
+        """ re-read integration time after a change of ATIME or ASTEP """
+        self._integration_ms = self._sensor.get_integration_time()
+
+    def _wtime_code(self, wait_ms):
+        """ return tuple (WTIME code, WLONG flag) for <wait_ms>
+            or None when out of range
+        """
+        if wait_ms < AS7341_WTIME_STEP:
+            return None
+        code = int(wait_ms / AS7341_WTIME_STEP + 0.5) - 1
+        if code <= 255:
+            return (code, False)
+        code = int(wait_ms / (16 * AS7341_WTIME_STEP) + 0.5) - 1
+        if code <= 255:
+            return (code, True)
+        return None
+
+    def latency(self, strategy):
+        """ return estimated latency (ms) of <strategy> """
+        tint = self._integration_ms
+        if strategy == AS7341_DUTY_WTIME:
+            return 0                            # result is waiting
+        if strategy == AS7341_DUTY_LOW_POWER:
+            return tint + AS7341_DUTY_START_MS
+        return (tint + AS7341_DUTY_START_MS + AS7341_DUTY_SMUX_MS
+                + AS7341_DUTY_POWERUP_MS)
+
+    def energy(self, strategy, interval_ms=None):
+        """ return estimated energy (microjoule) per sample of <strategy> """
+        if interval_ms is None:
+            interval_ms = self.interval_ms
+        c = self._currents
+        tint = self._integration_ms
+        if strategy == AS7341_DUTY_WTIME:
+            charge = c["active"] * tint + c["wait"] * (interval_ms - tint)
+        elif strategy == AS7341_DUTY_LOW_POWER:
+            active = tint + AS7341_DUTY_START_MS
+            charge = c["active"] * active + c["low_power"] * (interval_ms - active)
+        else:
+            active = self.latency(strategy)
+            charge = c["active"] * active + c["sleep"] * (interval_ms - active)
+        return self._vdd * max(charge, 0) / 1000    # uA * ms * V = nJ -> uJ
+
+    def select(self, interval_ms=None):
+        """ return the strategy with lowest energy within the latency budget
+            When no strategy fits the budget the one with the lowest latency
+            is selected (possible only when WTIME is out of range)
+        """
+        if interval_ms is None:
+            interval_ms = self.interval_ms
+        candidates = []
+        if self._wtime_code(interval_ms - self._integration_ms) is not None:
+            candidates.append(AS7341_DUTY_WTIME)
+        for strategy in (AS7341_DUTY_LOW_POWER, AS7341_DUTY_POWER_OFF):
+            if self.latency(strategy) < interval_ms:
+                candidates.append(strategy)
+        if not candidates:
+            return AS7341_DUTY_LOW_POWER        # continuous sampling
+        best = None
+        for strategy in candidates:
+            if self.latency(strategy) <= self.latency_ms:
+                if best is None or self.energy(strategy, interval_ms) < self.energy(best, interval_ms):
+                    best = strategy
+        if best is None:                        # budget too tight
+            best = min(candidates, key=self.latency)
+        return best
+
+    def _configure(self, strategy, interval_ms):
+        """ (re-)program the sensor when the strategy changes
+            return False when the free running measurement did not start
+        """
+        sensor = self._sensor
+        if self._strategy == AS7341_DUTY_POWER_OFF:
+            sensor.enable()                     # leave power-off
+            sensor.set_measure_mode(AS7341_MODE_SPM)
+        if strategy == AS7341_DUTY_WTIME:
+            code, wlong = self._wtime_code(interval_ms - self._integration_ms)
+            self._wtime_ms = (code + 1) * AS7341_WTIME_STEP * (16 if wlong else 1)
+            sensor.set_low_power(False)
+            sensor.set_wtime(code)
+            sensor.set_wlong(wlong)
+            sensor.set_wen(True)
+            self._strategy = strategy
+            timeout = int(self._integration_ms + self._wtime_ms) + AS7341_DUTY_MARGIN_MS
+            return sensor.start_measure(self._selection, timeout)   # free running from now on
+        sensor.set_wen(False)
+        sensor.set_low_power(strategy == AS7341_DUTY_LOW_POWER)
+        self._strategy = strategy
+        return True
+
+    def sample(self):
+        """ wait for the next sample moment and return the channel counts,
+            or None when the measurement did not complete in time
+            (e.g. bus fault, lost AVALID: the next call re-configures)
+            Strategy is re-evaluated for each cycle
+        """
+        sensor = self._sensor
+        now = ticks_ms()
+        if self._deadline is None:
+            self._deadline = now
+        interval_ms = self.interval_ms
+        strategy = self.select(interval_ms)
+        if strategy != self._strategy:
+            if not self._configure(strategy, interval_ms):
+                return self._timed_out(interval_ms)
+        delay = ticks_diff(self._deadline, ticks_ms())
+        timeout = int(self._integration_ms) + AS7341_DUTY_MARGIN_MS
+        if strategy == AS7341_DUTY_WTIME:
+            if delay > 0:
+                sleep_ms(delay)
+            timeout += int(self._wtime_ms)      # at most one full period
+            start = ticks_ms()
+            while not sensor.measurement_completed():
+                if ticks_diff(ticks_ms(), start) > timeout:
+                    return self._timed_out(interval_ms)
+                sleep_ms(5)
+        elif strategy == AS7341_DUTY_LOW_POWER:
+            delay -= self.latency(strategy)     # start early enough
+            if delay > 0:
+                sleep_ms(delay)
+            if not sensor.start_measure(self._selection, timeout):
+                return self._timed_out(interval_ms)
+        else:
+            delay -= self.latency(strategy)
+            if delay > 0:
+                sleep_ms(delay)
+            sensor.enable()
+            sensor.set_measure_mode(AS7341_MODE_SPM)
+            if not sensor.start_measure(self._selection, timeout):
+                return self._timed_out(interval_ms)
+        counts = sensor.get_spectral_data()
+        if strategy == AS7341_DUTY_POWER_OFF:
+            sensor.disable()                    # sleep until next sample
+        self._samples += 1
+        self._energy_uj += self.energy(strategy, interval_ms)
+        self._advance(interval_ms)
+        return counts
+
+    def _advance(self, interval_ms):
+        """ set the moment of the next sample """
+        self._deadline = ticks_add(self._deadline, interval_ms)
+        if ticks_diff(self._deadline, ticks_ms()) < 0:
+            self._deadline = ticks_ms()         # overrun: no catch-up burst
+
+    def _timed_out(self, interval_ms):
+        """ measurement did not complete: force re-configuration """
+        print("Measurement timed out, strategy", AS7341_DUTY_NAMES[self._strategy])
+        if self._strategy != AS7341_DUTY_POWER_OFF:
+            self._strategy = None               # _configure() again
+        self._advance(interval_ms)
+        return None
+
+    def get_strategy(self):
+        """ return the strategy of the most recent cycle (or None) """
+        return self._strategy
+
+    def get_energy_per_sample(self):
+        """ return average estimated energy per sample (microjoule) """
+        if self._samples == 0:
+            return self.energy(self.select())
+        return self._energy_uj / self._samples
+
+    def stop(self):
+        """ stop auto re-start and restore normal power mode """
+        if self._strategy == AS7341_DUTY_POWER_OFF:
+            self._sensor.enable()
+            self._sensor.set_measure_mode(AS7341_MODE_SPM)
+        self._sensor.set_wen(False)
+        self._sensor.set_low_power(False)
+        self._strategy = None
+        self._deadline = None
+
+#
@@ -0,0 +1,175 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Threshold-event acquisition for the AS7341
+
+    The sensor runs autonomously (SPM mode with WEN and WTIME auto re-start)
+    with spectral thresholds and persistence configured. The host only
+    reads channel counts when the sensor signals a threshold crossing (SINT),
+    either via the INT pin (open drain, pull-up required) or by reading
+    the STATUS register at a low rate.
+    Readings are stored with a timestamp (ticks_ms) in a bounded queue of
+    preallocated arrays. When the queue is full the oldest event is dropped.
+"""
+
+from array import array
+from as7341_compat import sleep_ms, ticks_ms, ticks_diff
+
+from as7341 import *
+
+
+class ThresholdMonitor:
+    """ Fetch channel counts only when they are outside the threshold band """
+    def __init__(self, sensor, lo, hi, channel=4, persistence=0,
+                 selection=None, wtime=255, queue_size=16, pin=None):
+        """ <sensor> is an AS7341 instance, configured for ATIME, ASTEP, gain
+            <lo>, <hi> thresholds for channel <channel> (0..4, CFG_12)
+            <persistence> PERS register value (0..15)
+            <selection> is a key in AS7341_SMUX_SELECT
+            <wtime> WTIME code between measurements (0..255)
+            <queue_size> maximum number of queued events
+            <pin> optional machine.Pin connected to the INT pin of the AS7341
+        """
+        self._sensor = sensor
+        self._lo = lo
+        self._hi = hi
+        self._channel = channel
+        self._persistence = persistence
+        self._selection = selection
+        self._wtime = wtime
+        self._size = max(1, queue_size)
+        self._counts = array('H', [0] * (6 * self._size))
+        self._stamps = array('L', [0] * self._size)
+        self._scratch = array('H', [0] * 6)     # read buffer, queue unchanged on error
+        self._head = 0                          # index of oldest event
+        self._len = 0                           # number of queued events
+        self._dropped = 0                       # events lost by overflow
+        self._polls = 0                         # number of STATUS reads
+        self._pin = pin
+        self._pending = False                   # set by pin interrupt
+        self._running = False
+
+    def _irq(self, pin):
+        """ pin interrupt handler: no I2C traffic here, only a flag """
+        self._pending = True
+
+    def start(self):
+        """ configure thresholds and interrupts and let the sensor free-run """
+        sensor = self._sensor
+        sensor.set_measure_mode(AS7341_MODE_SPM)
+        sensor.set_thresholds(self._lo, self._hi)
+        sensor.set_interrupt_persistence(self._persistence)
+        sensor.set_spectral_threshold_channel(self._channel)
+        sensor.set_spectral_interrupt(True)
+        sensor.set_wtime(self._wtime)
+        sensor.set_wen(True)                    # automatic re-start
+        sensor.clear_interrupt()
+        if self._pin is not None:
+            self._pin.irq(handler=self._irq, trigger=self._pin.IRQ_FALLING)
+        sensor.start_measure(self._selection)
+        self._running = True
+
+    def stop(self):
+        """ stop free running and disable spectral interrupts """
+        if self._pin is not None:
+            self._pin.irq(handler=None)
+        sensor = self._sensor
+        sensor.set_wen(False)
+        sensor.set_spectral_measurement(False)
+        sensor.set_spectral_interrupt(False)
+        sensor.clear_interrupt()
+        self._running = False
+
+    def poll(self):
+        """ non-blocking check for a threshold event
+            With an INT pin no I2C traffic occurs unless the pin signalled.
+            return True when an event was queued
+        """
+        if not self._running:
+            return False
+        if self._pin is not None:
+            if not (self._pending or self._pin.value() == 0):
+                return False
+            self._pending = False
+        self._polls += 1
+        status = self._sensor.get_interrupt_status()
+        if status < 0 or not (status & AS7341_STATUS_SINT):
+            return False
+        self._store()
+        self._sensor.clear_interrupt(AS7341_STATUS_SINT | AS7341_STATUS_AINT)
+        return True
+
+    def wait(self, timeout_ms=None, interval_ms=500):
+        """ sleep until an event is queued or <timeout_ms> expired
+            STATUS (or INT pin) is checked every <interval_ms>
+            return True when an event was queued
+        """
+        start = ticks_ms()
+        while True:
+            if self.poll():
+                return True
+            if timeout_ms is not None and ticks_diff(ticks_ms(), start) >= timeout_ms:
+                return False
+            sleep_ms(interval_ms)
+
+    def _store(self):
+        """ read channel counts into the next queue slot """
+        scratch = self._scratch
+        if not self._sensor.get_spectral_data_into(scratch):
+            return                              # read error: queue intact
+        if self._len == self._size:             # full: drop oldest
+            self._head = (self._head + 1) % self._size
+            self._len -= 1
+            self._dropped += 1
+        slot = (self._head + self._len) % self._size
+        base = 6 * slot
+        for i in range(6):
+            self._counts[base + i] = scratch[i]
+        self._stamps[slot] = ticks_ms() & 0xFFFFFFFF
+        self._len += 1
+
+    def pending(self):
+        """ return number of queued events """
+        return self._len
+
+    def get_event(self):
+        """ return oldest event as (timestamp, counts) or None when empty """
+        if self._len == 0:
+            return None
+        slot = self._head
+        base = 6 * slot
+        event = (self._stamps[slot], tuple(self._counts[base : base + 6]))
+        self._head = (self._head + 1) % self._size
+        self._len -= 1
+        return event
+
+    def get_stats(self):
+        """ return tuple (STATUS reads, events queued, events dropped) """
+        return (self._polls, self._len, self._dropped)
+
+#
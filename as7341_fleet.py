@@ -0,0 +1,285 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Fleet collector: one worker process per I2C bus (Linux host)
+
+    Each worker process drives the AS7341 sensors on its bus and publishes
+    fixed-size records into its own single-producer single-consumer ring
+    buffer in shared memory. The consumer (parent process) reads the
+    records directly from shared memory: no pickling and no queues.
+
+    Record layout (AS7341_FLEET_RECORD, 24 bytes, little endian):
+        time     float64   seconds (time.time())
+        bus      uint8     index of the bus in the collector
+        sensor   uint8     index of the sensor on the bus
+        astatus  uint8     ASTATUS (saturation, gain)
+        (pad)    uint8
+        counts   6 x uint16
+
+    Ring header: 4 x uint64: head (records written), tail (records read),
+    dropped (records lost because the ring was full), capacity.
+    With policy "drop" a full ring drops new records (counted),
+    with policy "block" the worker waits for the consumer (backpressure).
+
+    Bus specification per worker: an integer N (/dev/i2c-N), "sim"
+    (simulated sensors, see as7341_sim.SimulatedBus) or a picklable
+    callable returning an I2C object.
+"""
+
+import multiprocessing
+import struct
+import time
+from multiprocessing import shared_memory
+
+from as7341_compat import const
+
+AS7341_FLEET_RECORD = "<dBBBx6H"
+AS7341_FLEET_RECORD_SIZE = struct.calcsize(AS7341_FLEET_RECORD)
+_HEADER = "<4Q"
+_HEADER_SIZE = struct.calcsize(_HEADER)
+_HEAD, _TAIL, _DROPPED, _CAPACITY = 0, 8, 16, 24
+
+
+class SharedRing:
+    """ Single-producer single-consumer ring of fixed-size records """
+    def __init__(self, capacity=4096, name=None):
+        """ create a new ring with room for <capacity> records,
+            or attach to the existing ring <name>
+        """
+        if name is None:
+            size = _HEADER_SIZE + capacity * AS7341_FLEET_RECORD_SIZE
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            struct.pack_into(_HEADER, self._shm.buf, 0, 0, 0, 0, capacity)
+            self._owner = True
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
+        self._buf = self._shm.buf
+        self._capacity = self._get(_CAPACITY)
+        self._records = self._buf[_HEADER_SIZE : _HEADER_SIZE
+                                  + self._capacity * AS7341_FLEET_RECORD_SIZE]
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def _get(self, offset):
+        return struct.unpack_from("<Q", self._buf, offset)[0]
+
+    def _set(self, offset, value):
+        struct.pack_into("<Q", self._buf, offset, value)
+
+    # --------- producer side ----------
+
+    def push(self, timestamp, bus, sensor, astatus, counts, block=False, stop=None):
+        """ append one record, return False when dropped (ring full)
+            With <block> True wait until there is room, or until event
+            <stop> is set (then return False, not counted as dropped).
+        """
+        head = self._get(_HEAD)
+        while head - self._get(_TAIL) >= self._capacity:
+            if not block:
+                self._set(_DROPPED, self._get(_DROPPED) + 1)
+                return False
+            if stop is None:
+                time.sleep(0.001)
+            elif stop.wait(0.001):              # consumer gone: give up
+                return False
+        offset = (head % self._capacity) * AS7341_FLEET_RECORD_SIZE
+        struct.pack_into(AS7341_FLEET_RECORD, self._records, offset,
+                         timestamp, bus, sensor, astatus, *counts[:6])
+        self._set(_HEAD, head + 1)              # publish after the record
+        return True
+
+    # --------- consumer side ----------
+
+    def available(self):
+        """ return number of records ready to be read """
+        return self._get(_HEAD) - self._get(_TAIL)
+
+    def view(self):
+        """ return a memoryview of the readable records up to the end of
+            the ring buffer (no copy); call release() when done.
+            Records after a wrap-around are returned by the next view().
+        """
+        tail = self._get(_TAIL)
+        n = self._get(_HEAD) - tail
+        start = tail % self._capacity
+        n = min(n, self._capacity - start)
+        return self._records[start * AS7341_FLEET_RECORD_SIZE :
+                             (start + n) * AS7341_FLEET_RECORD_SIZE]
+
+    def release(self, n):
+        """ mark <n> records as read (room for the producer) """
+        self._set(_TAIL, self._get(_TAIL) + n)
+
+    def read(self):
+        """ unpack and release all readable records, return list of tuples
+            (time, bus, sensor, astatus, c0, c1, c2, c3, c4, c5)
+        """
+        result = []
+        while True:
+            view = self.view()
+            n = len(view) // AS7341_FLEET_RECORD_SIZE
+            if n == 0:
+                return result
+            result.extend(struct.iter_unpack(AS7341_FLEET_RECORD, view))
+            view.release()
+            self.release(n)
+
+    def dropped(self):
+        """ return number of records dropped because the ring was full """
+        return self._get(_DROPPED)
+
+    def written(self):
+        """ return number of records written """
+        return self._get(_HEAD)
+
+    def close(self):
+        """ detach, and remove the shared memory when owner """
+        self._records.release()
+        self._buf = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def _make_bus(spec, addresses):
+    """ create the I2C object of a bus specification (in the worker) """
+    if spec == "sim":
+        from as7341_sim import SimulatedBus
+        return SimulatedBus(addresses, realtime=True)
+    if isinstance(spec, int):
+        from as7341_linux import LinuxI2C
+        return LinuxI2C(spec)
+    return spec()
+
+
+def _worker(index, spec, addresses, ring_name, settings, policy, stop):
+    """ worker process: measure all sensors of one bus until <stop> is set """
+    from as7341 import AS7341
+    ring = SharedRing(name=ring_name)
+    bus = _make_bus(spec, addresses)
+    sensors = []
+    for addr in addresses:
+        sensor = AS7341(bus, addr)
+        if not sensor.isconnected():
+            continue
+        sensor.set_atime(settings["atime"])
+        sensor.set_astep(settings["astep"])
+        sensor.set_again(settings["again"])
+        sensor.channel_select(settings["selection"])
+        sensors.append((addresses.index(addr), sensor))
+    block = policy == "block"
+    while not stop.is_set() and sensors:
+        for number, sensor in sensors:
+            sensor.start_measure()
+            record = sensor.get_spectral_record()
+            if record is not None:
+                ring.push(time.time(), index, number, record.astatus, record.counts,
+                          block, stop)
+    ring.close()
+
+
+class FleetCollector:
+    """ One worker process per bus, records in shared-memory rings """
+    def __init__(self, buses, addresses=(0x39,), selection="F1F4CN",
+                 atime=29, astep=599, again=4, capacity=4096, policy="drop"):
+        """ <buses> list of bus specifications (see module description)
+            <addresses> I2C addresses of the sensors on every bus,
+            or a list with a tuple of addresses per bus
+            <capacity> records per ring, <policy> "drop" or "block"
+        """
+        self._buses = list(buses)
+        if addresses and isinstance(addresses[0], int):
+            addresses = [tuple(addresses)] * len(self._buses)
+        self._addresses = [tuple(a) for a in addresses]
+        self._settings = {"selection": selection, "atime": atime,
+                          "astep": astep, "again": again}
+        self._capacity = capacity
+        self._policy = policy
+        self._rings = []
+        self._processes = []
+        self._stop = None
+        self._received = 0
+
+    def start(self):
+        """ create the rings and start one worker process per bus """
+        ctx = multiprocessing.get_context()
+        self._stop = ctx.Event()
+        for index, spec in enumerate(self._buses):
+            ring = SharedRing(self._capacity)
+            process = ctx.Process(target=_worker, daemon=True,
+                                  args=(index, spec, self._addresses[index], ring.name,
+                                        self._settings, self._policy, self._stop))
+            process.start()
+            self._rings.append(ring)
+            self._processes.append(process)
+
+    def poll(self):
+        """ return list of all records available in the rings (see read()) """
+        records = []
+        for ring in self._rings:
+            records.extend(ring.read())
+        self._received += len(records)
+        return records
+
+    def rings(self):
+        """ return the rings (e.g. for zero-copy access with view()) """
+        return list(self._rings)
+
+    def stats(self):
+        """ return dictionary with received, written and dropped records
+            and the number of live workers
+        """
+        return {"received": self._received,
+                "written": sum(r.written() for r in self._rings),
+                "dropped": sum(r.dropped() for r in self._rings),
+                "workers": sum(1 for p in self._processes if p.is_alive())}
+
+    def stop(self, timeout=5):
+        """ stop the workers and release the shared memory """
+        if self._stop is not None:
+            self._stop.set()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        for ring in self._rings:
+            ring.close()
+        self._processes = []
+        self._rings = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+#
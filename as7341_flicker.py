@@ -0,0 +1,114 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Continuous flicker detection for the AS7341
+
+    The FlickerMonitor leaves flicker detection (FDEN) enabled with its own
+    integration time and gain (FD_TIME, FD_GAIN), and reads FD_STATUS with
+    a non-blocking poll(). The SMUX configuration may contain spectral
+    channels as well, e.g. "F1F4CF" (F1..F4, Clear, flicker diode), so
+    spectral measurements can continue with start_measure() (without
+    selection) and get_spectral_data() while the monitor is active.
+"""
+
+from as7341 import *
+
+
+class FlickerMonitor:
+    """ Non-blocking continuous flicker detection """
+    def __init__(self, sensor, selection="FD", fd_time=None, fd_gain=None):
+        """ <sensor> is an AS7341 instance
+            <selection> key in AS7341_SMUX_SELECT with the flicker diode
+            <fd_time> optional FD_TIME code (0..2047), see set_fd_time()
+            <fd_gain> optional FD gain code (0..10), see set_fd_gain()
+        """
+        self._sensor = sensor
+        self._selection = selection
+        self._fd_time = fd_time
+        self._fd_gain = fd_gain
+        self._frequency = 0                     # most recent result
+        self._saturated = False
+        self._results = 0
+        self._running = False
+
+    def start(self):
+        """ configure SMUX and flicker detection and enable FDEN """
+        sensor = self._sensor
+        if self._fd_time is not None:
+            sensor.set_fd_time(self._fd_time)
+        if self._fd_gain is not None:
+            sensor.set_fd_gain(self._fd_gain)
+        sensor.start_measure(self._selection)   # SMUX incl. flicker diode
+        sensor.clear_fd_status()
+        sensor.set_flicker_detection(True)
+        self._running = True
+
+    def stop(self):
+        """ disable flicker detection """
+        self._sensor.set_flicker_detection(False)
+        self._sensor.clear_fd_status()
+        self._running = False
+
+    def poll(self):
+        """ read FD_STATUS once (no waiting)
+            return 100, 120 or 0 (no flicker) when a new result is available,
+            otherwise None
+        """
+        if not self._running:
+            return None
+        fd_status = self._sensor.get_fd_status()
+        if fd_status < 0 or not (fd_status & AS7341_FD_STATUS_FD_MEAS_VALID):
+            return None
+        if not (fd_status & (AS7341_FD_STATUS_FD_100_VALID | AS7341_FD_STATUS_FD_120_VALID)):
+            return None                         # calculation not completed
+        self._saturated = bool(fd_status & AS7341_FD_STATUS_FD_SAT_DETECT)
+        if ((fd_status & AS7341_FD_STATUS_FD_100_VALID) and
+            (fd_status & AS7341_FD_STATUS_FD_100HZ)):
+            self._frequency = 100
+        elif ((fd_status & AS7341_FD_STATUS_FD_120_VALID) and
+              (fd_status & AS7341_FD_STATUS_FD_120HZ)):
+            self._frequency = 120
+        else:
+            self._frequency = 0
+        self._sensor.clear_fd_status(settle=0)
+        self._results += 1
+        return self._frequency
+
+    def get_frequency(self):
+        """ return most recent flicker frequency (100, 120 or 0) """
+        return self._frequency
+
+    def get_saturated(self):
+        """ return True when the most recent result was saturated """
+        return self._saturated
+
+    def get_result_count(self):
+        """ return number of results since start """
+        return self._results
+
+#
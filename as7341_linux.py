@@ -0,0 +1,196 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Linux host adapter for the AS7341 driver
+
+    LinuxI2C offers the subset of the MicroPython machine.I2C interface
+    used by the driver (readfrom_mem_into, readfrom_mem, writeto_mem, scan)
+    on top of /dev/i2c-N.
+    A register read is a single I2C_RDWR ioctl: a combined transaction of
+    a write of the register address and a read with repeated start.
+    A register write is a single I2C_RDWR ioctl as well.
+    The ioctl structures and transfer buffers are allocated once.
+
+    Usage (e.g. Raspberry Pi, bus 1):
+        from as7341_linux import LinuxI2C
+        from as7341 import *
+        sensor = AS7341(LinuxI2C(1))
+
+    Without I2C hardware the ioctl path can be checked with a fake device
+    file: any regular file as <bus> and a SimulatedIoctl as <ioctl>, which
+    decodes the i2c_msg structures and forwards them to e.g. SimulatedI2C:
+        i2c = LinuxI2C("/tmp/fake-i2c", ioctl=SimulatedIoctl(SimulatedI2C()))
+"""
+
+import ctypes
+import fcntl
+import os
+
+from as7341_compat import const
+
+I2C_RDWR  = const(0x0707)                   # linux/i2c-dev.h
+I2C_M_RD  = const(0x0001)                   # linux/i2c.h
+I2C_BLOCK_MAX = const(256)                  # largest transfer supported
+
+
+class _I2CMsg(ctypes.Structure):
+    """ struct i2c_msg """
+    _fields_ = [("addr", ctypes.c_uint16),
+                ("flags", ctypes.c_uint16),
+                ("len", ctypes.c_uint16),
+                ("buf", ctypes.POINTER(ctypes.c_uint8))]
+
+
+class _I2CRdwrData(ctypes.Structure):
+    """ struct i2c_rdwr_ioctl_data """
+    _fields_ = [("msgs", ctypes.POINTER(_I2CMsg)),
+                ("nmsgs", ctypes.c_uint32)]
+
+
+class LinuxI2C:
+    """ machine.I2C look-alike for /dev/i2c-N using combined transactions """
+    def __init__(self, bus=1, ioctl=None):
+        """ <bus> number N of /dev/i2c-N or a path to an I2C device file
+            <ioctl> replacement of fcntl.ioctl (e.g. SimulatedIoctl)
+        """
+        path = bus if isinstance(bus, str) else "/dev/i2c-{:d}".format(bus)
+        self._ioctl = fcntl.ioctl if ioctl is None else ioctl
+        self._fd = os.open(path, os.O_RDWR)
+        self._msgs = (_I2CMsg * 2)()
+        self._data = _I2CRdwrData(ctypes.cast(self._msgs, ctypes.POINTER(_I2CMsg)), 0)
+        self._regbuf = (ctypes.c_uint8 * 1)()
+        self._rbuf = (ctypes.c_uint8 * I2C_BLOCK_MAX)()
+        self._wbuf = (ctypes.c_uint8 * (I2C_BLOCK_MAX + 1))()
+        self._rview = memoryview(self._rbuf).cast('B')
+        self._wview = memoryview(self._wbuf).cast('B')
+        rbuf = ctypes.cast(self._rbuf, ctypes.POINTER(ctypes.c_uint8))
+        wbuf = ctypes.cast(self._wbuf, ctypes.POINTER(ctypes.c_uint8))
+        regbuf = ctypes.cast(self._regbuf, ctypes.POINTER(ctypes.c_uint8))
+        self._ptrs = (regbuf, rbuf, wbuf)
+        self.transfers = 0                      # number of ioctl calls
+
+    def _transfer(self, nmsgs):
+        """ perform <nmsgs> prepared messages in a single ioctl """
+        self._data.nmsgs = nmsgs
+        self.transfers += 1
+        self._ioctl(self._fd, I2C_RDWR, self._data)
+
+    def readfrom_mem_into(self, addr, memaddr, buf):
+        """ read len(<buf>) bytes starting at register <memaddr> into <buf> """
+        n = len(buf)
+        if n > I2C_BLOCK_MAX:
+            raise ValueError("transfer too long")
+        regbuf, rbuf, _ = self._ptrs
+        self._regbuf[0] = memaddr & 0xFF
+        msgs = self._msgs
+        msgs[0].addr, msgs[0].flags, msgs[0].len, msgs[0].buf = addr, 0, 1, regbuf
+        msgs[1].addr, msgs[1].flags, msgs[1].len, msgs[1].buf = addr, I2C_M_RD, n, rbuf
+        self._transfer(2)
+        buf[:] = self._rview[:n]
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        """ read <nbytes> starting at register <memaddr>, return bytes """
+        buf = bytearray(nbytes)
+        self.readfrom_mem_into(addr, memaddr, buf)
+        return bytes(buf)
+
+    def writeto_mem(self, addr, memaddr, buf):
+        """ write <buf> to consecutive registers starting at <memaddr> """
+        n = len(buf)
+        if n > I2C_BLOCK_MAX:
+            raise ValueError("transfer too long")
+        _, _, wbuf = self._ptrs
+        self._wbuf[0] = memaddr & 0xFF
+        self._wview[1 : n + 1] = buf
+        msg = self._msgs[0]
+        msg.addr, msg.flags, msg.len, msg.buf = addr, 0, n + 1, wbuf
+        self._transfer(1)
+
+    def scan(self):
+        """ return list of addresses which acknowledge a 1-byte read """
+        found = []
+        _, rbuf, _ = self._ptrs
+        msg = self._msgs[0]
+        for addr in range(0x08, 0x78):
+            msg.addr, msg.flags, msg.len, msg.buf = addr, I2C_M_RD, 1, rbuf
+            try:
+                self._transfer(1)
+            except OSError:
+                continue
+            found.append(addr)
+        return found
+
+    def close(self):
+        """ close the device file """
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SimulatedIoctl:
+    """ fcntl.ioctl replacement serving I2C_RDWR requests with an object
+        with the machine.I2C interface (e.g. SimulatedI2C)
+    """
+    def __init__(self, i2c):
+        self._i2c = i2c
+        self.calls = 0
+
+    def __call__(self, fd, request, data):
+        if request != I2C_RDWR:
+            raise OSError(25, "ENOTTY")
+        self.calls += 1
+        msgs = data.msgs
+        i = 0
+        while i < data.nmsgs:
+            msg = msgs[i]
+            if msg.flags & I2C_M_RD:            # read without register
+                if msg.addr not in self._i2c.scan():
+                    raise OSError(6, "ENXIO")
+                for j in range(msg.len):
+                    msg.buf[j] = 0
+            elif (i + 1 < data.nmsgs and msgs[i + 1].flags & I2C_M_RD
+                  and msgs[i + 1].addr == msg.addr and msg.len == 1):
+                nxt = msgs[i + 1]               # combined register read
+                buf = bytearray(nxt.len)
+                self._i2c.readfrom_mem_into(msg.addr, msg.buf[0], buf)
+                for j in range(nxt.len):
+                    nxt.buf[j] = buf[j]
+                i += 1
+            else:                               # register write
+                payload = bytes(msg.buf[j] for j in range(msg.len))
+                self._i2c.writeto_mem(msg.addr, payload[0], payload[1:])
+            i += 1
+        return 0
+
+#
@@ -0,0 +1,285 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Metrics exporter for AS7341 sensors (OpenMetrics text format)
+
+    SensorMetrics keeps pre-aggregated counters and gauges of one sensor,
+    fed by the acquisition loop with observe() (SpectralRecord) or
+    observe_counts() (counts of get_spectral_data()):
+      - number of samples, saturated samples and I2C errors (counters)
+      - sample rate and saturation ratio (exponentially weighted averages)
+      - latest counts per channel, gain and integration time
+      - age of the latest sample
+    MetricsExporter serves the metrics of one or more sensors over HTTP.
+    The server is non-blocking: poll() accepts connections, reads requests
+    and sends responses as far as possible without waiting, so it can be
+    called from the acquisition loop (or a uasyncio / asyncio task).
+    A scrape only formats the values in memory: no I2C traffic.
+
+    Usage:
+        metrics = SensorMetrics(sensor, "desk")
+        exporter = MetricsExporter([metrics], port=9100)
+        while True:
+            sensor.start_measure()
+            metrics.observe(sensor.get_spectral_record())
+            exporter.poll()
+"""
+
+try:
+    import socket
+    import errno
+except ImportError:                         # older MicroPython ports
+    import usocket as socket
+    import uerrno as errno
+
+from as7341_compat import ticks_ms, ticks_diff, ticks_add
+
+from as7341_smux_select import AS7341_SMUX_CHANNELS
+
+AS7341_METRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+AS7341_METRICS_EWMA = 8                     # weight of history in averages
+AS7341_METRICS_MAX_CLIENTS = 4
+AS7341_METRICS_TIMEOUT_MS = 2000            # connection closed when not served
+AS7341_METRICS_CHANNELS = ("ch0", "ch1", "ch2", "ch3", "ch4", "ch5")
+
+_AGAIN = (errno.EAGAIN, getattr(errno, "EWOULDBLOCK", errno.EAGAIN),
+          getattr(errno, "EINPROGRESS", errno.EAGAIN))
+
+
+class SensorMetrics:
+    """ Pre-aggregated counters and gauges of one sensor """
+    def __init__(self, sensor, name="as7341"):
+        """ <sensor> AS7341 instance (only its error counter is used)
+            <name> value of the 'sensor' label
+        """
+        self._sensor = sensor
+        self.name = name
+        self.samples = 0
+        self.saturated = 0
+        self.counts = {}                        # channel name -> latest count
+        self.again_factor = None
+        self.integration_ms = None
+        self._interval_ms = None                # average interval
+        self._saturation = 0.0                  # average saturation ratio
+        self._last = None                       # ticks_ms() of latest sample
+
+    def observe_counts(self, counts, selection=None, saturated=False,
+                       again_factor=None, integration_ms=None):
+        """ register a measurement: <counts> of the channels of <selection>
+            (key of AS7341_SMUX_SELECT)
+        """
+        now = ticks_ms()
+        if self._last is not None:
+            interval = ticks_diff(now, self._last)
+            if self._interval_ms is None:
+                self._interval_ms = interval
+            else:
+                self._interval_ms += (interval - self._interval_ms) / AS7341_METRICS_EWMA
+        self._last = now
+        self.samples += 1
+        if saturated:
+            self.saturated += 1
+        self._saturation += ((1.0 if saturated else 0.0) - self._saturation) / AS7341_METRICS_EWMA
+        names = AS7341_SMUX_CHANNELS.get(selection) or AS7341_METRICS_CHANNELS
+        for name, count in zip(names, counts):
+            if name is not None:
+                self.counts[name] = count
+        if again_factor is not None:
+            self.again_factor = again_factor
+        if integration_ms is not None:
+            self.integration_ms = integration_ms
+
+    def observe(self, record):
+        """ register a SpectralRecord (ignored when None: read error) """
+        if record is not None:
+            self.observe_counts(record.counts, record.selection, record.saturated,
+                                record.again_factor, record.integration_ms)
+
+    def get_sample_rate(self):
+        """ return average samples per second (0 before 2 samples) """
+        if not self._interval_ms:
+            return 0.0
+        return 1000 / self._interval_ms
+
+    def get_saturation_ratio(self):
+        """ return average fraction of saturated samples """
+        return self._saturation
+
+    def get_age(self):
+        """ return seconds since the latest sample (None before the first) """
+        if self._last is None:
+            return None
+        return ticks_diff(ticks_ms(), self._last) / 1000
+
+    def get_error_count(self):
+        """ return number of failed I2C transfers of the sensor """
+        return self._sensor.get_error_count()
+
+
+def _escape(value):
+    """ return label value <value> escaped as required by OpenMetrics """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _single(value):
+    return [("", value)] if value is not None else []
+
+# metric families: (name, type, help, function returning a list of
+#                   (label suffix, value) of a SensorMetrics instance)
+AS7341_METRICS_FAMILIES = (
+    ("as7341_samples", "counter", "Number of measurements.",
+     lambda m: [("", m.samples)]),
+    ("as7341_saturated_samples", "counter", "Number of saturated measurements.",
+     lambda m: [("", m.saturated)]),
+    ("as7341_i2c_errors", "counter", "Number of failed I2C transfers.",
+     lambda m: [("", m.get_error_count())]),
+    ("as7341_sample_rate", "gauge", "Average measurements per second.",
+     lambda m: [("", m.get_sample_rate())]),
+    ("as7341_saturation_ratio", "gauge", "Average fraction of saturated measurements.",
+     lambda m: [("", m.get_saturation_ratio())]),
+    ("as7341_counts", "gauge", "Latest count per channel.",
+     lambda m: [(',channel="{}"'.format(_escape(name)), count)
+                for name, count in sorted(m.counts.items())]),
+    ("as7341_gain", "gauge", "Gain factor of the latest measurement.",
+     lambda m: _single(m.again_factor)),
+    ("as7341_integration_time_seconds", "gauge", "Integration time.",
+     lambda m: _single(None if m.integration_ms is None else m.integration_ms / 1000)),
+    ("as7341_sample_age_seconds", "gauge", "Time since the latest measurement.",
+     lambda m: _single(m.get_age())),
+    )
+
+
+def render(metrics):
+    """ return OpenMetrics text of the SensorMetrics instances <metrics> """
+    lines = []
+    for name, kind, text, values in AS7341_METRICS_FAMILIES:
+        lines.append("# TYPE {} {}".format(name, kind))
+        lines.append("# HELP {} {}".format(name, text))
+        sample = name + "_total" if kind == "counter" else name
+        for m in metrics:
+            sensor = _escape(m.name)
+            for labels, value in values(m):
+                lines.append('{}{{sensor="{}"{}}} {}'.format(sample, sensor, labels, value))
+    lines.append("# EOF\n")
+    return "\n".join(lines)
+
+
+class MetricsExporter:
+    """ Non-blocking HTTP server for the metrics of one or more sensors """
+    def __init__(self, metrics, port=9100, addr="0.0.0.0",
+                 timeout_ms=AS7341_METRICS_TIMEOUT_MS):
+        """ <metrics> list of SensorMetrics instances
+            <port>, <addr> listening address (port 0: any free port,
+            see get_port())
+            <timeout_ms> connections not served within this time
+            (e.g. clients which never send a request) are closed
+        """
+        self.metrics = list(metrics)
+        self._timeout = timeout_ms
+        self._clients = []                      # [socket, request, response, deadline]
+        self.scrapes = 0
+        self.timeouts = 0                       # connections closed by timeout
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(socket.getaddrinfo(addr, port)[0][-1])
+        sock.listen(AS7341_METRICS_MAX_CLIENTS)
+        sock.setblocking(False)
+        self._sock = sock
+
+    def get_port(self):
+        """ return the port number the server listens on """
+        return self._sock.getsockname()[1]
+
+    def _response(self, request):
+        """ return HTTP response (bytes) for <request> (header bytes) """
+        line = request.split(b"\r\n", 1)[0].split()
+        if len(line) < 2 or line[0] != b"GET":
+            status, ctype, body = "405 Method Not Allowed", "text/plain", "GET only\n"
+        elif line[1].split(b"?")[0] not in (b"/metrics", b"/"):
+            status, ctype, body = "404 Not Found", "text/plain", "not found\n"
+        else:
+            status, ctype, body = "200 OK", AS7341_METRICS_CONTENT_TYPE, render(self.metrics)
+            self.scrapes += 1
+        body = body.encode()
+        header = "HTTP/1.0 {}\r\nContent-Type: {}\r\nContent-Length: {:d}\r\nConnection: close\r\n\r\n"
+        return header.format(status, ctype, len(body)).encode() + body
+
+    def poll(self):
+        """ accept, read and answer requests without blocking """
+        while len(self._clients) < AS7341_METRICS_MAX_CLIENTS:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:                     # no pending connection
+                break
+            conn.setblocking(False)
+            self._clients.append([conn, b"", None, ticks_add(ticks_ms(), self._timeout)])
+        now = ticks_ms()
+        for client in self._clients[:]:
+            conn, request, response, deadline = client
+            if ticks_diff(now, deadline) > 0:   # idle or too slow
+                conn.close()
+                self._clients.remove(client)
+                self.timeouts += 1
+                continue
+            try:
+                if response is None:
+                    data = conn.recv(512)
+                    if not data:                # closed by client
+                        raise OSError("closed")
+                    request += data
+                    client[1] = request
+                    if b"\r\n\r\n" not in request and len(request) < 2048:
+                        continue
+                    response = self._response(request)
+                sent = conn.send(response)
+                client[2] = response[sent:]
+                if client[2]:
+                    continue                    # remainder in next poll
+            except OSError as err:
+                if err.args and err.args[0] in _AGAIN:
+                    continue                    # not ready: try in next poll
+            conn.close()
+            self._clients.remove(client)
+
+    async def serve(self, interval_ms=50):
+        """ poll forever as (u)asyncio task """
+        try:
+            import uasyncio as asyncio
+        except ImportError:
+            import asyncio
+        while True:
+            self.poll()
+            await asyncio.sleep(interval_ms / 1000)
+
+    def close(self):
+        """ close all connections and the listening socket """
+        for client in self._clients:
+            client[0].close()
+        self._clients = []
+        self._sock.close()
+
+#
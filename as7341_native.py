@@ -0,0 +1,88 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Native code versions of the per-sample hot paths of the AS7341 driver
+
+    MicroPython only: the functions are compiled to machine code with the
+    native and viper code emitters. as7341.py imports this module when
+    available and falls back to its pure Python versions otherwise
+    (CPython, ports without native code emitter or this file not installed).
+    Interface and results are identical to the Python versions in as7341.py.
+    The gain is in count decoding and the completion poll; for modify_bits
+    the call overhead dominates and examples/native_bench.py shows about
+    1.0 (no measurable speed-up), it is here for a uniform interface.
+"""
+
+import micropython
+from time import sleep_ms, ticks_ms, ticks_diff
+
+
+@micropython.native
+def decode_list(buf):
+    """ return list of the 6 counts in <buf> (ASTATUS + 12 bytes) """
+    return [buf[1] | (buf[2] << 8), buf[3] | (buf[4] << 8),
+            buf[5] | (buf[6] << 8), buf[7] | (buf[8] << 8),
+            buf[9] | (buf[10] << 8), buf[11] | (buf[12] << 8)]
+
+
+@micropython.native
+def decode_counts(buf, counts, offset):
+    """ store the 6 counts in <buf> into <counts> starting at <offset> """
+    counts[offset] = buf[1] | (buf[2] << 8)
+    counts[offset + 1] = buf[3] | (buf[4] << 8)
+    counts[offset + 2] = buf[5] | (buf[6] << 8)
+    counts[offset + 3] = buf[7] | (buf[8] << 8)
+    counts[offset + 4] = buf[9] | (buf[10] << 8)
+    counts[offset + 5] = buf[11] | (buf[12] << 8)
+
+
+@micropython.viper
+def modify_bits(data: int, mask: int, flag: int) -> int:
+    """ return <data> with the bits of <mask> set (<flag> true) or reset """
+    if flag:
+        return data | mask
+    return data & (~mask)
+
+
+@micropython.native
+def poll_bit(bus, addr, reg, buf, mask, poll_ms, timeout_ms):
+    """ read register <reg> into <buf> (1 byte) until a bit of <mask> is set
+            with <poll_ms> between reads
+        return True when set, False after <timeout_ms> (negative: no limit)
+        I2C errors are raised to the caller
+    """
+    start = ticks_ms()
+    while True:
+        bus.readfrom_mem_into(addr, reg, buf)
+        if buf[0] & mask:
+            return True
+        if timeout_ms >= 0 and ticks_diff(ticks_ms(), start) > timeout_ms:
+            return False
+        sleep_ms(poll_ms)
+
+#
@@ -0,0 +1,216 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Pipelined measurement plans for the AS7341
+
+    A MeasurementPlan runs an ordered list of SMUX configurations
+    (keys of AS7341_SMUX_SELECT), each optionally with its own gain code,
+    ATIME and ASTEP, back to back in SPM mode.
+    As soon as a step completes its counts are latched by a block read
+    starting at ASTATUS (raw, not decoded), the next step is programmed
+    and started (AS7341.program_step(), no settle delays), and only then
+    the latched counts are decoded while the next integration is running.
+    So the period of a full cycle approaches the sum of the integration
+    times plus a few I2C transactions per step.
+
+    Each cycle returns a dictionary: channel name -> basic count
+    (count / (gain factor * integration time in ms), comparable between
+    steps with different settings), or with <basic> False the raw counts,
+    see get_step_settings() for gain and integration time per step.
+    When a channel is measured in more than one step the value of the
+    last step is returned.
+    The settings of the steps are resolved at start(): None means the
+    setting of the previous step, for the first step the setting of the
+    sensor at that moment.
+"""
+
+from as7341_compat import sleep_ms, ticks_ms, ticks_diff
+
+from as7341 import *
+
+
+class MeasurementPlan:
+    """ Back to back measurements with a series of channel mappings """
+    def __init__(self, sensor, steps, timeout_ms=2000, basic=True):
+        """ <sensor> is an AS7341 instance in SPM mode
+            <steps> is a list of selection keys or of tuples
+            (selection, again, atime[, astep]), None means: unchanged
+            <timeout_ms> maximum wait for completion of a step
+            <basic> True: return basic counts, False: raw counts
+        """
+        self._sensor = sensor
+        self._timeout = timeout_ms
+        self._basic = basic
+        self._steps = []
+        for step in steps:
+            if isinstance(step, str):
+                step = (step, None, None, None)
+            elif len(step) < 4:
+                step = tuple(step) + (None,) * (4 - len(step))
+            if step[0] not in AS7341_SMUX_SELECT:
+                print(step[0], "is unknown in AS7341_SMUX_SELECT")
+                continue
+            self._steps.append(step)
+        self._raw = [bytearray(13) for _ in self._steps]
+        self._settings = []                     # resolved (sel, again, atime, astep)
+        self._itime = [0.0] * len(self._steps)  # integration time (ms) per step
+        self._index = 0                         # step in progress
+        self._running = False
+        self._cycle_ms = 0                      # duration of last cycle
+        self._cycle_start = 0
+
+    def _resolve(self):
+        """ resolve the settings of all steps, return False with read error """
+        sensor = self._sensor
+        again, atime, astep = sensor.get_again(), sensor.get_atime(), sensor.get_astep()
+        if again < 0 or atime < 0 or astep < 0:
+            return False
+        self._settings = []
+        for i, (selection, a, t, s) in enumerate(self._steps):
+            again = again if a is None else a
+            atime = atime if t is None else t
+            astep = astep if s is None else s
+            self._settings.append((selection, again, atime, astep))
+            self._itime[i] = (atime + 1) * (astep + 1) * 2.78 / 1000
+        return True
+
+    def _program(self, index):
+        """ configure and start step <index>, only changed settings written
+            return False with an I2C error
+        """
+        selection, again, atime, astep = self._settings[index]
+        _, prev_again, prev_atime, prev_astep = self._settings[self._index]   # programmed
+        ok = self._sensor.program_step(selection,
+                                       None if again == prev_again else again,
+                                       None if atime == prev_atime else atime,
+                                       None if astep == prev_astep else astep)
+        self._index = index
+        return ok
+
+    def _wait_completed(self):
+        """ wait for AVALID of the step in progress, return True when valid """
+        start = ticks_ms()
+        sleep_ms(max(int(self._itime[self._index]) - 1, 0))   # most of the time
+        while not self._sensor.measurement_completed():
+            if ticks_diff(ticks_ms(), start) > self._timeout:
+                print("Measurement of step", self._index, "timed out")
+                return False
+            sleep_ms(1)
+        return True
+
+    def start(self):
+        """ start the first step of the plan, return False with an I2C error """
+        sensor = self._sensor
+        sensor.set_measure_mode(AS7341_MODE_SPM)
+        self._running = False
+        if not self._resolve():
+            return False
+        _, again, atime, astep = self._settings[0]
+        self._cycle_start = ticks_ms()
+        if not self._sensor.program_step(self._settings[0][0], again, atime, astep):
+            return False
+        self._index = 0
+        self._running = True
+        return True
+
+    def stop(self):
+        """ stop measuring (device remains powered on) """
+        self._sensor.set_spectral_measurement(False)
+        self._running = False
+
+    def cycle(self):
+        """ perform all steps once, return dictionary channel name -> basic
+            count (or raw count, see <basic>), empty with an I2C error or timeout
+        """
+        if not self._steps:
+            return {}
+        if not self._running and not self.start():
+            return {}
+        result = {}
+        nsteps = len(self._steps)
+        basic = self._basic
+        for _ in range(nsteps):
+            index = self._index
+            raw = self._raw[index]
+            if (not self._wait_completed()
+                or not self._sensor.get_spectral_raw_into(raw)   # latch counts
+                or not self._program((index + 1) % nsteps)):     # next integration
+                self._running = False
+                return {}
+            names = AS7341_SMUX_CHANNELS.get(self._steps[index][0], ())
+            scale = 1
+            if basic:                                   # applied gain from ASTATUS
+                scale = 2 ** ((raw[0] & AS7341_ASTATUS_AGAIN_STATUS) - 1) * self._itime[index]
+            for i, name in enumerate(names):            # decode meanwhile
+                if name is not None:
+                    count = raw[1 + 2*i] | (raw[2 + 2*i] << 8)
+                    result[name] = count / scale if basic else count
+        now = ticks_ms()
+        self._cycle_ms = ticks_diff(now, self._cycle_start)
+        self._cycle_start = now
+        return result
+
+    def run(self, cycles=None):
+        """ generator: yield the result of each cycle
+            (endless when <cycles> is None)
+        """
+        n = 0
+        while cycles is None or n < cycles:
+            yield self.cycle()
+            n += 1
+
+    def get_step_status(self):
+        """ return a tuple with the ASTATUS of each step of the last cycle """
+        return tuple(raw[0] for raw in self._raw)
+
+    def get_step_settings(self):
+        """ return a tuple per step of the last cycle: (selection, applied
+            gain factor (from ASTATUS), integration time in ms)
+        """
+        return tuple((self._steps[i][0],
+                      2 ** ((self._raw[i][0] & AS7341_ASTATUS_AGAIN_STATUS) - 1),
+                      self._itime[i]) for i in range(len(self._steps)))
+
+    def get_saturated(self):
+        """ return True when any step of the last cycle saturated """
+        for raw in self._raw:
+            if raw[0] & AS7341_ASTATUS_ASAT_STATUS:
+                return True
+        return False
+
+    def get_cycle_time(self):
+        """ return duration of the last cycle (ms) """
+        return self._cycle_ms
+
+    def get_integration_sum(self):
+        """ return sum of integration times of all steps (ms),
+            known after start()
+        """
+        return sum(self._itime)
+
+#
@@ -0,0 +1,182 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Measurement records for the AS7341
+
+    SpectralRecord: a single measurement with the channel counts,
+    the ASTATUS register (saturation flag and AGAIN_STATUS), the SMUX
+    selection key, integration time (ms) and timestamp (ticks_ms).
+
+    SpectralRecordBatch: array-backed storage for many records
+    (12 bytes of counts plus 10 bytes per record: ASTATUS, selection
+    index, integration time and timestamp; 14 bytes where array 'L' is
+    8 bytes, e.g. CPython on 64-bit Linux), with filtering of saturated
+    records. At most 256 distinct selection keys per batch.
+
+    This file is imported by as7341.py
+"""
+
+from array import array
+
+from as7341_compat import const
+
+AS7341_RECORD_ASAT  = const(0x80)           # ASTATUS_ASAT_STATUS
+AS7341_RECORD_AGAIN = const(0x0F)           # ASTATUS_AGAIN_STATUS
+AS7341_RECORD_KEYS  = const(256)            # distinct selection keys per batch
+
+
+class SpectralRecord:
+    """ Counts of a single measurement with status information """
+    __slots__ = ("counts", "astatus", "selection", "integration_ms", "timestamp")
+
+    def __init__(self, counts, astatus, selection, integration_ms, timestamp):
+        self.counts = counts                    # tuple of 6 integers
+        self.astatus = astatus                  # ASTATUS register
+        self.selection = selection              # key of AS7341_SMUX_SELECT
+        self.integration_ms = integration_ms    # float
+        self.timestamp = timestamp              # ticks_ms()
+
+    @property
+    def saturated(self):
+        """ True when analog or digital saturation occurred """
+        return bool(self.astatus & AS7341_RECORD_ASAT)
+
+    @property
+    def again(self):
+        """ gain code applied by the chip (0..10, see set_again()) """
+        return self.astatus & AS7341_RECORD_AGAIN
+
+    @property
+    def again_factor(self):
+        """ gain factor applied by the chip (0.5 .. 512) """
+        return 2 ** ((self.astatus & AS7341_RECORD_AGAIN) - 1)
+
+    def __repr__(self):
+        return "SpectralRecord({}, sat={}, again={:d}, sel={}, {:.2f} ms, t={:d})".format(
+               self.counts, self.saturated, self.again, self.selection,
+               self.integration_ms, self.timestamp)
+
+
+class SpectralRecordBatch:
+    """ Fixed capacity array-backed container of measurement records """
+    def __init__(self, capacity):
+        self._capacity = capacity
+        self._counts = array('H', [0] * (6 * capacity))
+        self._astatus = bytearray(capacity)
+        self._selection = bytearray(capacity)   # index in self._keys
+        self._itime = array('f', [0] * capacity)
+        self._stamps = array('L', [0] * capacity)
+        self._keys = []                         # distinct selection keys
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def capacity(self):
+        """ return maximum number of records """
+        return self._capacity
+
+    def clear(self):
+        """ remove all records (the memory is retained) """
+        self._len = 0
+
+    def _key_index(self, selection):
+        """ return index of <selection> in list of distinct keys
+            or -1 when there is no room for another key
+        """
+        try:
+            return self._keys.index(selection)
+        except ValueError:
+            if len(self._keys) >= AS7341_RECORD_KEYS:
+                return -1                       # does not fit the bytearray
+            self._keys.append(selection)
+            return len(self._keys) - 1
+
+    def append(self, record, drop_saturated=False):
+        """ add <record> (SpectralRecord)
+            return False when the batch is full or the record is dropped
+            (see append_values())
+        """
+        if drop_saturated and record.saturated:
+            return False
+        return self.append_values(record.counts, record.astatus, record.selection,
+                                  record.integration_ms, record.timestamp)
+
+    def append_values(self, counts, astatus, selection, integration_ms, timestamp):
+        """ add a record from its individual values (no record object needed)
+            return False when the batch is full or has no room for
+            another distinct selection key
+        """
+        n = self._len
+        if n >= self._capacity:
+            return False
+        key = self._key_index(selection)
+        if key < 0:
+            return False
+        base = 6 * n
+        for i in range(6):
+            self._counts[base + i] = counts[i]
+        self._astatus[n] = astatus
+        self._selection[n] = key
+        self._itime[n] = integration_ms
+        self._stamps[n] = timestamp & 0xFFFFFFFF
+        self._len = n + 1
+        return True
+
+    def __getitem__(self, index):
+        """ return record <index> as SpectralRecord """
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("record index out of range")
+        base = 6 * index
+        return SpectralRecord(tuple(self._counts[base : base + 6]),
+                              self._astatus[index],
+                              self._keys[self._selection[index]],
+                              self._itime[index],
+                              self._stamps[index])
+
+    def __iter__(self):
+        for i in range(self._len):
+            yield self[i]
+
+    def valid(self):
+        """ iterate over the records without saturation """
+        for i in range(self._len):
+            if not (self._astatus[i] & AS7341_RECORD_ASAT):
+                yield self[i]
+
+    def saturated_count(self):
+        """ return number of saturated records """
+        n = 0
+        for i in range(self._len):
+            if self._astatus[i] & AS7341_RECORD_ASAT:
+                n += 1
+        return n
+
+#
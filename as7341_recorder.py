@@ -0,0 +1,211 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Memory-mapped columnar recorder for AS7341 readings (Linux host, NumPy)
+
+    A recording is a directory with one binary file per column:
+        ch0.u16 .. ch5.u16  channel counts (uint16)
+        time.f8             timestamp (float64, seconds)
+        gain.u8             AGAIN code (uint8)
+        status.u8           ASTATUS (uint8)
+        length.u64          number of valid rows (uint64, 1 value)
+    The column files are preallocated and memory-mapped, and grown in
+    chunks of <chunk> rows, so RAM usage is constant during long captures.
+    The length is updated in place, so a reader (ColumnReader, read-only
+    memory maps) can follow a running capture without copying the data.
+"""
+
+import os
+
+import numpy as np
+
+AS7341_RECORDER_COLUMNS = (
+    ("ch0", np.uint16), ("ch1", np.uint16), ("ch2", np.uint16),
+    ("ch3", np.uint16), ("ch4", np.uint16), ("ch5", np.uint16),
+    ("time", np.float64), ("gain", np.uint8), ("status", np.uint8),
+    )
+
+_SUFFIX = {np.uint16: "u16", np.float64: "f8", np.uint8: "u8", np.uint64: "u64"}
+
+
+def _column_path(directory, name, dtype):
+    return os.path.join(directory, "{:s}.{:s}".format(name, _SUFFIX[dtype]))
+
+
+class ColumnRecorder:
+    """ Append readings to preallocated memory-mapped column files """
+    def __init__(self, directory, chunk=1 << 16, append=False, overwrite=False):
+        """ <directory> recording directory (created when needed)
+            <chunk> number of rows by which the files grow
+            <append> continue an existing recording in stead of a new one
+            <overwrite> discard an existing recording
+            An existing recording with data is neither continued nor
+            discarded by default: FileExistsError
+        """
+        self._dir = directory
+        self._chunk = max(1, chunk)
+        os.makedirs(directory, exist_ok=True)
+        length_path = _column_path(directory, "length", np.uint64)
+        exists = os.path.exists(length_path)
+        if exists and not (append or overwrite) and \
+           os.path.getsize(length_path) >= 8 and np.fromfile(length_path, np.uint64, 1)[0]:
+            raise FileExistsError("recording in {:s} not empty, "
+                                  "use append or overwrite".format(directory))
+        if not (append and exists):
+            np.zeros(1, np.uint64).tofile(length_path)
+            for name, dtype in AS7341_RECORDER_COLUMNS:
+                open(_column_path(directory, name, dtype), "wb").close()
+        self._length_map = np.memmap(length_path, np.uint64, "r+", shape=(1,))
+        self._length = int(self._length_map[0])
+        self._capacity = 0
+        self._maps = {}
+        self._grow(max(self._length, self._chunk))
+
+    def _grow(self, capacity):
+        """ extend all column files to <capacity> rows and re-map them """
+        capacity = -(-capacity // self._chunk) * self._chunk     # whole chunks
+        self.flush()
+        self._maps = {}
+        for name, dtype in AS7341_RECORDER_COLUMNS:
+            path = _column_path(self._dir, name, dtype)
+            with open(path, "r+b") as f:
+                f.truncate(capacity * np.dtype(dtype).itemsize)
+            self._maps[name] = np.memmap(path, dtype, "r+", shape=(capacity,))
+        self._counts = [self._maps["ch{:d}".format(i)] for i in range(6)]
+        self._capacity = capacity
+
+    def __len__(self):
+        return self._length
+
+    def append(self, counts, timestamp, gain=0, status=0):
+        """ append one reading: 6 counts, timestamp (s), gain code, ASTATUS """
+        n = self._length
+        if n >= self._capacity:
+            self._grow(n + self._chunk)
+        for column, count in zip(self._counts, counts):
+            column[n] = count
+        self._maps["time"][n] = timestamp
+        self._maps["gain"][n] = gain
+        self._maps["status"][n] = status
+        self._length = n + 1
+        self._length_map[0] = self._length
+
+    def append_record(self, record, timestamp=None):
+        """ append a SpectralRecord (see as7341_record.py)
+            <timestamp> in seconds, default the ticks_ms of the record / 1000
+        """
+        if timestamp is None:
+            timestamp = record.timestamp / 1000
+        self.append(record.counts, timestamp, record.again, record.astatus)
+
+    def append_many(self, counts, timestamps, gains=0, statuses=0):
+        """ append a block of readings: <counts> array (N x 6),
+            <timestamps> N values, <gains> and <statuses> scalar or N values
+        """
+        counts = np.asarray(counts, dtype=np.uint16).reshape(-1, 6)
+        rows = counts.shape[0]
+        n = self._length
+        if n + rows > self._capacity:
+            self._grow(n + rows + self._chunk)
+        for i in range(6):
+            self._counts[i][n : n + rows] = counts[:, i]
+        self._maps["time"][n : n + rows] = timestamps
+        self._maps["gain"][n : n + rows] = gains
+        self._maps["status"][n : n + rows] = statuses
+        self._length = n + rows
+        self._length_map[0] = self._length
+
+    def flush(self):
+        """ write modified pages to the files """
+        for column in self._maps.values():
+            column.flush()
+        self._length_map.flush()
+
+    def close(self):
+        """ flush, trim the files to the recorded length and release the maps """
+        self.flush()
+        self._maps = {}
+        self._counts = []
+        for name, dtype in AS7341_RECORDER_COLUMNS:
+            path = _column_path(self._dir, name, dtype)
+            with open(path, "r+b") as f:
+                f.truncate(self._length * np.dtype(dtype).itemsize)
+        self._capacity = self._length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ColumnReader:
+    """ Read-only zero-copy access to a (possibly growing) recording """
+    def __init__(self, directory):
+        self._dir = directory
+        self._length_map = np.memmap(_column_path(directory, "length", np.uint64),
+                                     np.uint64, "r", shape=(1,))
+        self._maps = {}
+        self._mapped = 0
+        self.refresh()
+
+    def refresh(self):
+        """ re-map the column files when the recording has grown,
+            return the number of valid rows
+        """
+        length = int(self._length_map[0])
+        if length > self._mapped or not self._maps:
+            maps = {}
+            for name, dtype in AS7341_RECORDER_COLUMNS:
+                path = _column_path(self._dir, name, dtype)
+                rows = os.path.getsize(path) // np.dtype(dtype).itemsize
+                if rows == 0:
+                    maps[name] = np.zeros(0, dtype)
+                else:
+                    maps[name] = np.memmap(path, dtype, "r", shape=(rows,))
+            self._maps = maps
+            self._mapped = min(len(m) for m in maps.values())
+        self._length = min(length, self._mapped)
+        return self._length
+
+    def __len__(self):
+        return self._length
+
+    def column(self, name):
+        """ return column <name> as read-only array view (no copy) """
+        return self._maps[name][: self._length]
+
+    def columns(self):
+        """ return dictionary column name -> read-only array view """
+        return {name: self.column(name) for name, _ in AS7341_RECORDER_COLUMNS}
+
+    def counts(self):
+        """ return the counts as a list of 6 read-only array views """
+        return [self.column("ch{:d}".format(i)) for i in range(6)]
+
+#
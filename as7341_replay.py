@@ -0,0 +1,250 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Recording and replay of I2C transactions of the AS7341 driver
+
+    RecordingI2C wraps an I2C object (machine.I2C, LinuxI2C, SimulatedI2C)
+    and writes every readfrom_mem_into() and writeto_mem() to a file.
+    ReplayI2C serves the recorded read responses, so a session can be
+    re-run offline (e.g. against a newer driver) without hardware.
+
+    File format (little endian): header b"AS7341TR" + version byte,
+    followed per transaction by:
+        op       uint8   0 = read, 1 = write, +0x80 when it failed
+        addr     uint8   I2C address
+        reg      uint8   register address
+        delta    uint32  microseconds since previous transaction
+                         (0xFFFFFFFF: idle longer than the ticks_us() range)
+        duration uint32  microseconds spent in the transaction
+        length   uint16  number of payload bytes
+        payload          bytes read or written
+"""
+
+import struct
+
+from as7341_compat import const, sleep_ms, ticks_ms, ticks_us, ticks_diff
+
+AS7341_TRACE_MAGIC   = b"AS7341TR"
+AS7341_TRACE_VERSION = const(1)
+AS7341_TRACE_READ    = const(0)
+AS7341_TRACE_WRITE   = const(1)
+AS7341_TRACE_ERROR   = const(0x80)
+
+_ENTRY = "<BBBIIH"
+_ENTRY_SIZE = struct.calcsize(_ENTRY)
+_DELTA_MAX = const(0xFFFFFFFF)              # marks a long idle period
+_IDLE_MS = const(500000)                    # ticks_us() differences valid below
+
+
+class RecordingI2C:
+    """ I2C wrapper recording all register transactions to a file """
+    def __init__(self, bus, path):
+        self._bus = bus
+        self._file = open(path, "wb")
+        self._file.write(AS7341_TRACE_MAGIC + bytes((AS7341_TRACE_VERSION,)))
+        self._last = ticks_us()
+        self._last_ms = ticks_ms()
+        self.reads = 0
+        self.writes = 0
+
+    def _record(self, op, addr, reg, start, payload):
+        end = ticks_us()
+        now_ms = ticks_ms()
+        if ticks_diff(now_ms, self._last_ms) >= _IDLE_MS:
+            delta = _DELTA_MAX                  # ticks_us() wrapped around
+        else:
+            delta = min(max(ticks_diff(start, self._last), 0), _DELTA_MAX)
+        duration = min(max(ticks_diff(end, start), 0), _DELTA_MAX)
+        entry = struct.pack(_ENTRY, op, addr, reg, delta, duration, len(payload))
+        self._file.write(entry)
+        self._file.write(payload)
+        self._last = start
+        self._last_ms = now_ms
+
+    def readfrom_mem_into(self, addr, memaddr, buf):
+        start = ticks_us()
+        self.reads += 1
+        try:
+            self._bus.readfrom_mem_into(addr, memaddr, buf)
+        except Exception:
+            self._record(AS7341_TRACE_READ | AS7341_TRACE_ERROR, addr, memaddr,
+                         start, bytes(len(buf)))
+            raise
+        self._record(AS7341_TRACE_READ, addr, memaddr, start, bytes(buf))
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        buf = bytearray(nbytes)
+        self.readfrom_mem_into(addr, memaddr, buf)
+        return bytes(buf)
+
+    def writeto_mem(self, addr, memaddr, buf):
+        start = ticks_us()
+        self.writes += 1
+        try:
+            self._bus.writeto_mem(addr, memaddr, buf)
+        except Exception:
+            self._record(AS7341_TRACE_WRITE | AS7341_TRACE_ERROR, addr, memaddr,
+                         start, bytes(buf))
+            raise
+        self._record(AS7341_TRACE_WRITE, addr, memaddr, start, bytes(buf))
+
+    def scan(self):
+        return self._bus.scan()
+
+    def close(self):
+        """ close the trace file """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def load_trace(path):
+    """ return list of transactions from a trace file as tuples
+        (op, addr, reg, delta_us, duration_us, payload)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    header = len(AS7341_TRACE_MAGIC) + 1
+    if data[: len(AS7341_TRACE_MAGIC)] != AS7341_TRACE_MAGIC:
+        raise ValueError("not an AS7341 trace file")
+    entries = []
+    pos = header
+    while pos + _ENTRY_SIZE <= len(data):
+        op, addr, reg, delta, duration, length = struct.unpack_from(_ENTRY, data, pos)
+        pos += _ENTRY_SIZE
+        entries.append((op, addr, reg, delta, duration, bytes(data[pos : pos + length])))
+        pos += length
+    return entries
+
+
+def trace_summary(entries):
+    """ return dictionary with number of reads, writes, errors, bytes and
+        total time (us) spent in transactions of a list of transactions
+    """
+    summary = {"reads": 0, "writes": 0, "errors": 0, "bytes": 0, "busy_us": 0}
+    for op, _, _, _, duration, payload in entries:
+        if op & AS7341_TRACE_ERROR:
+            summary["errors"] += 1
+        if op & 0x7F == AS7341_TRACE_READ:
+            summary["reads"] += 1
+        else:
+            summary["writes"] += 1
+        summary["bytes"] += len(payload)
+        summary["busy_us"] += duration
+    return summary
+
+
+class ReplayI2C:
+    """ Serve recorded read responses deterministically
+
+        Read responses are served per (address, register, length) in the
+        recorded order; when exhausted the last response is repeated.
+        So a driver issuing other or fewer transactions than the recorded
+        one still gets consistent data. Writes are accepted and counted.
+        With <timing> True the recorded durations of reads and writes are
+        reproduced (the delays between transactions are the driver's own).
+    """
+    def __init__(self, path, timing=False):
+        self._timing = timing
+        self._responses = {}
+        self._index = {}
+        self._durations = {}                    # write key -> durations
+        self._write_index = {}
+        self._debt_us = 0                       # not yet slept microseconds
+        self.addresses = set()
+        for op, addr, reg, delta, duration, payload in load_trace(path):
+            self.addresses.add(addr)
+            key = (addr, reg, len(payload))
+            if op & 0x7F == AS7341_TRACE_READ:
+                self._responses.setdefault(key, []).append(
+                    (duration, op & AS7341_TRACE_ERROR, payload))
+            else:
+                self._durations.setdefault(key, []).append(duration)
+        self.reads = 0
+        self.writes = 0
+        self.misses = 0                         # reads without recording
+
+    def _delay(self, duration):
+        """ sleep <duration> microseconds, remainders below 1 ms accumulated """
+        self._debt_us += duration
+        if self._debt_us >= 1000:
+            sleep_ms(self._debt_us // 1000)
+            self._debt_us %= 1000
+
+    def readfrom_mem_into(self, addr, memaddr, buf):
+        self.reads += 1
+        key = (addr, memaddr, len(buf))
+        responses = self._responses.get(key)
+        if not responses:
+            self.misses += 1
+            if addr not in self.addresses:
+                raise OSError(19, "ENODEV")
+            for i in range(len(buf)):
+                buf[i] = 0
+            return
+        i = self._index.get(key, 0)
+        duration, error, payload = responses[min(i, len(responses) - 1)]
+        self._index[key] = i + 1
+        if self._timing:
+            self._delay(duration)
+        if error:
+            raise OSError(5, "EIO (recorded)")
+        buf[:] = payload
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        buf = bytearray(nbytes)
+        self.readfrom_mem_into(addr, memaddr, buf)
+        return bytes(buf)
+
+    def writeto_mem(self, addr, memaddr, buf):
+        self.writes += 1
+        if addr not in self.addresses:
+            raise OSError(19, "ENODEV")
+        if self._timing:
+            key = (addr, memaddr, len(buf))
+            durations = self._durations.get(key)
+            if durations:
+                i = self._write_index.get(key, 0)
+                self._write_index[key] = i + 1
+                self._delay(durations[min(i, len(durations) - 1)])
+
+    def scan(self):
+        return sorted(self.addresses)
+
+    def rewind(self):
+        """ serve the responses from the start again """
+        self._index = {}
+        self._write_index = {}
+
+#
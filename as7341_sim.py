@@ -0,0 +1,264 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Simulated AS7341 on a simulated I2C bus
+
+    SimulatedI2C offers the machine.I2C interface used by the driver
+    (readfrom_mem_into, readfrom_mem, writeto_mem, scan) and behaves at
+    register level like an AS7341: register banks (CFG_0 REG_BANK),
+    ID register, SMUX RAM, SMUXEN and SP_EN handling, AVALID, ASTATUS
+    latching with saturation, spectral thresholds (SINT), write-1-to-clear
+    STATUS and FD_STATUS and flicker detection.
+    Counts are derived from <light>: a dictionary channel name -> counts
+    per millisecond integration at gain factor 1, plus <led_reflect>
+    counts per ms per mA when the onboard LED is on.
+    With <realtime> True measurements take the programmed integration
+    time, otherwise results are available immediately.
+    Faults can be injected with <connected> False (no acknowledge) and
+    brownout() (loss of all register contents).
+
+    Intended for running the driver, examples and tools without hardware,
+    e.g. on a Linux host (see also as7341_linux.py).
+"""
+
+from time import monotonic
+
+from as7341_compat import const
+from as7341_smux_select import AS7341_SMUX_SELECT, AS7341_SMUX_CHANNELS
+
+AS7341_SIM_LIGHT = {                        # counts per ms at gain 1
+    "F1": 2.0, "F2": 4.0, "F3": 6.0, "F4": 8.0,
+    "F5": 9.0, "F6": 8.5, "F7": 7.0, "F8": 4.5,
+    "CLEAR": 30.0, "NIR": 3.0,
+    }
+
+
+class SimulatedI2C:
+    """ Register level simulation of an AS7341 behind an I2C interface """
+    def __init__(self, light=None, addr=0x39, realtime=False, flicker=0,
+                 led_reflect=0.5):
+        self.light = dict(AS7341_SIM_LIGHT if light is None else light)
+        self.led_reflect = led_reflect
+        self.flicker = flicker                  # 0, 100 or 120 Hz
+        self.addr = addr
+        self.realtime = realtime
+        self.connected = True                   # False: no acknowledge
+        self.bank0 = bytearray(0x80)            # 0x80..0xFF
+        self.bank1 = bytearray(0x15)            # 0x60..0x74
+        self.smux = bytearray(20)               # SMUX RAM (written by host)
+        self.smux_active = bytearray(20)        # configuration in effect
+        self.reads = 0                          # number of read transactions
+        self.writes = 0                         # number of write transactions
+        self._latched = bytearray(13)           # ASTATUS + counts
+        self._pending = None                    # counts of running measurement
+        self._ready_at = 0.0
+        self._smux_cmd = 0
+        self.bank0[0x92 - 0x80] = 0x24          # ID
+        self.bank0[0xCA - 0x80] = 0xE7          # ASTEP 999 (reset value)
+        self.bank0[0xCB - 0x80] = 0x03
+
+    # --------- register access ----------
+
+    def _bank1_selected(self):
+        return bool(self.bank0[0xA9 - 0x80] & 0x10)
+
+    def _get(self, reg):
+        if reg >= 0x80:
+            return self.bank0[reg - 0x80]
+        if 0x60 <= reg <= 0x74 and self._bank1_selected():
+            return self.bank1[reg - 0x60]
+        if reg < 20:
+            return self.smux[reg]
+        return 0
+
+    def _set(self, reg, value):
+        if reg >= 0x80:
+            if reg in (0x93, 0xDB):             # write 1 to clear
+                self.bank0[reg - 0x80] &= ~value
+            elif reg == 0x80:
+                self._enable(value)
+            elif reg == 0xAF:
+                self._smux_cmd = value & 0x18
+                self.bank0[reg - 0x80] = value
+            elif reg not in (0x90, 0x91, 0x92, 0xA3):   # read-only
+                self.bank0[reg - 0x80] = value
+        elif 0x60 <= reg <= 0x74 and self._bank1_selected():
+            self.bank1[reg - 0x60] = value
+        elif reg < 20:
+            self.smux[reg] = value
+
+    def _enable(self, value):
+        old = self.bank0[0]
+        if not value & 0x01:                    # power off
+            value = 0
+        if value & 0x10 and self._smux_cmd == 0x10:
+            self.smux_active[:] = self.smux     # SMUX write command
+        value &= ~0x10                          # SMUXEN completes at once
+        self.bank0[0] = value
+        if value & 0x02 and not old & 0x02:     # SP_EN rising edge
+            self._start()
+        if value & 0x40:                        # FDEN
+            self._flicker()
+
+    # --------- measurement ----------
+
+    def _integration_ms(self):
+        atime = self.bank0[0x81 - 0x80]
+        astep = self.bank0[0xCA - 0x80] | (self.bank0[0xCB - 0x80] << 8)
+        return (atime + 1) * (astep + 1) * 2.78 / 1000, (atime + 1) * (astep + 1)
+
+    def _selection(self):
+        for key, data in AS7341_SMUX_SELECT.items():
+            if bytes(self.smux_active) == data:
+                return key
+        return None
+
+    def _start(self):
+        tint, fullscale = self._integration_ms()
+        fullscale = min(fullscale, 65535)
+        gain = self.bank0[0xAA - 0x80] & 0x0F
+        factor = 2 ** (gain - 1)
+        names = AS7341_SMUX_CHANNELS.get(self._selection(), (None,) * 6)
+        led = self.bank1[0x74 - 0x60]
+        extra = self.led_reflect * (4 + 2 * (led & 0x7F)) if led & 0x80 else 0
+        counts = []
+        saturated = False
+        for name in names:
+            value = int((self.light.get(name, 0) + extra) * factor * tint) if name else 0
+            if value >= fullscale:
+                value = fullscale
+                saturated = True
+            counts.append(value)
+        self._pending = (counts, gain | (0x80 if saturated else 0))
+        self._ready_at = monotonic() + (tint / 1000 if self.realtime else 0)
+
+    def _update(self):
+        """ complete a running measurement when its time has come """
+        if self._pending is None or monotonic() < self._ready_at:
+            return
+        counts, astatus = self._pending
+        self._pending = None
+        raw = self._latched
+        raw[0] = astatus
+        for i, value in enumerate(counts):
+            raw[1 + 2*i] = value & 0xFF
+            raw[2 + 2*i] = value >> 8
+        self.bank0[0x94 - 0x80 : 0xA1 - 0x80] = raw
+        self.bank0[0xA3 - 0x80] |= 0x40         # AVALID
+        status = 0x08                           # AINT
+        if astatus & 0x80:
+            status |= 0x80                      # ASAT
+        ch = self.bank0[0xB5 - 0x80] & 0x07
+        lo = self.bank0[0x84 - 0x80] | (self.bank0[0x85 - 0x80] << 8)
+        hi = self.bank0[0x86 - 0x80] | (self.bank0[0x87 - 0x80] << 8)
+        if ch < 6 and lo < hi and not lo <= counts[ch] <= hi:
+            status |= 0x01                      # SINT
+        self.bank0[0x93 - 0x80] |= status
+        if self.bank0[0] & 0x08 and self.bank0[0] & 0x02:   # WEN: re-start
+            self._start()
+
+    def _flicker(self):
+        status = 0x20 | 0x04 | 0x08             # MEAS_VALID, 100 and 120 valid
+        if self.flicker == 100:
+            status |= 0x01
+        elif self.flicker == 120:
+            status |= 0x02
+        self.bank0[0xDB - 0x80] = status
+
+    def brownout(self):
+        """ lose all register contents, as after a supply dip """
+        self.bank0[:] = bytes(len(self.bank0))
+        self.bank1[:] = bytes(len(self.bank1))
+        self.smux[:] = bytes(len(self.smux))
+        self.smux_active[:] = bytes(len(self.smux_active))
+        self._pending = None
+        self._smux_cmd = 0
+        self.bank0[0x92 - 0x80] = 0x24          # ID
+        self.bank0[0xCA - 0x80] = 0xE7          # ASTEP 999 (reset value)
+        self.bank0[0xCB - 0x80] = 0x03
+
+    # --------- machine.I2C interface ----------
+
+    def _check(self, addr):
+        if addr != self.addr or not self.connected:
+            raise OSError(19, "ENODEV")         # no acknowledge
+
+    def readfrom_mem_into(self, addr, memaddr, buf):
+        self._check(addr)
+        self.reads += 1
+        self._update()
+        if self.bank0[0] & 0x40 and not self.bank0[0xDB - 0x80] & 0x20:
+            self._flicker()                     # FDEN: next result
+        for i in range(len(buf)):
+            buf[i] = self._get(memaddr + i)
+        if memaddr <= 0x94 < memaddr + len(buf):
+            self.bank0[0xA3 - 0x80] &= ~0x40    # reading ASTATUS clears AVALID
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        buf = bytearray(nbytes)
+        self.readfrom_mem_into(addr, memaddr, buf)
+        return bytes(buf)
+
+    def writeto_mem(self, addr, memaddr, buf):
+        self._check(addr)
+        self.writes += 1
+        self._update()
+        for i, value in enumerate(buf):
+            self._set(memaddr + i, value)
+
+    def scan(self):
+        return [self.addr] if self.connected else []
+
+
+class SimulatedBus:
+    """ Several simulated AS7341 devices on one simulated I2C bus """
+    def __init__(self, addresses=(0x39,), **kwargs):
+        """ <addresses> I2C addresses of the devices,
+            <kwargs> are passed to SimulatedI2C
+        """
+        self.devices = {addr: SimulatedI2C(addr=addr, **kwargs) for addr in addresses}
+
+    def _device(self, addr):
+        device = self.devices.get(addr)
+        if device is None:
+            raise OSError(19, "ENODEV")         # no acknowledge
+        return device
+
+    def readfrom_mem_into(self, addr, memaddr, buf):
+        self._device(addr).readfrom_mem_into(addr, memaddr, buf)
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        return self._device(addr).readfrom_mem(addr, memaddr, nbytes)
+
+    def writeto_mem(self, addr, memaddr, buf):
+        self._device(addr).writeto_mem(addr, memaddr, buf)
+
+    def scan(self):
+        return sorted(a for a, d in self.devices.items() if d.connected)
+
+#
@@ -45,8 +45,25 @@ AS7341_SMUX_SELECT = {
     "F2F7":   b'\x20\x00\x00\x00\x05\x31\x40\x06\x00\x40\x06\x00\x10\x03\x50\x20\x00\x00\x00\x00',
     # F3 through F8:
     "F3F8":   b'\x10\x00\x00\x60\x04\x20\x30\x05\x00\x30\x05\x00\x00\x02\x46\x10\x00\x00\x00\x00',
+    # F1 through F4, CLEAR, Flicker Detection (in stead of NIR):
+    "F1F4CF": b'\x30\x01\x00\x00\x00\x42\x00\x00\x50\x00\x00\x00\x20\x04\x00\x30\x01\x50\x00\x60',
+    # F5 through F8, CLEAR, Flicker Detection (in stead of NIR):
+    "F5F8CF": b'\x00\x00\x00\x40\x02\x00\x10\x03\x50\x10\x03\x00\x00\x00\x24\x00\x00\x50\x00\x60',
     # Flicker Detection only:
     "FD":     b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x60',
     }
 
+""" Names of the channels (counts 0..5) per SMUX configuration
+    None means: channel not connected
+"""
+AS7341_SMUX_CHANNELS = {
+    "F1F4CN": ("F1", "F2", "F3", "F4", "CLEAR", "NIR"),
+    "F5F8CN": ("F5", "F6", "F7", "F8", "CLEAR", "NIR"),
+    "F2F7":   ("F2", "F3", "F4", "F5", "F6", "F7"),
+    "F3F8":   ("F3", "F4", "F5", "F6", "F7", "F8"),
+    "F1F4CF": ("F1", "F2", "F3", "F4", "CLEAR", None),
+    "F5F8CF": ("F5", "F6", "F7", "F8", "CLEAR", None),
+    "FD":     (None, None, None, None, None, None),
+    }
+
 #
@@ -0,0 +1,233 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Register snapshot of the AS7341
+
+    A snapshot holds the contents of registers 0x80..0xFC (bank 0) and
+    0x60..0x74 (bank 1, one block read), plus the key of the last selected
+    SMUX configuration (the SMUX RAM cannot be read back directly).
+    Bank 0 is read in the blocks of AS7341_SNAPSHOT_BLOCKS: ASTATUS and
+    the counts (0x94..0xA0) are skipped (and zero in the snapshot) because
+    reading ASTATUS latches the counts and clears AVALID, the FIFO data
+    registers 0xFE/0xFF are excluded because reading them pops the FIFO.
+    Named fields are decoded only when requested.
+
+    AS7341_SNAPSHOT_RUNS lists the writable registers of bank 0 as
+    (start, length) runs of contiguous addresses, each restored with a
+    single burst write. CONTROL (0xFA) is skipped: its bits are commands
+    (clear SAI, clear FIFO, zero offset), not settings. ENABLE is restored
+    last.
+
+    read_snapshot() reads a snapshot with plain I2C transactions, without
+    an AS7341 instance (which would reset the device), e.g. for a dump.
+
+    This file is imported by AS7341.snapshot() and AS7341.restore()
+"""
+
+from as7341_compat import const
+
+AS7341_SNAPSHOT_BANK0 = const(0x80)         # first address of bank 0 block
+AS7341_SNAPSHOT_BANK0_LEN = const(0x7D)     # 0x80..0xFC
+AS7341_SNAPSHOT_BANK1 = const(0x60)         # first address of bank 1 block
+AS7341_SNAPSHOT_BANK1_LEN = const(0x15)     # 0x60..0x74
+
+AS7341_SNAPSHOT_BLOCKS = (                  # block reads of bank 0
+    (0x80, 0x14),                           # ENABLE .. STATUS
+    (0xA1, 0x5C),                           # CH5_DATA_H + 1 .. 0xFC
+    )
+
+AS7341_SNAPSHOT_RUNS = (
+    (0x81, 1),                              # ATIME
+    (0x83, 5),                              # WTIME, SP_TH_L, SP_TH_H
+    (0xAA, 1),                              # CFG_1 (AGAIN)
+    (0xAC, 1),                              # CFG_3
+    (0xB1, 3),                              # CFG_8, CFG_9, CFG_10
+    (0xB5, 1),                              # CFG_12
+    (0xBD, 2),                              # PERS, GPIO_2
+    (0xCA, 2),                              # ASTEP
+    (0xCF, 1),                              # AGC_GAIN_MAX
+    (0xD6, 3),                              # AZ_CONFIG, FD_CFG0, FD_TIME_1
+    (0xDA, 1),                              # FD_TIME_2
+    (0xF9, 1),                              # INTENAB
+    (0xFC, 1),                              # FIFO_MAP
+    )
+
+AS7341_SNAPSHOT_BANK1_RUNS = (
+    (0x70, 1),                              # CONFIG
+    (0x72, 3),                              # EDGE, GPIO, LED
+    )
+
+AS7341_SNAPSHOT_VERSION = const(1)
+
+
+class AS7341Snapshot:
+    """ Raw register contents with lazily decoded named fields """
+    __slots__ = ("bank0", "bank1", "selection")
+
+    def __init__(self, bank0, bank1, selection=None):
+        self.bank0 = bytes(bank0)               # 0x80..0xFC
+        self.bank1 = bytes(bank1)               # 0x60..0x74
+        self.selection = selection              # SMUX selection key
+
+    def reg(self, addr):
+        """ return contents of register <addr> """
+        if addr >= AS7341_SNAPSHOT_BANK0:
+            return self.bank0[addr - AS7341_SNAPSHOT_BANK0]
+        return self.bank1[addr - AS7341_SNAPSHOT_BANK1]
+
+    def word(self, addr):
+        """ return little endian word at <addr> and <addr> + 1 """
+        return self.reg(addr) | (self.reg(addr + 1) << 8)
+
+    @property
+    def enable(self):
+        return self.reg(0x80)
+
+    @property
+    def atime(self):
+        return self.reg(0x81)
+
+    @property
+    def wtime(self):
+        return self.reg(0x83)
+
+    @property
+    def thresholds(self):
+        return (self.word(0x84), self.word(0x86))
+
+    @property
+    def id(self):
+        return self.reg(0x92)
+
+    @property
+    def status(self):
+        return self.reg(0x93)
+
+    @property
+    def cfg_0(self):
+        return self.reg(0xA9)
+
+    @property
+    def again(self):
+        return self.reg(0xAA)
+
+    @property
+    def persistence(self):
+        return self.reg(0xBD)
+
+    @property
+    def gpio_2(self):
+        return self.reg(0xBE)
+
+    @property
+    def threshold_channel(self):
+        return self.reg(0xB5) & 0x07
+
+    @property
+    def astep(self):
+        return self.word(0xCA)
+
+    @property
+    def fd_time(self):
+        return self.reg(0xD8) | ((self.reg(0xDA) & 0x07) << 8)
+
+    @property
+    def fd_gain(self):
+        return self.reg(0xDA) >> 3
+
+    @property
+    def intenab(self):
+        return self.reg(0xF9)
+
+    @property
+    def config(self):
+        return self.reg(0x70)
+
+    @property
+    def measure_mode(self):
+        return self.reg(0x70) & 0x03
+
+    @property
+    def led(self):
+        return self.reg(0x74)
+
+    @property
+    def integration_time(self):
+        """ integration time in milliseconds """
+        return (self.astep + 1) * (self.atime + 1) * 2.78 / 1000
+
+    def fields(self):
+        """ return a dictionary with all named fields (decoded now) """
+        names = ("enable", "atime", "wtime", "thresholds", "id", "status",
+                 "cfg_0", "again", "persistence", "gpio_2", "threshold_channel",
+                 "astep", "fd_time", "fd_gain", "intenab", "config",
+                 "measure_mode", "led", "integration_time", "selection")
+        return {name: getattr(self, name) for name in names}
+
+    def to_bytes(self):
+        """ serialize: version, bank 0, bank 1, selection (ASCII) """
+        sel = self.selection.encode() if self.selection else b''
+        return bytes((AS7341_SNAPSHOT_VERSION,)) + self.bank0 + self.bank1 + sel
+
+    @classmethod
+    def from_bytes(cls, data):
+        """ inverse of to_bytes()
+            raise ValueError with an unknown version or truncated data
+        """
+        if not len(data) or data[0] != AS7341_SNAPSHOT_VERSION:
+            raise ValueError("unknown AS7341 snapshot version")
+        if len(data) < 1 + AS7341_SNAPSHOT_BANK0_LEN + AS7341_SNAPSHOT_BANK1_LEN:
+            raise ValueError("truncated AS7341 snapshot")
+        start = 1
+        end0 = start + AS7341_SNAPSHOT_BANK0_LEN
+        end1 = end0 + AS7341_SNAPSHOT_BANK1_LEN
+        sel = bytes(data[end1:]).decode() or None
+        return cls(data[start:end0], data[end0:end1], sel)
+
+
+def read_snapshot(i2c, address=0x39, selection=None):
+    """ read registers of the AS7341 at <address> on <i2c> with plain
+        transactions (CFG_0 is rewritten to select bank 1 and restored)
+        return an AS7341Snapshot, I2C errors are raised (OSError)
+    """
+    bank0 = bytearray(AS7341_SNAPSHOT_BANK0_LEN)
+    bank1 = bytearray(AS7341_SNAPSHOT_BANK1_LEN)
+    for reg, length in AS7341_SNAPSHOT_BLOCKS:
+        buf = bytearray(length)
+        i2c.readfrom_mem_into(address, reg, buf)
+        i = reg - AS7341_SNAPSHOT_BANK0
+        bank0[i : i + length] = buf
+    cfg0 = bank0[0xA9 - AS7341_SNAPSHOT_BANK0] & ~0x10      # CFG_0, REG_BANK
+    i2c.writeto_mem(address, 0xA9, bytes((cfg0 | 0x10,)))
+    try:
+        i2c.readfrom_mem_into(address, AS7341_SNAPSHOT_BANK1, bank1)
+    finally:
+        i2c.writeto_mem(address, 0xA9, bytes((cfg0,)))
+    return AS7341Snapshot(bank0, bank1, selection)
+
+#
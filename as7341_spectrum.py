@@ -0,0 +1,266 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Spectrum reconstruction from AS7341 readings (Linux host, NumPy)
+
+    A reading is a vector of basic counts (counts / (gain * integration
+    time), see basic_counts()) of the channels F1..F8, CLEAR and NIR,
+    e.g. combined from the "F1F4CN" and "F5F8CN" channel mappings.
+    With the channel response curves R (channels x wavelengths) the
+    spectrum s follows from r = R s. This is strongly under-determined,
+    so a regularized inverse M (wavelengths x channels) is used:
+
+      - "tikhonov": M = (R'R + lambda L'L + eps I)^-1 R'
+                    with L the second difference operator (smooth spectra)
+                    and a small ridge term eps (no extrapolation at the ends)
+      - "wiener":   M = P R' (R P R' + lambda I)^-1
+                    with P an exponential correlation prior (<corr_nm>)
+
+    <regularization> (lambda) is relative to the scale of R, so it does not
+    depend on the units of the response curves.
+    M is computed once per calibration (response curves, wavelength grid,
+    method and regularization) and cached.
+    The rows of M are extended with linear metrics of the spectrum: photon
+    flux in the PAR range (PPFD) and the CIE 1931 tristimulus values XYZ.
+    Spectrum and metrics of a batch of readings then are a single matrix
+    product; the dominant wavelength follows from the chromaticity.
+
+    Without measured response curves (calibration) Gaussian approximations
+    are used (AS7341_SPECTRUM_BANDS): the reconstructed spectrum then has
+    relative units and PPFD is relative as well. With response curves in
+    basic counts per (W/m2/nm) the spectrum is in W/m2/nm and PPFD in
+    umol/m2/s.
+"""
+
+import hashlib
+
+import numpy as np
+
+AS7341_SPECTRUM_CHANNELS = ("F1", "F2", "F3", "F4", "F5", "F6", "F7", "F8",
+                            "CLEAR", "NIR")
+
+# approximate centre wavelength and FWHM (nm) of the channels
+AS7341_SPECTRUM_BANDS = {
+    "F1": (415, 26), "F2": (445, 30), "F3": (480, 36), "F4": (515, 39),
+    "F5": (555, 39), "F6": (590, 40), "F7": (630, 50), "F8": (680, 52),
+    "CLEAR": (620, 400), "NIR": (910, 50),
+    }
+
+AS7341_PAR_RANGE = (400, 700)               # nm
+AS7341_WHITE_D65 = (0.3127, 0.3290)         # chromaticity of white point
+
+_UMOL_PER_J_NM = 1e-9 / (6.62607015e-34 * 2.99792458e8 * 6.02214076e23) * 1e6
+
+_INVERSE_CACHE = {}                         # calibration key -> matrix
+
+
+def basic_counts(counts, again_factor, integration_ms):
+    """ return counts normalized to gain 1 and 1 ms integration time """
+    return np.asarray(counts, dtype=np.float64) / (np.asarray(again_factor) * integration_ms)
+
+
+def gaussian_responses(wavelengths, channels=AS7341_SPECTRUM_CHANNELS):
+    """ return approximate response curves (channels x wavelengths)
+        with peak 1, from AS7341_SPECTRUM_BANDS
+    """
+    wl = np.asarray(wavelengths, dtype=np.float64)
+    curves = np.empty((len(channels), len(wl)))
+    for i, name in enumerate(channels):
+        centre, fwhm = AS7341_SPECTRUM_BANDS[name]
+        sigma = fwhm / 2.3548
+        curves[i] = np.exp(-0.5 * ((wl - centre) / sigma) ** 2)
+    return curves
+
+
+# CIE 1931 2 degree colour matching functions, 380..780 nm in 10 nm steps
+AS7341_CIE_START = 380
+AS7341_CIE_STEP = 10
+AS7341_CIE_XYZ = (
+    (0.001368, 0.000039, 0.006450), (0.004243, 0.000120, 0.020050),
+    (0.014310, 0.000396, 0.067850), (0.043510, 0.001210, 0.207400),
+    (0.134380, 0.004000, 0.645600), (0.283900, 0.011600, 1.385600),
+    (0.348280, 0.023000, 1.747060), (0.336200, 0.038000, 1.772110),
+    (0.290800, 0.060000, 1.669200), (0.195360, 0.090980, 1.287640),
+    (0.095640, 0.139020, 0.812950), (0.032010, 0.208020, 0.465180),
+    (0.004900, 0.323000, 0.272000), (0.009300, 0.503000, 0.158200),
+    (0.063270, 0.710000, 0.078250), (0.165500, 0.862000, 0.042160),
+    (0.290400, 0.954000, 0.020300), (0.433450, 0.994950, 0.008750),
+    (0.594500, 0.995000, 0.003900), (0.762100, 0.952000, 0.002100),
+    (0.916300, 0.870000, 0.001650), (1.026300, 0.757000, 0.001100),
+    (1.062200, 0.631000, 0.000800), (1.002600, 0.503000, 0.000340),
+    (0.854450, 0.381000, 0.000190), (0.642400, 0.265000, 0.000050),
+    (0.447900, 0.175000, 0.000020), (0.283500, 0.107000, 0.000000),
+    (0.164900, 0.061000, 0.000000), (0.087400, 0.032000, 0.000000),
+    (0.046770, 0.017000, 0.000000), (0.022700, 0.008210, 0.000000),
+    (0.011359, 0.004102, 0.000000), (0.005790, 0.002091, 0.000000),
+    (0.002899, 0.001047, 0.000000), (0.001440, 0.000520, 0.000000),
+    (0.000690, 0.000249, 0.000000), (0.000332, 0.000120, 0.000000),
+    (0.000166, 0.000060, 0.000000), (0.000083, 0.000030, 0.000000),
+    (0.000042, 0.000015, 0.000000),
+    )
+
+
+def cie_cmf(wavelengths):
+    """ return CIE 1931 2 degree colour matching functions (3 x wavelengths),
+        linearly interpolated from AS7341_CIE_XYZ, 0 outside 380..780 nm
+    """
+    wl = np.asarray(wavelengths, dtype=np.float64)
+    table = np.array(AS7341_CIE_XYZ).T
+    grid = AS7341_CIE_START + AS7341_CIE_STEP * np.arange(table.shape[1])
+    return np.vstack([np.interp(wl, grid, row, left=0.0, right=0.0) for row in table])
+
+
+def _inverse(responses, wavelengths, method, regularization, corr_nm):
+    """ return the regularized inverse (wavelengths x channels) """
+    R = responses
+    n = R.shape[1]
+    if method == "tikhonov":
+        RtR = R.T @ R
+        L = np.diff(np.eye(n), 2, axis=0)   # second differences
+        LtL = L.T @ L
+        lam = regularization * np.trace(RtR) / np.trace(LtL)
+        eps = 1e-4 * np.trace(RtR) / n       # damps regions without response
+        return np.linalg.solve(RtR + lam * LtL + eps * np.eye(n), R.T)
+    if method == "wiener":
+        wl = np.asarray(wavelengths, dtype=np.float64)
+        P = np.exp(-np.abs(wl[:, None] - wl[None, :]) / corr_nm)
+        RPRt = R @ P @ R.T
+        lam = regularization * np.trace(RPRt) / len(R)
+        return P @ R.T @ np.linalg.inv(RPRt + lam * np.eye(len(R)))
+    raise ValueError("unknown method: {}".format(method))
+
+
+class SpectrumReconstructor:
+    """ Estimate continuous spectra and derived metrics from readings """
+    def __init__(self, wavelengths=None, responses=None,
+                 channels=AS7341_SPECTRUM_CHANNELS, method="tikhonov",
+                 regularization=1e-3, corr_nm=40.0, white=AS7341_WHITE_D65):
+        """ <wavelengths> output grid (nm), default 380..1000 in 1 nm steps
+            <responses> response curves (channels x wavelengths) on that grid,
+            default gaussian_responses()
+            <channels> names of the channels in the readings
+            <method> "tikhonov" or "wiener", <regularization> relative lambda
+            <corr_nm> correlation length of the Wiener prior
+            <white> chromaticity (x, y) of the white point
+        """
+        if wavelengths is None:
+            wavelengths = np.arange(380, 1001, 1)
+        self.wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        if responses is None:
+            responses = gaussian_responses(self.wavelengths, channels)
+        responses = np.asarray(responses, dtype=np.float64)
+        if responses.shape != (len(channels), len(self.wavelengths)):
+            raise ValueError("responses must be channels x wavelengths")
+        self.channels = tuple(channels)
+        step = np.gradient(self.wavelengths)    # nm per sample
+        key = hashlib.sha1(responses.tobytes() + self.wavelengths.tobytes()
+                           + repr((method, regularization, corr_nm)).encode()).hexdigest()
+        inverse = _INVERSE_CACHE.get(key)
+        if inverse is None:                     # new calibration
+            inverse = _inverse(responses * step, self.wavelengths,
+                               method, regularization, corr_nm)
+            _INVERSE_CACHE[key] = inverse
+        self.key = key
+        # metrics as linear functions of the spectrum
+        wl = self.wavelengths
+        par = (wl >= AS7341_PAR_RANGE[0]) & (wl <= AS7341_PAR_RANGE[1])
+        metrics = np.vstack((par * wl * _UMOL_PER_J_NM, cie_cmf(wl))) * step
+        # readings (N x C) @ matrix (C x (W + 4)): spectrum, PPFD, X, Y, Z
+        self._matrix = np.hstack((inverse.T, inverse.T @ metrics.T))
+        self._matrix32 = self._matrix.astype(np.float32)
+        self._white = white
+        self._locus_init()
+
+    def _locus_init(self):
+        """ angles of the spectral locus around the white point """
+        wl = np.arange(380, 701, 1.0)
+        x, y, z = cie_cmf(wl)
+        total = x + y + z
+        xw, yw = self._white
+        angle = np.arctan2(y / total - yw, x / total - xw)
+        phi = np.mod(angle[0] - angle, 2 * np.pi)   # increasing with wavelength
+        self._locus_phi = np.maximum.accumulate(phi)
+        self._locus_wl = wl
+        self._locus_start = angle[0]
+
+    def dominant_wavelength(self, xyz):
+        """ return dominant wavelength (nm) of tristimulus values <xyz>
+            (N x 3), NaN for colours on the purple side and for black
+        """
+        xyz = np.atleast_2d(xyz)
+        total = xyz.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            x = xyz[:, 0] / total
+            y = xyz[:, 1] / total
+        xw, yw = self._white
+        phi = np.mod(self._locus_start - np.arctan2(y - yw, x - xw), 2 * np.pi)
+        result = np.interp(phi, self._locus_phi, self._locus_wl)
+        result[(phi > self._locus_phi[-1]) | ~(total > 0)] = np.nan
+        return result
+
+    def process(self, readings, spectrum=True, nonnegative=False,
+                chunk=65536, dtype=np.float32):
+        """ reconstruct <readings> (C or N x C basic counts)
+            return dictionary with "spectrum" (N x W, only with <spectrum>),
+            "ppfd" (N), "xyz" (N x 3) and "dominant_wavelength" (N)
+            <nonnegative> clips negative spectral values (metrics are
+            computed from the unclipped linear estimate)
+            Batches are processed in chunks of <chunk> readings, each with
+            one matrix product in <dtype>.
+        """
+        r = np.asarray(readings)
+        single = r.ndim == 1
+        r = np.atleast_2d(r)
+        nw = len(self.wavelengths)
+        matrix = self._matrix32 if dtype == np.float32 else self._matrix.astype(dtype)
+        if not spectrum:
+            matrix = matrix[:, nw:]             # metrics only
+        result = np.empty((len(r), matrix.shape[1]), dtype=dtype)
+        for start in range(0, len(r), chunk):
+            np.matmul(r[start : start + chunk].astype(dtype, copy=False), matrix,
+                      out=result[start : start + chunk])
+        metrics = result[:, -4:]
+        out = {
+            "ppfd": metrics[:, 0].copy(),
+            "xyz": metrics[:, 1:].copy(),
+            }
+        out["dominant_wavelength"] = self.dominant_wavelength(out["xyz"])
+        if spectrum:
+            spec = result[:, :nw]
+            if nonnegative:
+                np.maximum(spec, 0, out=spec)
+            out["spectrum"] = spec
+        if single:
+            out = {name: value[0] for name, value in out.items()}
+        return out
+
+    def reconstruct(self, readings, nonnegative=False):
+        """ return only the spectrum of <readings> (W or N x W) """
+        return self.process(readings, True, nonnegative)["spectrum"]
+
+#
@@ -0,0 +1,168 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Integration time planner for the AS7341
+
+    The integration time is (ATIME + 1) * (ASTEP + 1) * 2.78 usec and the
+    full-scale count is the same product (limited to 65535).
+    IntegrationPlanner precomputes (once) a table of (ATIME, ASTEP) pairs
+    with products on a geometric grid and returns for a given signal level
+    the fastest (ATIME, ASTEP, AGAIN) which meets a target SNR and/or a
+    minimum resolution (full-scale count) within a maximum latency,
+    keeping a headroom below saturation.
+
+    Signal level: counts per millisecond integration at gain factor 1,
+    see signal_from_counts(). Noise model (in counts), with photon noise
+    amplified by the gain factor and a fixed read noise:
+        noise ** 2 = gain_factor * counts + read_noise ** 2
+"""
+
+from array import array
+from math import sqrt
+
+from as7341_compat import const
+
+AS7341_ASTEP_US = 2.78                      # microseconds per ASTEP unit
+AS7341_FULLSCALE = const(65535)
+
+
+def signal_from_counts(counts, integration_ms, again):
+    """ return signal level (counts per ms at gain factor 1) from
+        <counts> measured with <integration_ms> and gain code <again>
+    """
+    return counts / (integration_ms * 2 ** (again - 1))
+
+
+class IntegrationPlanner:
+    """ Choose ATIME, ASTEP and AGAIN from a precomputed lookup table """
+    def __init__(self, read_noise=1.0, headroom=0.8, ratio=1.03):
+        """ <read_noise> read noise in counts
+            <headroom> maximum fraction of full scale for the expected counts
+            <ratio> step of the geometric grid of integration times
+        """
+        self._read_noise = read_noise
+        self._headroom = headroom
+        self._build(ratio)
+
+    def _build(self, ratio):
+        """ precompute sorted table of products (ATIME + 1) * (ASTEP + 1) """
+        steps = []                              # ASTEP + 1 values
+        s = 1
+        while s <= 65535:
+            steps.append(s)
+            s = max(s + 1, int(s * 1.25))
+        steps.append(65535)
+        candidates = {}
+        for s in steps:
+            for a in range(1, 257):
+                p = a * s
+                if p not in candidates or a > candidates[p][0]:
+                    candidates[p] = (a, s)      # prefer larger ATIME
+        products = array('L')
+        atimes = bytearray()
+        asteps = array('H')
+        last = 0
+        for p in sorted(candidates):
+            if p >= last * ratio:
+                a, s = candidates[p]
+                products.append(p)
+                atimes.append(a - 1)
+                asteps.append(s - 1)
+                last = p
+        self._products = products
+        self._atimes = atimes
+        self._asteps = asteps
+
+    def __len__(self):
+        return len(self._products)
+
+    def _lookup(self, product):
+        """ return index of smallest table product >= <product> (or None) """
+        lo, hi = 0, len(self._products)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._products[mid] < product:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self._products) else None
+
+    def estimate(self, signal, atime, astep, again):
+        """ return tuple (integration time ms, expected counts, SNR, saturated) """
+        product = (atime + 1) * (astep + 1)
+        tint = product * AS7341_ASTEP_US / 1000
+        factor = 2 ** (again - 1)
+        counts = signal * factor * tint
+        fullscale = min(product, AS7341_FULLSCALE)
+        snr = counts / sqrt(factor * counts + self._read_noise ** 2) if counts > 0 else 0.0
+        return (tint, counts, snr, counts > self._headroom * fullscale)
+
+    def plan(self, signal, snr=None, resolution=None, max_latency_ms=1000):
+        """ return the fastest (ATIME, ASTEP, AGAIN) for <signal>
+            (counts per ms at gain 1) with at least <snr> and a full-scale
+            count of at least <resolution>, within <max_latency_ms>
+            integration time; None when no combination qualifies
+        """
+        r2 = self._read_noise ** 2
+        best = None
+        for again in range(11):                 # equal times: higher gain wins
+            factor = 2 ** (again - 1)
+            rate = signal * factor * AS7341_ASTEP_US / 1000    # counts per unit
+            counts_needed = 0
+            if snr:                             # c**2 / (g*c + r**2) >= snr**2
+                s2g = snr * snr * factor
+                counts_needed = (s2g + sqrt(s2g * s2g + 4 * snr * snr * r2)) / 2
+            product = 1
+            if counts_needed:
+                if rate <= 0:
+                    continue                    # no signal: SNR unreachable
+                product = max(product, int(counts_needed / rate) + 1)
+            if resolution:
+                product = max(product, resolution)
+            i = self._lookup(product)
+            if i is None:
+                continue
+            p = self._products[i]
+            if rate * p > self._headroom * min(p, AS7341_FULLSCALE):
+                continue                        # would (nearly) saturate
+            if p * AS7341_ASTEP_US / 1000 > max_latency_ms:
+                continue
+            if best is None or p <= best[0]:
+                best = (p, self._atimes[i], self._asteps[i], again)
+        if best is None:
+            return None
+        return best[1:]
+
+    def apply(self, sensor, settings):
+        """ program (ATIME, ASTEP, AGAIN) <settings> into AS7341 <sensor> """
+        atime, astep, again = settings
+        sensor.set_atime(atime)
+        sensor.set_astep(astep)
+        sensor.set_again(again)
+
+#
@@ -0,0 +1,224 @@
+"""
+This file licensed under the MIT License and incorporates work covered by
+the following copyright and permission notice:
+
+The MIT License (MIT)
+
+Copyright (c) 2022-2023 Rob Hamerling
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+""" Self-healing supervision of an AS7341
+
+    The watchdog keeps the last-known-good configuration of the sensor in
+    host memory (a register snapshot, see AS7341.snapshot()) and detects
+    faults during acquisition:
+
+      - AS7341_FAULT_ERRORS:  <max_errors> failed I2C transfers since the
+                              last good sample (NACK, bus glitch)
+      - AS7341_FAULT_ID:      the ID register (checked every
+                              <id_interval_ms>) does not show an AS7341
+      - AS7341_FAULT_ASTATUS: impossible ASTATUS: reserved bits set,
+                              AGAIN_STATUS out of range or not the
+                              configured gain
+      - AS7341_FAULT_AVALID:  AVALID not set within <timeout_factor> times
+                              the integration time plus <timeout_ms>
+      - AS7341_FAULT_CONFIG:  registers lost their contents (brown-out):
+                              PON cleared or ATIME changed, checked
+                              together with the ID register
+
+    After a fault the sensor is power-cycled with reset() and the snapshot
+    is written back with restore(): a few burst writes without settle
+    delays. When the sensor does not respond, recovery is retried every
+    <retry_ms> by check() and sample(). Fault counts and downtime
+    (from detection until the sensor is configured again) are kept.
+"""
+
+from as7341_compat import ticks_ms, ticks_diff
+
+from as7341 import *
+
+AS7341_FAULT_ERRORS  = const(0)
+AS7341_FAULT_ID      = const(1)
+AS7341_FAULT_ASTATUS = const(2)
+AS7341_FAULT_AVALID  = const(3)
+AS7341_FAULT_CONFIG  = const(4)
+
+AS7341_FAULT_NAMES = ("errors", "id", "astatus", "avalid", "config")
+
+AS7341_ASTATUS_RESERVED = const(0x70)   # bits 6..4 always 0
+
+
+class SensorWatchdog:
+    """ Detect AS7341 faults and restore the last-known-good configuration """
+    def __init__(self, sensor, max_errors=3, id_interval_ms=1000,
+                 timeout_factor=3, timeout_ms=50, retry_ms=100, settle=2):
+        """ <sensor> is an AS7341 instance, configured before capture()
+            <max_errors> failed transfers since the last good sample
+            which are considered a fault
+            <id_interval_ms> interval of the ID register check (0: never)
+            <timeout_factor>, <timeout_ms> determine when AVALID is stuck
+            <retry_ms> interval between recovery attempts while down
+            <settle> wait (ms) after power-off and power-on in reset()
+        """
+        self._sensor = sensor
+        self.max_errors = max_errors
+        self.id_interval_ms = id_interval_ms
+        self.timeout_factor = timeout_factor
+        self.timeout_ms = timeout_ms
+        self.retry_ms = retry_ms
+        self._settle = settle
+        self._snapshot = None                   # last-known-good configuration
+        self._errors = sensor.get_error_count() # baseline of error counter
+        self._id_checked = ticks_ms()
+        self._down = False
+        self._down_since = 0                    # ticks_ms() of fault detection
+        self._retry_at = 0
+        self._faults = [0] * len(AS7341_FAULT_NAMES)
+        self._last_fault = None
+        self._recoveries = 0
+        self._failures = 0                      # unsuccessful recovery attempts
+        self._downtime_ms = 0                   # total
+        self._last_downtime_ms = 0
+        self._max_downtime_ms = 0
+
+    def capture(self):
+        """ take the current sensor configuration as last-known-good
+            (call after each configuration change)
+            return True when successful
+        """
+        snapshot = self._sensor.snapshot()
+        if snapshot is None:
+            return False
+        self._snapshot = snapshot
+        self._errors = self._sensor.get_error_count()
+        return True
+
+    def _fault(self, reason):
+        """ register a fault and try to recover at once """
+        self._faults[reason] += 1
+        self._last_fault = reason
+        if not self._down:
+            self._down = True
+            self._down_since = ticks_ms()
+        return self.recover()
+
+    def recover(self):
+        """ power-cycle the sensor and restore the last-known-good
+            configuration, return True when the sensor is up again
+        """
+        sensor = self._sensor
+        self._retry_at = ticks_ms()
+        if not sensor.reset(self._settle):
+            self._failures += 1
+            return False
+        if self._snapshot is not None:
+            sensor.restore(self._snapshot, self._settle)
+        self._errors = sensor.get_error_count()
+        self._id_checked = ticks_ms()
+        self._recoveries += 1
+        if self._down:
+            downtime = ticks_diff(ticks_ms(), self._down_since)
+            self._downtime_ms += downtime
+            self._last_downtime_ms = downtime
+            self._max_downtime_ms = max(self._max_downtime_ms, downtime)
+            self._down = False
+        return True
+
+    def _astatus_ok(self, astatus):
+        """ check ASTATUS for impossible contents """
+        again = astatus & AS7341_ASTATUS_AGAIN_STATUS
+        if astatus & AS7341_ASTATUS_RESERVED or again > 10:
+            return False
+        return self._snapshot is None or again == (self._snapshot.again & 0x1F)
+
+    def check(self, record=None):
+        """ check sensor health, optionally with a just obtained
+            SpectralRecord <record>, recover when a fault is found
+            return True when the sensor is (again) healthy
+        """
+        sensor = self._sensor
+        if self._down:
+            if ticks_diff(ticks_ms(), self._retry_at) < self.retry_ms:
+                return False
+            return self.recover()
+        if sensor.get_error_count() - self._errors >= self.max_errors:
+            return self._fault(AS7341_FAULT_ERRORS)
+        if record is not None:
+            if not self._astatus_ok(record.astatus):
+                return self._fault(AS7341_FAULT_ASTATUS)
+            self._errors = sensor.get_error_count()     # good sample
+        if self.id_interval_ms and \
+           ticks_diff(ticks_ms(), self._id_checked) >= self.id_interval_ms:
+            self._id_checked = ticks_ms()
+            if not sensor.check_id():
+                return self._fault(AS7341_FAULT_ID)
+            if self._snapshot is not None:
+                enable = sensor.get_enable()
+                atime = sensor.get_atime()
+                if enable >= 0 and atime >= 0 and (not (enable & AS7341_ENABLE_PON)
+                                                   or atime != self._snapshot.atime):
+                    return self._fault(AS7341_FAULT_CONFIG)   # registers lost
+        return True
+
+    def sample(self, selection=None):
+        """ supervised measurement: start, wait for AVALID with timeout,
+            read and check the counts
+            return a SpectralRecord or None (fault, sensor not yet recovered)
+        """
+        sensor = self._sensor
+        if not self.check():
+            return None
+        limit = int(self.timeout_factor * sensor.get_integration_time()) + self.timeout_ms
+        if not sensor.start_measure(selection, limit):
+            if sensor.get_error_count() - self._errors >= self.max_errors:
+                self._fault(AS7341_FAULT_ERRORS)    # no answer at all
+            else:
+                self._fault(AS7341_FAULT_AVALID)
+            return None
+        record = sensor.get_spectral_record()
+        faults = sum(self._faults)
+        if not self.check(record) or sum(self._faults) != faults:
+            return None                         # record not trustworthy
+        return record
+
+    def is_down(self):
+        """ True after a fault until successful recovery """
+        return self._down
+
+    def get_stats(self):
+        """ return dictionary with fault counts per reason, recoveries,
+            failed recovery attempts and downtime (ms: total, last, max,
+            and current when down)
+        """
+        return {
+            "faults": dict(zip(AS7341_FAULT_NAMES, self._faults)),
+            "last_fault": None if self._last_fault is None
+                          else AS7341_FAULT_NAMES[self._last_fault],
+            "recoveries": self._recoveries,
+            "failures": self._failures,
+            "downtime_ms": self._downtime_ms,
+            "last_downtime_ms": self._last_downtime_ms,
+            "max_downtime_ms": self._max_downtime_ms,
+            "down_ms": ticks_diff(ticks_ms(), self._down_since) if self._down else 0,
+            }
+
+#
@@ -0,0 +1,51 @@
+#
+# Example of logging with adaptive sampling rate:
+# every 0.5 seconds while the light changes, backing off
+# to once per minute while the light is stable
+#
+
+import sys
+from machine import I2C, SoftI2C, Pin
+
+# i2c = SoftI2C(scl=Pin(27), sda=Pin(33))
+i2c = I2C(0)
+addrlist = " ".join(["0x{:02X}".format(x) for x in i2c.scan()])
+print("Detected devices at I2C-addresses:", addrlist)
+
+from as7341 import *
+from as7341_adaptive import *
+from as7341_compat import ticks_ms
+
+sensor = AS7341(i2c)
+if not sensor.isconnected():
+    print("Failed to contact AS7341, terminating")
+    sys.exit(1)
+
+sensor.set_measure_mode(AS7341_MODE_SPM)
+sensor.set_atime(29)                # 30 ASTEPS
+sensor.set_astep(599)               # 1.67 ms
+sensor.set_again(4)                 # factor 8 (with pretty much light)
+sensor.channel_select("F2F7")       # once: same mapping for all samples
+
+# significant: more than 20 counts plus 2% change of any channel
+sampler = AdaptiveSampler(sensor, 500, 60000, delta=20, rel_delta=0.02)
+
+flog = open("AS7341_adaptive.log", "w")
+try:
+    while True:
+        counts = sampler.sample()
+        if counts is None:
+            continue
+        flog.write("{:d} {:s}\n".format(ticks_ms(), " ".join(str(c) for c in counts)))
+        stats = sampler.get_stats()
+        print("F2..F7:", list(counts), "next in {:d} ms, mean rate {:.2f}/s".format(
+              stats["interval_ms"], stats["mean_rate"]))
+
+except KeyboardInterrupt:
+    print("Interrupted from keyboard")
+
+print(sampler.get_stats())
+sensor.disable()
+flog.close()
+
+#
@@ -0,0 +1,48 @@
+#
+# Example of on-device aggregation of AS7341 counts:
+# only a compact summary per window of samples is reported
+#
+
+import sys
+from time import sleep_ms
+from machine import I2C, SoftI2C, Pin
+
+# i2c = SoftI2C(scl=Pin(27), sda=Pin(33))
+i2c = I2C(0)
+addrlist = " ".join(["0x{:02X}".format(x) for x in i2c.scan()])
+print("Detected devices at I2C-addresses:", addrlist)
+
+from as7341 import *
+from as7341_aggregate import *
+
+sensor = AS7341(i2c)
+if not sensor.isconnected():
+    print("Failed to contact AS7341, terminating")
+    sys.exit(1)
+
+sensor.set_measure_mode(AS7341_MODE_SPM)
+sensor.set_atime(29)                # 30 ASTEPS
+sensor.set_astep(599)               # 1.67 ms
+sensor.set_again(4)                 # factor 8 (with pretty much light)
+
+aggregator = SpectralAggregator(window=60)      # summary per 60 samples
+packet = bytearray(AS7341_SUMMARY_SIZE())       # uplink buffer
+
+sensor.channel_select("F1F4CN")     # once: same mapping for all samples
+try:
+    while True:
+        sensor.start_measure()
+        if aggregator.update_from(sensor):
+            for ch, (mean, std, lo, hi, ewma) in enumerate(aggregator.get_summary()):
+                print("ch{:d}: mean {:d} std {:d} min {:d} max {:d} ewma {:d}".format(
+                      ch, mean, std, lo, hi, ewma))
+            aggregator.pack_into(packet)    # e.g. for transmission
+            print("packed summary:", len(packet), "bytes")
+        sleep_ms(1000)
+
+except KeyboardInterrupt:
+    print("Interrupted from keyboard")
+
+sensor.disable()
+
+#
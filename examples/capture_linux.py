@@ -0,0 +1,49 @@
+#
+# Example of full-rate capture on a Linux host into a memory-mapped
+# columnar recording (requires NumPy), 'sim' for a simulated AS7341.
+# The recording can be opened concurrently with ColumnReader.
+#
+
+import sys
+import time
+
+from as7341 import *
+from as7341_recorder import ColumnRecorder
+
+if len(sys.argv) > 1 and sys.argv[1] == "sim":
+    from as7341_sim import SimulatedI2C
+    i2c = SimulatedI2C()
+else:
+    from as7341_linux import LinuxI2C
+    i2c = LinuxI2C(1)                       # /dev/i2c-1
+
+sensor = AS7341(i2c)
+if not sensor.isconnected():
+    print("Failed to contact AS7341, terminating")
+    sys.exit(1)
+
+sensor.set_measure_mode(AS7341_MODE_SPM)
+sensor.set_atime(29)                # 30 ASTEPS
+sensor.set_astep(599)               # 1.67 ms
+sensor.set_again(4)                 # factor 8 (with pretty much light)
+sensor.channel_select("F1F4CN")     # once: same mapping for all samples
+
+recorder = ColumnRecorder("as7341_capture", append=True)    # never truncate earlier data
+try:
+    while True:
+        sensor.start_measure()
+        record = sensor.get_spectral_record()
+        if record is None:
+            continue                        # read error: nothing appended
+        recorder.append(record.counts, time.time(), record.again, record.astatus)
+        if len(recorder) % 1000 == 0:
+            recorder.flush()
+            print(len(recorder), "readings recorded")
+
+except KeyboardInterrupt:
+    print("Interrupted from keyboard")
+
+recorder.close()
+sensor.disable()
+
+#
@@ -0,0 +1,62 @@
+#
+# Example of classification of live readings against reference signatures
+# on a Linux host (requires NumPy), 'sim' for a simulated AS7341.
+# The references are read from signatures.csv (label followed by the
+# counts of F1..F8, Clear and NIR per line), the index is saved to
+# signatures.npz and loaded from there in later runs.
+#
+
+import os
+import sys
+
+from as7341 import *
+from as7341_classify import SpectralIndex
+
+if len(sys.argv) > 1 and sys.argv[1] == "sim":
+    from as7341_sim import SimulatedI2C
+    i2c = SimulatedI2C()
+else:
+    from as7341_linux import LinuxI2C
+    i2c = LinuxI2C(1)                       # /dev/i2c-1
+
+if os.path.exists("signatures.npz"):
+    index = SpectralIndex.load("signatures.npz")
+else:
+    labels, signatures = [], []
+    with open("signatures.csv") as f:
+        for line in f:
+            fields = line.strip().split(",")
+            if len(fields) == 11:
+                labels.append(fields[0])
+                signatures.append([float(x) for x in fields[1:]])
+    index = SpectralIndex(signatures, labels)
+    index.save("signatures.npz")
+print(len(index), "reference signatures")
+
+sensor = AS7341(i2c)
+if not sensor.isconnected():
+    print("Failed to contact AS7341, terminating")
+    sys.exit(1)
+
+sensor.set_measure_mode(AS7341_MODE_SPM)
+sensor.set_atime(29)                # 30 ASTEPS
+sensor.set_astep(599)               # 1.67 ms
+sensor.set_again(4)                 # factor 8 (with pretty much light)
+
+try:
+    while True:
+        sensor.start_measure("F1F4CN")
+        f1,f2,f3,f4,clr,nir = sensor.get_spectral_data()
+        sensor.start_measure("F5F8CN")
+        f5,f6,f7,f8,clr,nir = sensor.get_spectral_data()
+        reading = (f1,f2,f3,f4,f5,f6,f7,f8,clr,nir)
+        distances, indices = index.query(reading, k=3)
+        print("Class: {:s}, nearest distance: {:.4f}".format(
+              index.classify(reading, k=3), distances[0]))
+
+except KeyboardInterrupt:
+    print("Interrupted from keyboard")
+
+sensor.disable()
+
+#
@@ -0,0 +1,48 @@
+#
+# Example of low-power duty-cycled sampling of the AS7341
+#
+
+import sys
+from machine import I2C, SoftI2C, Pin
+
+# i2c = SoftI2C(scl=Pin(27), sda=Pin(33))
+i2c = I2C(0)
+addrlist = " ".join(["0x{:02X}".format(x) for x in i2c.scan()])
+print("Detected devices at I2C-addresses:", addrlist)
+
+from as7341 import *
+from as7341_duty import *
+
+sensor = AS7341(i2c)
+if not sensor.isconnected():
+    print("Failed to contact AS7341, terminating")
+    sys.exit(1)
+
+sensor.set_measure_mode(AS7341_MODE_SPM)
+sensor.set_atime(29)                # 30 ASTEPS
+sensor.set_astep(599)               # 1.67 ms
+sensor.set_again(4)                 # factor 8 (with pretty much light)
+
+# one sample per 10 seconds, result may be up to 1 second late
+scheduler = DutyCycleScheduler(sensor, 10000, 1000, "F1F4CN")
+
+try:
+    while True:
+        counts = scheduler.sample()
+        if not counts:
+            print("No counts (timeout or read error)")
+            continue
+        f1,f2,f3,f4,clr,nir = counts
+        print("F1..F4: {:d} {:d} {:d} {:d}, Clear: {:d}, NIR: {:d}".format(
+              f1, f2, f3, f4, clr, nir))
+        print("Strategy: {:s}, energy per sample: {:.1f} uJ".format(
+              AS7341_DUTY_NAMES[scheduler.get_strategy()],
+              scheduler.get_energy_per_sample()))
+
+except KeyboardInterrupt:
+    print("Interrupted from keyboard")
+
+scheduler.stop()
+sensor.disable()
+
+#
@@ -0,0 +1,33 @@
+#
+# Example of a fleet collector on a Linux host: one worker process per
+# I2C bus, records in shared-memory ring buffers ('sim' for simulated buses)
+#
+
+import sys
+import time
+
+from as7341_fleet import FleetCollector
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "sim":
+        buses = ["sim", "sim", "sim", "sim"]
+        addresses = (0x39, 0x3A, 0x3B)      # simulated: several per bus
+    else:
+        buses = [1, 3, 4]                   # /dev/i2c-1, -3 and -4
+        addresses = (0x39,)
+
+    with FleetCollector(buses, addresses, selection="F1F4CN",
+                        atime=29, astep=599, again=4, capacity=1024) as fleet:
+        try:
+            while True:
+                time.sleep(1)
+                records = fleet.poll()
+                for t, bus, sensor, astatus, *counts in records[-len(buses):]:
+                    print("bus {:d} sensor {:d}: {}{:s}".format(
+                          bus, sensor, counts, " saturated" if astatus & 0x80 else ""))
+                print(fleet.stats())
+
+        except KeyboardInterrupt:
+            print("Interrupted from keyboard")
+
+#
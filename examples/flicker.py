@@ -12,6 +12,7 @@ addrlist = " ".join(["0x{:02X}".format(x) for x in i2c.scan()])
 print("Detected devices at I2C-addresses:", addrlist)
 
 from as7341 import *
+from as7341_flicker import *
 
 sensor = AS7341(i2c)
 if not sensor.isconnected():
@@ -23,18 +24,28 @@ sensor.set_atime(29)                 # 30 ASTEPS
 sensor.set_astep(599)                # ASTEP = 1.67 ms
 sensor.set_again(4)                  # factor 8 (for with pretty much light)
 
+# flicker detection with its own integration time and gain,
+# concurrent with spectral measurement of F1..F4 and Clear
+monitor = FlickerMonitor(sensor, "F1F4CF", fd_time=359, fd_gain=4)
+monitor.start()
+
 try:
     while True:
-        flicker_freq = sensor.get_flicker_frequency()
-        if flicker_freq == 0:
-            print("No flicker detected!")
-        else:
-            print("Flicker frequency: {:d} Hz".format(flicker_freq))
+        flicker_freq = monitor.poll()       # does not wait
+        if flicker_freq is not None:
+            if flicker_freq == 0:
+                print("No flicker detected!")
+            else:
+                print("Flicker frequency: {:d} Hz".format(flicker_freq))
+        sensor.start_measure()              # spectral (same SMUX config)
+        f1,f2,f3,f4,clr,_ = sensor.get_spectral_data()
+        print("F1..F4: {:d} {:d} {:d} {:d}, Clear: {:d}".format(f1, f2, f3, f4, clr))
         sleep_ms(3000)
 
 except KeyboardInterrupt:
     print("Interrupted from keyboard")
 
+monitor.stop()
 sensor.disable()
 
 #
@@ -1,5 +1,7 @@
 #
-# Example of interrupt and thresholds handling of the AS7341
+# Example of interrupt and thresholds handling of the AS7341:
+# the sensor runs autonomously, counts are read only when
+# the Clear channel is outside the threshold band
 #
 
 import sys
@@ -11,6 +13,7 @@ i2c = I2C(0)#
 print("Detected devices at I2C-addresses:", i2c.scan())
 
 from as7341 import *
+from as7341_events import *
 
 sensor = AS7341(i2c)
 if not sensor.isconnected():
@@ -18,30 +21,36 @@ if not sensor.isconnected():
     sys.exit(1)
 
 sensor.set_measure_mode(AS7341_MODE_SPM)
-sensor.set_spectral_interrupt(1)
 sensor.set_atime(29)
 sensor.set_astep(599)
 sensor.set_again(4)
-sensor.set_thresholds(200, 900)
-sensor.set_interrupt_persistence(0)
-sensor.set_spectral_threshold_channel(4)    # clear channel
+
+# INT pin of the AS7341 (open drain) connected to pin 4 with pull-up;
+# with pin=None the STATUS register is polled in stead.
+pinint = Pin(4, Pin.IN, Pin.PULL_UP)
+monitor = ThresholdMonitor(sensor, 200, 900,
+                           channel=4,           # clear channel
+                           persistence=2,       # 2 consecutive out-of-band
+                           selection="F1F4CN",  # channel mapping
+                           pin=pinint)
+monitor.start()
 
 try:
 
     while True:
-        sensor.clear_interrupt()
-        sensor.start_measure("F1F4CN")      # channel mapping
-        _,_,_,_,clear,_ = sensor.get_spectral_data()
-        print("Clear: {:d}".format(clear))
-        if sensor.check_interrupt():
-            print("Interrupt detected!")
+        if monitor.wait(timeout_ms=60000, interval_ms=1000):
+            while monitor.pending():
+                stamp, (_,_,_,_,clear,_) = monitor.get_event()
+                print("{:d} ms: Clear: {:d} out of band!".format(stamp, clear))
         else:
-            print("no interrupt ....")
-        sleep_ms(3000)
+            print("no threshold events ....")
+        polls, _, dropped = monitor.get_stats()
+        print("STATUS reads: {:d}, dropped events: {:d}".format(polls, dropped))
 
 except KeyboardInterrupt:
     print("Interrupted from keyboard")
 
+monitor.stop()
 sensor.disable()
 
 #
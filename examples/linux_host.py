@@ -0,0 +1,47 @@
+#
+# Example of using the AS7341 driver on a Linux host (e.g. Raspberry Pi)
+# via /dev/i2c-1, or with a simulated AS7341 when started with 'sim'.
+# Started with 'fake' the ioctl path of LinuxI2C is used with a temporary
+# file as device file, the transactions are served by the simulated AS7341.
+#
+
+import sys
+
+from as7341 import *
+
+if len(sys.argv) > 1 and sys.argv[1] == "sim":
+    from as7341_sim import SimulatedI2C
+    i2c = SimulatedI2C()
+elif len(sys.argv) > 1 and sys.argv[1] == "fake":
+    import tempfile
+    from as7341_sim import SimulatedI2C
+    from as7341_linux import LinuxI2C, SimulatedIoctl
+    device = tempfile.NamedTemporaryFile(prefix="i2c-")
+    i2c = LinuxI2C(device.name, ioctl=SimulatedIoctl(SimulatedI2C()))
+else:
+    from as7341_linux import LinuxI2C
+    i2c = LinuxI2C(1)                       # /dev/i2c-1
+print("Detected devices at I2C-addresses:",
+      " ".join(["0x{:02X}".format(x) for x in i2c.scan()]))
+
+sensor = AS7341(i2c)
+if not sensor.isconnected():
+    print("Failed to contact AS7341, terminating")
+    sys.exit(1)
+
+sensor.set_measure_mode(AS7341_MODE_SPM)
+sensor.set_atime(29)                # 30 ASTEPS
+sensor.set_astep(599)               # 1.67 ms
+sensor.set_again(4)                 # factor 8 (with pretty much light)
+
+for selection in ("F1F4CN", "F5F8CN"):
+    sensor.start_measure(selection)
+    record = sensor.get_spectral_record()
+    for name, count in zip(AS7341_SMUX_CHANNELS[selection], record.counts):
+        print("{:s}: {:d}".format(name, count))
+
+if hasattr(i2c, "transfers"):
+    print("I2C transfers (ioctl calls):", i2c.transfers)
+sensor.disable()
+
+#
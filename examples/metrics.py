@@ -0,0 +1,45 @@
+#
+# Example of a metrics endpoint: counts, gain, sample rate, saturation and
+# I2C errors of the AS7341 served in OpenMetrics text format on port 9100
+# (scrape with e.g. 'curl http://<board-address>:9100/metrics').
+# The network connection (WLAN) must be up before starting this example.
+#
+
+import sys
+from machine import I2C, SoftI2C, Pin
+
+# i2c = SoftI2C(scl=Pin(27), sda=Pin(33))
+i2c = I2C(0)
+addrlist = " ".join(["0x{:02X}".format(x) for x in i2c.scan()])
+print("Detected devices at I2C-addresses:", addrlist)
+
+from as7341 import *
+from as7341_metrics import *
+
+sensor = AS7341(i2c)
+if not sensor.isconnected():
+    print("Failed to contact AS7341, terminating")
+    sys.exit(1)
+
+sensor.set_measure_mode(AS7341_MODE_SPM)
+sensor.set_atime(29)                # 30 ASTEPS
+sensor.set_astep(599)               # 1.67 ms
+sensor.set_again(4)                 # factor 8 (with pretty much light)
+
+metrics = SensorMetrics(sensor, "as7341")
+exporter = MetricsExporter([metrics], port=9100)
+
+try:
+    while True:
+        for selection in ("F1F4CN", "F5F8CN"):
+            sensor.start_measure(selection, timeout_ms=1000)
+            metrics.observe(sensor.get_spectral_record())
+            exporter.poll()         # answer pending scrapes, never waits
+
+except KeyboardInterrupt:
+    print("Interrupted from keyboard")
+
+exporter.close()
+sensor.disable()
+
+#
@@ -0,0 +1,75 @@
+#
+# Micro-benchmark of the per-sample hot paths of the driver:
+# pure Python (bytecode) versions against the native code versions
+# of as7341_native.py (MicroPython with native code emitter).
+# Each version is warmed up with a full loop, the order of the versions
+# alternates per round and the best of ROUNDS rounds is reported.
+# Expect a real gain for the decoding and the poll loop; for modify bits
+# the call overhead dominates and the gain is about 1.0 (no speed-up).
+#
+
+import sys
+from machine import I2C, SoftI2C, Pin
+
+# i2c = SoftI2C(scl=Pin(27), sda=Pin(33))
+i2c = I2C(0)
+
+import as7341
+from as7341 import *
+from as7341_compat import ticks_us, ticks_diff
+
+sensor = AS7341(i2c)
+if not sensor.isconnected():
+    print("Failed to contact AS7341, terminating")
+    sys.exit(1)
+
+sensor.set_measure_mode(AS7341_MODE_SPM)
+sensor.set_atime(29)                # 30 ASTEPS
+sensor.set_astep(599)               # 1.67 ms
+sensor.set_again(4)                 # factor 8 (with pretty much light)
+sensor.start_measure("F1F4CN")      # AVALID set: poll returns after 1 read
+buf = bytearray(13)
+counts = array('H', [0] * 6)
+N = 1000
+ROUNDS = 5
+
+def loop(func, args):
+    """ return average time (us) of <func>(*args) over N calls """
+    start = ticks_us()
+    for _ in range(N):
+        func(*args)
+    return ticks_diff(ticks_us(), start) / N
+
+def bench(func_py, func_nat, args):
+    """ return best average times (us) of the Python and native version """
+    loop(func_py, args)             # warm-up (caches, allocations)
+    loop(func_nat, args)
+    best_py = best_nat = None
+    for r in range(ROUNDS):
+        if r % 2:                   # alternate order
+            t_nat = loop(func_nat, args)
+            t_py = loop(func_py, args)
+        else:
+            t_py = loop(func_py, args)
+            t_nat = loop(func_nat, args)
+        best_py = t_py if best_py is None else min(best_py, t_py)
+        best_nat = t_nat if best_nat is None else min(best_nat, t_nat)
+    return best_py, best_nat
+
+tests = (
+    ("decode list", "_decode_list", (buf,)),
+    ("decode into", "_decode_counts", (buf, counts, 0)),
+    ("modify bits", "_modify_bits", (0x41, 0x02, True)),
+    ("poll AVALID", "_poll_bit", (i2c, AS7341_I2C_ADDRESS, AS7341_STATUS_2,
+                                  bytearray(1), AS7341_STATUS_2_AVALID, 1, 100)),
+    )
+
+print("Native code versions:", "available" if AS7341_NATIVE else "not available")
+print("{:12s} {:>10s} {:>10s} {:>6s}".format("operation", "python us", "native us", "gain"))
+for name, func, args in tests:
+    t_py, t_nat = bench(getattr(as7341, func + "_py"), getattr(as7341, func), args)
+    print("{:12s} {:10.2f} {:10.2f} {:6.2f}".format(name, t_py, t_nat, t_py / t_nat))
+
+sensor.disable()
+
+#
@@ -0,0 +1,44 @@
+#
+# Example of oversampling: N back to back measurements reduced to
+# median, trimmed mean or mean with standard deviation
+#
+
+import sys
+from time import sleep_ms
+from machine import I2C, SoftI2C, Pin
+
+# i2c = SoftI2C(scl=Pin(27), sda=Pin(33))
+i2c = I2C(0)
+addrlist = " ".join(["0x{:02X}".format(x) for x in i2c.scan()])
+print("Detected devices at I2C-addresses:", addrlist)
+
+from as7341 import *
+
+sensor = AS7341(i2c)
+if not sensor.isconnected():
+    print("Failed to contact AS7341, terminating")
+    sys.exit(1)
+
+sensor.set_measure_mode(AS7341_MODE_SPM)
+sensor.set_atime(9)                 # 10 ASTEPS
+sensor.set_astep(599)               # 1.67 ms
+sensor.set_again(4)                 # factor 8 (with pretty much light)
+
+try:
+    while True:
+        print("median: ", sensor.get_oversampled_data(16, "median", selection="F1F4CN"))
+        print("trimmed:", sensor.get_oversampled_data(16, "trimmed", trim=0.25))
+        for mean, std in sensor.get_oversampled_data(16, "meanstd"):
+            print("  {:.1f} +/- {:.1f}".format(mean, std))
+        advice = sensor.get_oversample_advice()
+        if advice["prefer_long"]:
+            print("One integration with ATIME={:d} ASTEP={:d} would be better".format(
+                  advice["atime"], advice["astep"]))
+        sleep_ms(5000)
+
+except KeyboardInterrupt:
+    print("Interrupted from keyboard")
+
+sensor.disable()
+
+#
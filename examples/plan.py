@@ -0,0 +1,47 @@
+#
+# Example of a pipelined measurement plan:
+# all channels of the AS7341 with 4 channel-mappings per cycle
+#
+
+import sys
+from machine import I2C, SoftI2C, Pin
+
+# i2c = SoftI2C(scl=Pin(25), sda=Pin(26))
+i2c = I2C(1, scl=Pin(25), sda=Pin(26), freq=400000)
+print("Detected devices at I2C-addresses:",
+      " ".join(["0x{:02X}".format(x) for x in i2c.scan()]))
+
+from as7341 import *
+from as7341_plan import *
+
+sensor = AS7341(i2c)
+if not sensor.isconnected():
+    print("Failed to contact AS7341, terminating")
+    sys.exit(1)
+
+sensor.set_measure_mode(AS7341_MODE_SPM)
+sensor.set_atime(29)                # 30 ASTEPS
+sensor.set_astep(599)               # 1.67 ms
+sensor.set_again(4)                 # factor 8 (with pretty much light)
+
+# (selection, gain code, ATIME): the F2F7 and F3F8 steps with other settings,
+# results are basic counts (per ms at gain 1), comparable between steps
+plan = MeasurementPlan(sensor, [("F1F4CN", 4, 29),
+                                ("F5F8CN", 4, 29),
+                                ("F2F7",   5, 19),
+                                ("F3F8",   5, 19)])
+
+try:
+    for result in plan.run():
+        print(" ".join("{:s}={:.2f}".format(k, result[k]) for k in sorted(result)))
+        print("cycle {:d} ms, sum of integration times {:.1f} ms{:s}".format(
+              plan.get_cycle_time(), plan.get_integration_sum(),
+              ", saturated!" if plan.get_saturated() else ""))
+
+except KeyboardInterrupt:
+    print("Interrupted from keyboard")
+
+plan.stop()
+sensor.disable()
+
+#
@@ -0,0 +1,47 @@
+#
+# Example of reflectance measurement with the onboard LED:
+# paired LED-on / LED-off measurements, ambient light subtracted
+#
+
+import sys
+from time import sleep_ms
+from machine import I2C, SoftI2C, Pin
+
+# i2c = SoftI2C(scl=Pin(27), sda=Pin(33))
+i2c = I2C(0)
+addrlist = " ".join(["0x{:02X}".format(x) for x in i2c.scan()])
+print("Detected devices at I2C-addresses:", addrlist)
+
+from as7341 import *
+
+sensor = AS7341(i2c)
+if not sensor.isconnected():
+    print("Failed to contact AS7341, terminating")
+    sys.exit(1)
+
+sensor.set_measure_mode(AS7341_MODE_SPM)
+sensor.set_atime(29)                # 30 ASTEPS
+sensor.set_astep(599)               # 1.67 ms
+sensor.set_again(6)                 # factor 32 (reflected light is weak)
+
+sensor.start_measure("F1F4CN")      # channel mapping (once)
+
+try:
+    while True:
+        counts = sensor.get_reflectance_data(12, pairs=4)
+        if not counts:              # read error, timeout or saturation
+            print("No valid reflectance data, lower gain or LED current?")
+            sleep_ms(1000)
+            continue
+        f1,f2,f3,f4,clr,nir = counts
+        print("F1..F4: {:d} {:d} {:d} {:d}, Clear: {:d}, NIR: {:d}".format(
+              f1, f2, f3, f4, clr, nir))
+        sleep_ms(1000)
+
+except KeyboardInterrupt:
+    print("Interrupted from keyboard")
+
+sensor.set_led_current(0)           # LED off
+sensor.disable()
+
+#
@@ -0,0 +1,50 @@
+#
+# Example of spectrum reconstruction on a Linux host (requires NumPy),
+# 'sim' for a simulated AS7341.
+# Without calibrated response curves the spectrum and PPFD are relative.
+#
+
+import sys
+
+from as7341 import *
+from as7341_spectrum import SpectrumReconstructor, basic_counts
+
+if len(sys.argv) > 1 and sys.argv[1] == "sim":
+    from as7341_sim import SimulatedI2C
+    i2c = SimulatedI2C()
+else:
+    from as7341_linux import LinuxI2C
+    i2c = LinuxI2C(1)                       # /dev/i2c-1
+
+sensor = AS7341(i2c)
+if not sensor.isconnected():
+    print("Failed to contact AS7341, terminating")
+    sys.exit(1)
+
+sensor.set_measure_mode(AS7341_MODE_SPM)
+sensor.set_atime(29)                # 30 ASTEPS
+sensor.set_astep(599)               # 1.67 ms
+sensor.set_again(4)                 # factor 8 (with pretty much light)
+
+reconstructor = SpectrumReconstructor(range(380, 1001, 5))   # 5 nm steps
+
+try:
+    while True:
+        sensor.start_measure("F1F4CN")
+        f1,f2,f3,f4,clr,nir = sensor.get_spectral_data()
+        sensor.start_measure("F5F8CN")
+        f5,f6,f7,f8,_,_ = sensor.get_spectral_data()
+        reading = basic_counts((f1,f2,f3,f4,f5,f6,f7,f8,clr,nir),
+                               sensor.get_again_factor(),
+                               sensor.get_integration_time())
+        result = reconstructor.process(reading, nonnegative=True)
+        peak = reconstructor.wavelengths[result["spectrum"].argmax()]
+        print("Peak: {:.0f} nm, dominant wavelength: {:.0f} nm, PPFD: {:.3f} (relative)".format(
+              peak, result["dominant_wavelength"], result["ppfd"]))
+
+except KeyboardInterrupt:
+    print("Interrupted from keyboard")
+
+sensor.disable()
+
+#
@@ -0,0 +1,49 @@
+#
+# Example of recording the I2C transactions of a session
+# and replaying them offline (Linux host or MicroPython with a filesystem)
+#
+
+import sys
+
+from as7341 import *
+from as7341_replay import RecordingI2C, ReplayI2C, load_trace, trace_summary
+
+TRACE = "as7341_session.trc"
+
+def session(i2c):
+    """ the measurement session to be recorded and replayed """
+    sensor = AS7341(i2c)
+    if not sensor.isconnected():
+        print("Failed to contact AS7341, terminating")
+        sys.exit(1)
+    sensor.set_measure_mode(AS7341_MODE_SPM)
+    sensor.set_atime(29)                # 30 ASTEPS
+    sensor.set_astep(599)               # 1.67 ms
+    sensor.set_again(4)                 # factor 8 (with pretty much light)
+    for selection in ("F1F4CN", "F5F8CN"):
+        sensor.start_measure(selection)
+        print(selection, sensor.get_spectral_data())
+
+if len(sys.argv) > 1 and sys.argv[1] == "sim":
+    from as7341_sim import SimulatedI2C
+    i2c = SimulatedI2C()
+else:
+    try:
+        from machine import I2C
+        i2c = I2C(0)
+    except ImportError:
+        from as7341_linux import LinuxI2C
+        i2c = LinuxI2C(1)
+
+print("Recording session to", TRACE)
+with RecordingI2C(i2c, TRACE) as recorder:
+    session(recorder)
+print(trace_summary(load_trace(TRACE)))
+
+print("Replaying session with original timing")
+replay = ReplayI2C(TRACE, timing=True)
+session(replay)
+print("reads: {:d}, writes: {:d}, not recorded: {:d}".format(
+      replay.reads, replay.writes, replay.misses))
+
+#
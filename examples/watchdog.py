@@ -0,0 +1,49 @@
+#
+# Example of supervised sampling: the watchdog detects faults of the AS7341
+# (bus errors, brown-out, stuck measurement) and restores the configuration
+#
+
+import sys
+from machine import I2C, SoftI2C, Pin
+
+# i2c = SoftI2C(scl=Pin(27), sda=Pin(33))
+i2c = I2C(0)
+addrlist = " ".join(["0x{:02X}".format(x) for x in i2c.scan()])
+print("Detected devices at I2C-addresses:", addrlist)
+
+from as7341 import *
+from as7341_watchdog import *
+
+sensor = AS7341(i2c)
+if not sensor.isconnected():
+    print("Failed to contact AS7341, terminating")
+    sys.exit(1)
+
+sensor.set_measure_mode(AS7341_MODE_SPM)
+sensor.set_atime(29)                # 30 ASTEPS
+sensor.set_astep(599)               # 1.67 ms
+sensor.set_again(4)                 # factor 8 (with pretty much light)
+sensor.channel_select("F1F4CN")
+
+watchdog = SensorWatchdog(sensor)
+watchdog.capture()                  # last-known-good configuration
+
+try:
+    while True:
+        record = watchdog.sample()
+        if record is None:
+            stats = watchdog.get_stats()
+            print("Fault: {}, down: {:d} ms, recoveries: {:d}, downtime: {:d} ms".format(
+                  stats["last_fault"], stats["down_ms"],
+                  stats["recoveries"], stats["downtime_ms"]))
+            continue
+        f1,f2,f3,f4,clr,nir = record.counts
+        print("F1..F4: {:d} {:d} {:d} {:d}, Clear: {:d}, NIR: {:d}".format(
+              f1, f2, f3, f4, clr, nir))
+
+except KeyboardInterrupt:
+    print("Interrupted from keyboard")
+
+sensor.disable()
+
+#